@@ -0,0 +1,265 @@
+"""
+Analysis Cache - Two-tier cache for price analyses
+In-process LRU with TTL in front of the `saved_analyses` table, keyed by the
+normalized request; entries are dropped when their segment gets new listings,
+in every process (see app/services/listing_changes.py)
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+import sqlalchemy
+
+from app.analysis.market_stats import MarketStatsCube
+from app.database import database, saved_analyses
+from app.services.listing_changes import listing_changes
+from app.services.search_keys import search_keys
+
+
+class AnalysisCache:
+    """
+    Cache of analyzer results
+
+    - L1: OrderedDict LRU in this process (MAX_ENTRIES, TTL)
+    - L2: rows in `saved_analyses` with a cache_key, shared by every worker
+      process and kept across restarts (same TTL, checked on created_at)
+
+    Keys cover everything the analyzer reads: brand, model, fuel,
+    transmission, body type, the year range, the km range rounded to the
+    market stats km buckets (analyses inside one bucket range read the same
+    cells) and the exact target year and km (the comparables set is centered
+    on them). Invalidation is per segment - see `invalidate_segments`: the
+    writer deletes the L2 rows, and every process drops its L1 entries when
+    the writer's ListingChanges notification reaches it (`drop_local`).
+
+    One L2 row per key (`set` replaces it); expired rows are pruned at most
+    every PRUNE_INTERVAL_SECONDS.
+    """
+
+    DEFAULT_TTL_SECONDS = 3600
+    MAX_ENTRIES = 1024
+    KM_BUCKET = MarketStatsCube.KM_BUCKET
+    PRUNE_INTERVAL_SECONDS = 600
+
+    def __init__(self, ttl_seconds: Optional[int] = None):
+        """
+        Args:
+            ttl_seconds: Entry lifetime (default: ANALYSIS_CACHE_TTL env var)
+        """
+        self.ttl_seconds = ttl_seconds or int(os.getenv('ANALYSIS_CACHE_TTL', self.DEFAULT_TTL_SECONDS))
+        # cache_key -> (expires_at monotonic, (marca_key, series_key, model), result)
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, str, str], Dict]]" = OrderedDict()
+        self.stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'invalidations': 0}
+        self._last_prune = time.monotonic()
+
+    def make_key(
+        self,
+        marca: str,
+        model: str,
+        an_min: int,
+        an_max: int,
+        km_min: Optional[int],
+        km_max: Optional[int],
+        combustibil: Optional[str],
+        transmisie: Optional[str],
+        caroserie: Optional[str],
+        an: int,
+        km: int,
+    ) -> str:
+        """sha256 of the normalized analysis inputs"""
+        normalized = [
+            search_keys.marca_key(marca),
+            model.strip().lower(),
+            an_min,
+            an_max,
+            km_min // self.KM_BUCKET if km_min else None,
+            km_max // self.KM_BUCKET if km_max else None,
+            (combustibil or '').lower(),
+            (transmisie or '').lower(),
+            (caroserie or '').lower(),
+            an,
+            km,
+        ]
+        return hashlib.sha256(json.dumps(normalized).encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """Cached result for a key (L1, then L2), or None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.stats['l1_hits'] += 1
+                return entry[2]
+            del self._entries[key]
+
+        try:
+            row = await database.fetch_one(
+                sqlalchemy.select([
+                    saved_analyses.c.marca, saved_analyses.c.series_key, saved_analyses.c.model,
+                    saved_analyses.c.rezultat_complet, saved_analyses.c.created_at,
+                ]).where(
+                    (saved_analyses.c.cache_key == key) &
+                    (saved_analyses.c.created_at >= datetime.now() - timedelta(seconds=self.ttl_seconds))
+                ).order_by(saved_analyses.c.created_at.desc()).limit(1)
+            )
+        except Exception as e:
+            print(f"Analysis cache read failed: {e}")
+            row = None
+
+        if row is None:
+            self.stats['misses'] += 1
+            return None
+
+        # Promote to L1 for the rest of the row's lifetime
+        remaining = self.ttl_seconds - (datetime.now() - row['created_at']).total_seconds()
+        self._remember(key, (row['marca'], row['series_key'], row['model']), row['rezultat_complet'], remaining)
+        self.stats['l2_hits'] += 1
+        return row['rezultat_complet']
+
+    async def set(self, key: str, marca: str, model: str, an: int, km: int, result: Dict):
+        """Store a result in both tiers"""
+        # Same keys the market stats cube and the comparables index read by
+        segment = (
+            search_keys.marca_key(marca),
+            search_keys.series_key(marca, model) or '',
+            model.strip().lower(),
+        )
+        self._remember(key, segment, result, self.ttl_seconds)
+
+        try:
+            async with database.transaction():
+                await database.execute(saved_analyses.delete().where(saved_analyses.c.cache_key == key))
+                await database.execute(saved_analyses.insert().values(
+                    cache_key=key,
+                    marca=segment[0],
+                    series_key=segment[1],
+                    model=segment[2],
+                    an=an,
+                    km=km,
+                    dotari=[],
+                    pret_optim=result['pret_optim']['valoare'],
+                    rezultat_complet=result,
+                ))
+        except Exception as e:
+            print(f"Analysis cache write failed: {e}")
+
+        if time.monotonic() - self._last_prune >= self.PRUNE_INTERVAL_SECONDS:
+            self._last_prune = time.monotonic()
+            await self.prune_expired()
+
+    async def prune_expired(self) -> int:
+        """
+        Delete L2 rows older than the TTL (saved analyses without a cache_key are kept)
+
+        Returns:
+            Number of rows deleted
+        """
+        try:
+            rows = await database.fetch_all(
+                saved_analyses.delete().where(
+                    saved_analyses.c.cache_key.isnot(None) &
+                    (saved_analyses.c.created_at < datetime.now() - timedelta(seconds=self.ttl_seconds))
+                ).returning(saved_analyses.c.id)
+            )
+        except Exception as e:
+            print(f"Analysis cache pruning failed: {e}")
+            return 0
+        return len(rows)
+
+    def _remember(self, key: str, segment: Tuple[str, str, str], result: Dict, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, segment, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.MAX_ENTRIES:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _normalize(segments: Iterable[Tuple[str, Optional[str], Optional[str]]]) -> set:
+        return {
+            ((marca or '').lower(), (series or '').lower(), (model or '').lower())
+            for marca, series, model in segments
+            if marca
+        }
+
+    async def drop_local(self, segments: Optional[Iterable[Tuple[str, Optional[str], Optional[str]]]]):
+        """
+        Drop this process's L1 entries that read the given segments (None = all)
+
+        Subscribed to ListingChanges, so it runs in every process whichever
+        one wrote the listings.
+        """
+        if segments is None:
+            self.stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            return
+
+        changed = self._normalize(segments)
+
+        def affected(segment: Tuple[str, str, str]) -> bool:
+            marca, series, model = segment
+            return any(
+                marca == c_marca and (series == c_series or model in c_model)
+                for c_marca, c_series, c_model in changed
+            )
+
+        for key in [key for key, entry in self._entries.items() if affected(entry[1])]:
+            del self._entries[key]
+            self.stats['invalidations'] += 1
+
+    async def invalidate_segments(self, segments: Iterable[Tuple[str, Optional[str], Optional[str]]]):
+        """
+        Drop cached analyses that read the given segments from L2 and this
+        process's L1 (other processes follow through `drop_local`)
+
+        Args:
+            segments: (marca_key, series_key, model) of listings that changed.
+                An analysis for model M reads a listing when the listing's
+                series equals series_key(M) or its model contains M (same
+                rule as the cube query).
+        """
+        changed = self._normalize(segments)
+        if not changed:
+            return
+
+        await self.drop_local(changed)
+
+        try:
+            for marca, series, model in changed:
+                await database.execute(
+                    """
+                    DELETE FROM saved_analyses
+                    WHERE cache_key IS NOT NULL
+                        AND marca = :marca
+                        AND (series_key = :series OR :model LIKE '%' || model || '%')
+                    """,
+                    {'marca': marca, 'series': series, 'model': model}
+                )
+        except Exception as e:
+            print(f"Analysis cache invalidation failed: {e}")
+
+    async def invalidate_all(self):
+        """Drop every cached analysis from L2 and this process's L1 (after bulk listing changes)"""
+        await self.drop_local(None)
+        try:
+            await database.execute(saved_analyses.delete().where(saved_analyses.c.cache_key.isnot(None)))
+        except Exception as e:
+            print(f"Analysis cache invalidation failed: {e}")
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters plus current L1 size"""
+        lookups = self.stats['l1_hits'] + self.stats['l2_hits'] + self.stats['misses']
+        hits = self.stats['l1_hits'] + self.stats['l2_hits']
+        return {
+            **self.stats,
+            'l1_entries': len(self._entries),
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'ttl_seconds': self.ttl_seconds,
+        }
+
+
+# Global instance
+analysis_cache = AnalysisCache()
+listing_changes.subscribe(analysis_cache.drop_local)
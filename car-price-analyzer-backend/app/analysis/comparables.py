@@ -0,0 +1,305 @@
+"""
+Comparables - In-memory k-nearest-neighbour index over active listings
+Finds the k listings closest to a car in year, km, power and engine size
+within its brand/series/fuel/gearbox partition, instead of querying fixed
+BETWEEN windows that return too few rows or scan too many
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.database import database
+from app.services.listing_changes import Segment, listing_changes
+from app.services.search_keys import search_keys
+
+
+class _Partition:
+    """Listings of one (marca_key, series_key, combustibil, transmisie, caroserie), sorted by year"""
+
+    __slots__ = ('ids', 'features', 'prices')
+
+    def __init__(self, ids: np.ndarray, features: np.ndarray, prices: np.ndarray):
+        self.ids = ids            # int64, n
+        self.features = features  # float, n x len(FEATURES), nan = unknown
+        self.prices = prices      # float, n
+
+
+class ComparablesIndex:
+    """
+    k nearest active listings per partition
+
+    Distances are Euclidean over FEATURES divided by FEATURE_SCALES, so one
+    unit is one year, 20,000 km, 25 hp or 250 cm3. Features the query does
+    not give are ignored; a listing missing one the query gives costs
+    MISSING_PENALTY for it.
+
+    Partitions are sorted by year and a query only scores the listings in a
+    year window around the target: the window grows until it holds k
+    eligible listings (inside the requested year and km ranges), then to the
+    k-th distance, which makes the answer exact (no listing outside the
+    window can be closer). One vectorized NumPy pass per window - partitions
+    hold hundreds to a few thousand listings.
+
+    Kept current from ListingChanges: whichever process wrote listings
+    (the API or scrape_worker.py), the segments it announces are reloaded
+    here, and a change of everything (cleanup) rebuilds the index. The API
+    also rebuilds every REBUILD_INTERVAL_SECONDS in case a notification was
+    missed. Reloads and rebuilds run one at a time, so an older read can
+    never overwrite a newer one.
+    """
+
+    FEATURES = ('an', 'km', 'putere_cp', 'capacitate_cilindrica')
+    FEATURE_SCALES = np.array([1.0, 20000.0, 25.0, 250.0])
+    MISSING_PENALTY = 1.0
+
+    DEFAULT_K = 20
+    INITIAL_YEAR_WINDOW = 2.0
+
+    REBUILD_INTERVAL_SECONDS = 900
+
+    def __init__(self):
+        # (marca_key, series_key) -> {(combustibil, transmisie, caroserie): _Partition}
+        self._segments: Dict[Tuple[str, str], Dict[Tuple[str, str, str], _Partition]] = {}
+        self.loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _partition_select(self, segment_filter: str = "") -> str:
+        """One row per partition, columns as arrays in (an, id) order"""
+        arrays = ",\n".join(
+            f"array_agg({column} ORDER BY an, id) AS {column}"
+            for column in ('id', *self.FEATURES, 'pret')
+        )
+        return f"""
+            SELECT
+                marca_key,
+                COALESCE(series_key, '') AS series_key,
+                LOWER(COALESCE(combustibil, '')) AS combustibil,
+                LOWER(COALESCE(transmisie, '')) AS transmisie,
+                LOWER(COALESCE(caroserie, '')) AS caroserie,
+                {arrays}
+            FROM listings
+            WHERE este_activ = true
+                AND pret IS NOT NULL
+                AND marca_key IS NOT NULL
+                AND an IS NOT NULL
+                AND km IS NOT NULL
+                {segment_filter}
+            GROUP BY 1, 2, 3, 4, 5
+        """
+
+    def _build_segments(self, rows) -> Dict[Tuple[str, str], Dict[Tuple[str, str, str], _Partition]]:
+        segments = {}
+        for row in rows:
+            features = np.array(
+                [[np.nan if value is None else value for value in row[column]] for column in self.FEATURES],
+                dtype=float
+            ).T
+            partition = _Partition(
+                np.array(row['id'], dtype=np.int64),
+                features,
+                np.array(row['pret'], dtype=float),
+            )
+            segment = segments.setdefault((row['marca_key'], row['series_key']), {})
+            segment[(row['combustibil'], row['transmisie'], row['caroserie'])] = partition
+        return segments
+
+    async def refresh_segments(self, segments: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """
+        Reload the partitions of the given segments
+
+        Args:
+            segments: (marca_key, series_key) pairs whose listings changed
+
+        Returns:
+            Number of listings indexed for those segments
+        """
+        keys = {
+            (marca_key, series_key or '')
+            for marca_key, series_key in segments
+            if marca_key
+        }
+        indexed = 0
+        async with self._lock:
+            for marca_key, series_key in keys:
+                rows = await database.fetch_all(
+                    self._partition_select("AND marca_key = :marca_key AND COALESCE(series_key, '') = :series_key"),
+                    {'marca_key': marca_key, 'series_key': series_key}
+                )
+                built = self._build_segments(rows).get((marca_key, series_key))
+                if built:
+                    self._segments[(marca_key, series_key)] = built
+                    indexed += sum(partition.ids.size for partition in built.values())
+                else:
+                    self._segments.pop((marca_key, series_key), None)
+        return indexed
+
+    async def refresh_all(self) -> int:
+        """
+        Rebuild the whole index
+
+        Returns:
+            Number of listings indexed
+        """
+        async with self._lock:
+            rows = await database.fetch_all(self._partition_select())
+            self._segments = self._build_segments(rows)  # Swapped in one assignment
+            self.loaded = True
+        return sum(
+            partition.ids.size
+            for segment in self._segments.values()
+            for partition in segment.values()
+        )
+
+    def _nearest_in(
+        self,
+        partition: _Partition,
+        query: np.ndarray,
+        k: int,
+        an_range: Tuple[float, float],
+        km_range: Tuple[float, float],
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions and distances of the k nearest listings of one partition within the ranges"""
+        years = partition.features[:, 0]
+        used = ~np.isnan(query)
+        scales = self.FEATURE_SCALES[used]
+        target = query[used]
+        first = np.searchsorted(years, an_range[0], side='left')
+        last = np.searchsorted(years, an_range[1], side='right')
+        radius = self.INITIAL_YEAR_WINDOW  # In distance units
+
+        while True:
+            lo = max(np.searchsorted(years, query[0] - radius * self.FEATURE_SCALES[0], side='left'), first)
+            hi = min(np.searchsorted(years, query[0] + radius * self.FEATURE_SCALES[0], side='right'), last)
+            window = partition.features[lo:hi]
+            positions = lo + np.flatnonzero((window[:, 1] >= km_range[0]) & (window[:, 1] <= km_range[1]))
+            diff = (partition.features[positions][:, used] - target) / scales
+            distances = np.sqrt(np.square(np.where(np.isnan(diff), self.MISSING_PENALTY, diff)).sum(axis=1))
+            complete = lo <= first and hi >= last
+
+            if distances.size >= k or complete:
+                top = np.argpartition(distances, k - 1)[:k] if distances.size > k else np.arange(distances.size)
+                kth = distances[top].max() if top.size else 0.0
+                # The year term alone puts everything outside the window beyond kth
+                if complete or kth <= radius:
+                    return positions[top], distances[top]
+                radius = kth
+            else:
+                radius *= 2
+
+    def nearest(
+        self,
+        marca: str,
+        model: str,
+        an: int,
+        km: int,
+        combustibil: Optional[str] = None,
+        transmisie: Optional[str] = None,
+        caroserie: Optional[str] = None,
+        an_min: Optional[int] = None,
+        an_max: Optional[int] = None,
+        km_min: Optional[int] = None,
+        km_max: Optional[int] = None,
+        putere_cp: Optional[int] = None,
+        capacitate_cilindrica: Optional[int] = None,
+        k: int = DEFAULT_K,
+    ) -> Optional[List[Dict]]:
+        """
+        The k active listings most similar to a car
+
+        Args:
+            marca, model: Segment (matched through search keys)
+            an, km: Target year and mileage
+            combustibil, transmisie, caroserie: Restrict to these partitions
+                (default: all)
+            an_min, an_max, km_min, km_max: Only listings inside these ranges
+                (default: unbounded)
+            putere_cp, capacitate_cilindrica: Extra features, when known
+            k: Comparables wanted
+
+        Returns:
+            Up to k {'id', 'an', 'km', 'putere_cp', 'capacitate_cilindrica',
+            'pret', 'distance'} dicts, nearest first; None before the index
+            is loaded
+        """
+        if not self.loaded:
+            return None
+
+        segment = self._segments.get((search_keys.marca_key(marca), search_keys.series_key(marca, model) or ''), {})
+        fuel = (combustibil or '').lower()
+        gearbox = (transmisie or '').lower()
+        body = (caroserie or '').lower()
+        partitions = [
+            partition for (partition_fuel, partition_gearbox, partition_body), partition in segment.items()
+            if (not fuel or partition_fuel == fuel)
+            and (not gearbox or partition_gearbox == gearbox)
+            and (not body or partition_body == body)
+        ]
+        an_range = (-np.inf if an_min is None else an_min, np.inf if an_max is None else an_max)
+        km_range = (km_min or 0, np.inf if km_max is None else km_max)
+
+        query = np.array(
+            [an, km, np.nan if putere_cp is None else putere_cp,
+             np.nan if capacitate_cilindrica is None else capacitate_cilindrica],
+            dtype=float
+        )
+        candidates = []
+        for partition in partitions:
+            positions, distances = self._nearest_in(partition, query, k, an_range, km_range)
+            candidates.extend(zip(distances.tolist(), [partition] * positions.size, positions.tolist()))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        comparables = []
+        for distance, partition, position in candidates[:k]:
+            values = partition.features[position]
+            comparable = {'id': int(partition.ids[position])}
+            comparable.update({
+                name: None if np.isnan(value) else int(value)
+                for name, value in zip(self.FEATURES, values.tolist())
+            })
+            comparable['pret'] = float(partition.prices[position])
+            comparable['distance'] = round(distance, 3)
+            comparables.append(comparable)
+        return comparables
+
+    async def apply_changes(self, segments: Optional[List[Segment]]):
+        """
+        ListingChanges handler: reload the written segments (None = rebuild)
+
+        Only in processes that serve comparables (index built or being built).
+        """
+        if not self.loaded and self._task is None:
+            return
+        if segments is None:
+            await self.refresh_all()
+        else:
+            await self.refresh_segments((marca_key, series_key) for marca_key, series_key, _ in segments)
+
+    async def _run(self):
+        while True:
+            try:
+                count = await self.refresh_all()
+                print(f"✓ Comparables index: {count} active listings")
+            except Exception as e:
+                print(f"Error building comparables index: {e}")
+            await asyncio.sleep(self.REBUILD_INTERVAL_SECONDS)
+
+    def start(self):
+        """Build the index in the background and rebuild it periodically (API startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+comparables_index = ComparablesIndex()
+listing_changes.subscribe(comparables_index.apply_changes)
@@ -0,0 +1,288 @@
+"""
+Depreciation Model - Per-segment depreciation and km-penalty curves
+Trained offline from `listings` (train_depreciation_model.py) into a compact
+coefficient table; the API keeps the published table in memory, so a
+prediction is two dict lookups and no database query
+"""
+import asyncio
+import json
+import math
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.database import database
+from app.services.search_keys import search_keys
+
+
+class DepreciationModel:
+    """
+    log(price) = intercept + age_coef * age + km_coef * km / 10000
+
+    One coefficient row per segment (marca_key + series_key) and per brand
+    (marca_key, pooled over its segments). `exp(age_coef)` is the share of
+    value kept per year, `exp(km_coef)` per 10,000 km at the same age.
+
+    Training only reads sufficient statistics (sums of products) grouped in
+    Postgres, so the fit is a 3x3 solve per segment whatever the table size.
+
+    Published tables live in MODEL_DIR as `<version>.json`; the LATEST file
+    names the one to serve. `start` polls LATEST and swaps in a newly
+    published version without a restart.
+    """
+
+    DEFAULT_DIR = 'models/depreciation'
+    LATEST_FILE = 'LATEST'
+    RELOAD_INTERVAL_SECONDS = 30
+
+    TRAINING_WINDOW_DAYS = 365   # Asking prices older than this are ignored
+    PRICE_FLOOR = 500            # EUR - same floor as the market_stats cube
+    MAX_AGE = 30                 # Years
+    MAX_KM = 500000
+
+    MIN_SEGMENT_LISTINGS = 30
+    MIN_BRAND_LISTINGS = 50
+    MIN_AGE_VARIANCE = 1.0       # years^2 - below that the age slope is noise
+    MAX_FEATURE_CORRELATION = 0.95  # age vs km; above that they can't be told apart
+
+    # Plausible curves: up to 40% value lost per year, 20% per 10,000 km
+    MIN_AGE_COEF = math.log(1 - 0.40)
+    MIN_KM_COEF = math.log(1 - 0.20)
+
+    def __init__(self, model_dir: Optional[str] = None):
+        """
+        Args:
+            model_dir: Published tables (default: DEPRECIATION_MODEL_DIR env var)
+        """
+        self.model_dir = model_dir or os.getenv('DEPRECIATION_MODEL_DIR', self.DEFAULT_DIR)
+        self._table: Optional[Dict] = None
+        self._latest_mtime: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- Training ----
+
+    async def train(self) -> Dict:
+        """
+        Fit the coefficient table from `listings`
+
+        Returns:
+            Table ready for `publish` ('version', 'trained_at', 'segments',
+            'brands'; rows are [intercept, age_coef, km_coef, n, rmse])
+        """
+        now = datetime.now(timezone.utc)
+        rows = await database.fetch_all(
+            f"""
+            SELECT
+                marca_key,
+                series_key,
+                COUNT(*) AS n,
+                SUM(age) AS sa, SUM(kmx) AS sk, SUM(y) AS sy,
+                SUM(age * age) AS saa, SUM(age * kmx) AS sak, SUM(kmx * kmx) AS skk,
+                SUM(age * y) AS say, SUM(kmx * y) AS sky, SUM(y * y) AS syy
+            FROM (
+                SELECT
+                    marca_key,
+                    COALESCE(series_key, '') AS series_key,
+                    (:year - an)::float8 AS age,
+                    km / 10000.0::float8 AS kmx,
+                    LN(pret::float8) AS y
+                FROM listings
+                WHERE marca_key IS NOT NULL
+                    AND pret >= {self.PRICE_FLOOR}
+                    AND an BETWEEN :year - {self.MAX_AGE} AND :year
+                    AND km BETWEEN 0 AND {self.MAX_KM}
+                    AND data_scrape >= NOW() - INTERVAL '{self.TRAINING_WINDOW_DAYS} days'
+            ) AS samples
+            GROUP BY 1, 2
+            """,
+            {'year': now.year}
+        )
+
+        keys = [(row['marca_key'], row['series_key']) for row in rows]
+        sums = np.array(
+            [[row[c] for c in ('n', 'sa', 'sk', 'sy', 'saa', 'sak', 'skk', 'say', 'sky', 'syy')] for row in rows],
+            dtype=float
+        ).reshape(-1, 10)
+
+        # Sums are additive: a brand's are the sum over its segments
+        brands = sorted({marca for marca, _ in keys})
+        position = {marca: i for i, marca in enumerate(brands)}
+        brand_index = np.array([position[marca] for marca, _ in keys], dtype=int)
+        brand_sums = np.zeros((len(brands), 10))
+        np.add.at(brand_sums, brand_index, sums)
+
+        segments = {
+            f"{marca}|{series}": row
+            for (marca, series), row in zip(keys, self._fit(sums, self.MIN_SEGMENT_LISTINGS))
+            if series and row is not None
+        }
+        brand_rows = {
+            marca: row
+            for marca, row in zip(brands, self._fit(brand_sums, self.MIN_BRAND_LISTINGS))
+            if row is not None
+        }
+
+        return {
+            'version': now.strftime('%Y%m%dT%H%M%SZ'),
+            'trained_at': now.isoformat(),
+            'samples': int(sums[:, 0].sum()),
+            'segments': segments,
+            'brands': brand_rows,
+        }
+
+    def _fit(self, sums: np.ndarray, min_listings: int):
+        """Least-squares coefficients per row of sufficient statistics (None = rejected)"""
+        n, sa, sk, sy, saa, sak, skk, say, sky, syy = sums.T
+        safe_n = np.maximum(n, 1)
+        var_age = saa / safe_n - (sa / safe_n) ** 2
+        var_km = skk / safe_n - (sk / safe_n) ** 2
+        cov = sak / safe_n - (sa / safe_n) * (sk / safe_n)
+        usable = (
+            (n >= min_listings)
+            & (var_age >= self.MIN_AGE_VARIANCE)
+            & (var_km > 0)
+            & (cov ** 2 < self.MAX_FEATURE_CORRELATION ** 2 * var_age * np.maximum(var_km, 1e-12))
+        )
+
+        results = [None] * len(n)
+        if not usable.any():
+            return results
+
+        xtx = np.stack([
+            np.stack([n, sa, sk], axis=-1),
+            np.stack([sa, saa, sak], axis=-1),
+            np.stack([sk, sak, skk], axis=-1),
+        ], axis=1)[usable]
+        xty = np.stack([sy, say, sky], axis=-1)[usable]
+        beta = np.linalg.solve(xtx, xty[..., None])[..., 0]
+
+        # Residual sum of squares from the same sums: y'y - 2b'X'y + b'X'Xb
+        sse = syy[usable] - 2 * np.einsum('ij,ij->i', beta, xty) + np.einsum('ij,ijk,ik->i', beta, xtx, beta)
+        rmse = np.sqrt(np.maximum(sse, 0) / n[usable])
+
+        for i, b, err in zip(np.flatnonzero(usable), beta, rmse):
+            intercept, age_coef, km_coef = b.tolist()
+            if self.MIN_AGE_COEF <= age_coef <= 0 and self.MIN_KM_COEF <= km_coef <= 0:
+                results[i] = [
+                    round(intercept, 6), round(age_coef, 6), round(km_coef, 6),
+                    int(n[i]), round(float(err), 4),
+                ]
+        return results
+
+    def publish(self, table: Dict) -> str:
+        """
+        Write a table as `<version>.json` and point LATEST at it
+
+        Both writes go through a temporary file and os.replace, so a running
+        API never reads a half-written file.
+
+        Returns:
+            Path of the published table
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        path = os.path.join(self.model_dir, f"{table['version']}.json")
+        self._write_atomic(path, json.dumps(table, separators=(',', ':')))
+        self._write_atomic(os.path.join(self.model_dir, self.LATEST_FILE), table['version'] + '\n')
+        return path
+
+    @staticmethod
+    def _write_atomic(path: str, text: str):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    # ---- Serving ----
+
+    @property
+    def version(self) -> Optional[str]:
+        return self._table['version'] if self._table else None
+
+    def load(self) -> bool:
+        """
+        Load the version named by LATEST if it is not the one in memory
+
+        Returns:
+            True if a new table was swapped in
+        """
+        latest = os.path.join(self.model_dir, self.LATEST_FILE)
+        try:
+            mtime = os.stat(latest).st_mtime
+            if mtime == self._latest_mtime:
+                return False
+            with open(latest, encoding='utf-8') as f:
+                version = f.read().strip()
+            if version == self.version:
+                self._latest_mtime = mtime
+                return False
+            with open(os.path.join(self.model_dir, f"{version}.json"), encoding='utf-8') as f:
+                table = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            print(f"Error loading depreciation model: {e}")
+            return False
+
+        self._table = table  # Single assignment: readers see the old or the new table
+        self._latest_mtime = mtime
+        print(f"✓ Depreciation model {version} loaded "
+              f"({len(table['segments'])} segments, {len(table['brands'])} brands)")
+        return True
+
+    def predict(self, marca: str, model: str, an: int, km: int) -> Optional[Dict]:
+        """
+        Predicted price from the series curve, else the brand curve
+
+        Returns:
+            {'price', 'level' ('series'/'brand'), 'sample_size', 'rmse',
+             'version'}, or None without a table or a curve for the brand
+        """
+        table = self._table
+        if table is None:
+            return None
+
+        marca_key = search_keys.marca_key(marca)
+        level = 'series'
+        row = table['segments'].get(f"{marca_key}|{search_keys.series_key(marca, model)}")
+        if row is None:
+            level = 'brand'
+            row = table['brands'].get(marca_key)
+        if row is None:
+            return None
+
+        intercept, age_coef, km_coef, n, rmse = row
+        age = min(max(datetime.now().year - an, 0), self.MAX_AGE)
+        km_10k = min(max(km, 0), self.MAX_KM) / 10000
+        return {
+            'price': math.exp(intercept + age_coef * age + km_coef * km_10k),
+            'level': level,
+            'sample_size': n,
+            'rmse': rmse,
+            'version': table['version'],
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.RELOAD_INTERVAL_SECONDS)
+            await asyncio.to_thread(self.load)
+
+    def start(self):
+        """Load the published table and watch for new versions (API startup)"""
+        self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instance
+depreciation_model = DepreciationModel()
@@ -1,11 +1,15 @@
 """
 Flexible Price Analyzer - Funcționează pentru ORICE mașină
-Folosește sistem de fallback pe 3 nivele + calcul generic
+Folosește sistem de fallback pe 3 nivele: date exacte, date similare, apoi
+modelul de depreciere antrenat (sau formula generică, dacă lipsește)
 """
-import numpy as np
+import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict
+import sqlalchemy
+from app.analysis.depreciation_model import depreciation_model
 from app.database import database, listings
+from app.services.search_keys import search_keys
 
 class FlexiblePriceAnalyzer:
     """Analizor de prețuri flexibil cu fallback inteligent"""
@@ -56,6 +60,10 @@ class FlexiblePriceAnalyzer:
         'convertible': 50000       # Convertibles
     }
 
+    # Listings a database tier needs before it is trusted
+    MIN_EXACT_LISTINGS = 3
+    MIN_SIMILAR_LISTINGS = 5
+
     def __init__(self):
         pass
 
@@ -137,52 +145,72 @@ class FlexiblePriceAnalyzer:
         """
         Calculează prețul cu sistem de fallback pe 3 nivele
         GARANTAT să returneze un preț, nu aruncă niciodată eroare!
+
+        Nivelele 1 și 2 vin dintr-o singură interogare (search_database_tiers);
+        primul nivel satisfăcut oprește căutarea. Durata fiecărui pas e în
+        market_data['tier_timings_ms'].
         """
         if dotari_list is None:
             dotari_list = []
 
         sources = []
+        timings = {}
 
-        # NIVEL 1: Try exact match in database
+        # NIVEL 1 + 2: exact and similar match, one round trip
+        start = time.perf_counter()
         try:
-            db_result = await self.search_exact_database(marca, model, an, km)
-            if db_result and db_result['count'] >= 3:
+            tiers = await self.search_database_tiers(marca, model, an, km)
+        except Exception as e:
+            print(f"Database tiers failed: {e}")
+            tiers = None
+        timings['database'] = round((time.perf_counter() - start) * 1000, 2)
+
+        if tiers and tiers['exact_count'] >= self.MIN_EXACT_LISTINGS:
+            sources.append({
+                'level': 1,
+                'source': 'database_exact',
+                'price': round(tiers['exact_avg'], 2),
+                'confidence': 95,
+                'sample_size': tiers['exact_count'],
+                'description': f'Date reale din {tiers["exact_count"]} anunțuri similare'
+            })
+        elif tiers and tiers['similar_count'] >= self.MIN_SIMILAR_LISTINGS:
+            sources.append({
+                'level': 2,
+                'source': 'database_similar',
+                'price': round(tiers['similar_avg'], 2),
+                'confidence': 75,
+                'sample_size': tiers['similar_count'],
+                'description': f'Date din {tiers["similar_count"]} mașini similare'
+            })
+        else:
+            # NIVEL 3: Trained depreciation curves (in memory, no query)
+            start = time.perf_counter()
+            prediction = depreciation_model.predict(marca, model, an, km)
+            timings['depreciation_model'] = round((time.perf_counter() - start) * 1000, 2)
+            if prediction:
+                scope = 'seriei' if prediction['level'] == 'series' else 'mărcii'
                 sources.append({
-                    'level': 1,
-                    'source': 'database_exact',
-                    'price': db_result['avg_price'],
-                    'confidence': 95,
-                    'sample_size': db_result['count'],
-                    'description': f'Date reale din {db_result["count"]} anunțuri similare'
+                    'level': 3,
+                    'source': 'depreciation_model',
+                    'price': round(prediction['price'], -2),
+                    'confidence': 70 if prediction['level'] == 'series' else 65,
+                    'sample_size': prediction['sample_size'],
+                    'description': f'Curba de depreciere a {scope}, antrenată pe {prediction["sample_size"]} anunțuri'
                 })
-        except Exception as e:
-            print(f"Level 1 failed: {e}")
-
-        # NIVEL 2: Try similar match (same brand, similar year, similar km)
-        try:
-            similar_result = await self.search_similar_database(marca, model, an, km)
-            if similar_result and similar_result['count'] >= 5:
+            else:
+                # Generic depreciation formula (ALWAYS works)
+                start = time.perf_counter()
+                generic_price = self.calculate_generic_depreciation(marca, model, an, km)
+                timings['generic_formula'] = round((time.perf_counter() - start) * 1000, 2)
                 sources.append({
-                    'level': 2,
-                    'source': 'database_similar',
-                    'price': similar_result['avg_price'],
-                    'confidence': 75,
-                    'sample_size': similar_result['count'],
-                    'description': f'Date din {similar_result["count"]} mașini similare'
+                    'level': 3,
+                    'source': 'generic_formula',
+                    'price': generic_price,
+                    'confidence': 60,
+                    'sample_size': 0,
+                    'description': 'Calcul bazat pe formula standard de depreciere'
                 })
-        except Exception as e:
-            print(f"Level 2 failed: {e}")
-
-        # NIVEL 3: Generic depreciation formula (ALWAYS works)
-        generic_price = self.calculate_generic_depreciation(marca, model, an, km)
-        sources.append({
-            'level': 3,
-            'source': 'generic_formula',
-            'price': generic_price,
-            'confidence': 60,
-            'sample_size': 0,
-            'description': 'Calcul bazat pe formula standard de depreciere'
-        })
 
         # Use best available source (lowest level = highest confidence)
         best_source = min(sources, key=lambda x: x['level'])
@@ -208,55 +236,45 @@ class FlexiblePriceAnalyzer:
                 'confidence': best_source['confidence'],
                 'description': best_source['description'],
                 'sample_size': best_source['sample_size'],
-                'all_sources': sources
+                'all_sources': sources,
+                'tier_timings_ms': timings
             }
         }
 
-    async def search_exact_database(self, marca: str, model: str, an: int, km: int) -> Optional[Dict]:
-        """Search exact match in database"""
-        query = listings.select().where(
-            (listings.c.marca.ilike(f"%{marca}%")) &
-            (listings.c.model.ilike(f"%{model}%")) &
-            (listings.c.an.between(an - 1, an + 1)) &
-            (listings.c.km.between(max(0, km - 20000), km + 20000)) &
-            (listings.c.este_activ == True)
-        )
-
-        results = await database.fetch_all(query)
-
-        if not results or len(results) < 3:
-            return None
+    async def search_database_tiers(self, marca: str, model: str, an: int, km: int) -> Dict:
+        """
+        Level 1 (exact) and level 2 (similar) aggregates in one query
 
-        prices = [r['pret'] for r in results]
-        return {
-            'avg_price': round(np.mean(prices), 2),
-            'count': len(results)
-        }
+        The exact criteria are a subset of the similar ones, so a single scan
+        of the similar listings yields both, the exact tier through FILTER.
 
-    async def search_similar_database(self, marca: str, model: str, an: int, km: int) -> Optional[Dict]:
-        """Search similar vehicles (broader criteria)"""
-        query = listings.select().where(
-            (listings.c.marca.ilike(f"%{marca}%")) &
+        Returns:
+            {'exact_count', 'exact_avg', 'similar_count', 'similar_avg'}
+        """
+        price = listings.c.pret
+        exact = sqlalchemy.and_(
+            listings.c.series_key == search_keys.series_key(marca, model),
+            listings.c.an.between(an - 1, an + 1),
+            listings.c.km.between(max(0, km - 20000), km + 20000),
+        )
+        query = sqlalchemy.select([
+            sqlalchemy.func.count(price).filter(exact).label('exact_count'),
+            sqlalchemy.func.avg(price).filter(exact).label('exact_avg'),
+            sqlalchemy.func.count(price).label('similar_count'),
+            sqlalchemy.func.avg(price).label('similar_avg'),
+        ]).where(
+            (listings.c.marca_key == search_keys.marca_key(marca)) &
             (listings.c.an.between(an - 3, an + 3)) &
             (listings.c.km.between(max(0, km - 50000), km + 50000)) &
             (listings.c.este_activ == True)
         )
-
-        results = await database.fetch_all(query)
-
-        if not results or len(results) < 5:
-            return None
-
-        prices = [r['pret'] for r in results]
-        return {
-            'avg_price': round(np.mean(prices), 2),
-            'count': len(results)
-        }
+        return dict(await database.fetch_one(query))
 
     def calculate_generic_depreciation(self, marca: str, model: str, an: int, km: int) -> float:
         """
         Calculate price using generic depreciation formula
         ALWAYS returns a price - fallback guaranteed!
+        Only used when the trained depreciation model has no curve for the brand
         """
         # Get brand category and depreciation rate
         brand_cat = self.get_brand_category(marca)
@@ -0,0 +1,334 @@
+"""
+Market Stats - Precomputed price statistics per market segment
+One row per (marca, model, an, combustibil, transmisie, caroserie, km bucket)
+with count, price sum, a log-scale price histogram and an hourly histogram of
+recent scrape times, so an analysis reads a few pre-aggregated rows instead
+of every matching listing
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import sqlalchemy
+
+from app.analysis.price_stats import price_stats
+from app.database import database, market_stats
+from app.services.search_keys import search_keys
+
+
+class MarketStatsCube:
+    """
+    Maintains the `market_stats` table and answers range queries from it
+
+    Histograms use geometric price bins (each BIN_RATIO wider than the last),
+    so cells can be merged by adding counts and quantiles come out within
+    about half a bin (~2.5%) of the exact value.
+
+    Freshness is checked when the cube is read, not when it is refreshed:
+    each cell keeps how many of its listings were scraped in each of the
+    last DATA_FRESHNESS_HOURS hours, and `merge` only counts the hours that
+    are still entirely inside the window.
+
+    Refreshes are per segment (listings.marca_key + series_key): ScraperService
+    refreshes the segments it just wrote, `refresh_all` rebuilds everything.
+    Cells are computed and replaced in one transaction under an advisory
+    lock (exclusive per segment, shared against `refresh_all`), so
+    concurrent refreshes from the API and the workers never interleave
+    their DELETE and INSERT and leave duplicate cells.
+    """
+
+    PRICE_FLOOR = 500.0      # EUR - lower edge of bin 0
+    BIN_RATIO = 1.05         # Upper edge / lower edge of every bin
+    PRICE_BINS = 142         # 500 * 1.05^142 ~= 500k EUR, the scrapers' price ceiling
+
+    KM_BUCKET = 5000         # km per bucket
+    MAX_KM_BUCKET = 100      # 500k km and above share the last bucket
+    UNKNOWN_KM_BUCKET = -1   # Listings without km
+
+    DATA_FRESHNESS_HOURS = 24  # Same window as SmartPriceAnalyzer
+
+    INSERT_BATCH_SIZE = 500  # Cells per INSERT (asyncpg parameter cap)
+
+    LOCK_NAMESPACE = 'market_stats'  # Advisory lock keys: hashtext(namespace), hashtext(segment)
+
+    # Cell key columns, as produced by `_cell_select`
+    KEY_COLUMNS = [
+        'marca_key', 'model_series_key', 'model_key', 'an',
+        'combustibil', 'transmisie', 'caroserie', 'km_bucket',
+    ]
+
+    def __init__(self):
+        self._log_ratio = math.log(self.BIN_RATIO)
+
+    def _cell_select(self, segment_filter: str = "", group: str = "price_bin") -> str:
+        """
+        GROUP BY cell + `group` over active listings
+
+        Args:
+            segment_filter: Extra WHERE conditions
+            group: 'price_bin' for the price histogram, 'scrape_hour' for
+                the recent scrape times (listings scraped since :fresh_cutoff)
+        """
+        if group == 'price_bin':
+            group_column = f"""LEAST(GREATEST(
+                    FLOOR(LN(GREATEST(pret, {self.PRICE_FLOOR}) / {self.PRICE_FLOOR}) / {self._log_ratio}),
+                    0), {self.PRICE_BINS - 1})::int AS price_bin,
+                COUNT(*) AS n,
+                SUM(pret) AS price_sum,
+                MIN(pret) AS price_min,
+                MAX(pret) AS price_max,
+                MAX(data_scrape) AS last_scrape"""
+        else:
+            group_column = """FLOOR(EXTRACT(EPOCH FROM data_scrape) / 3600)::bigint AS scrape_hour,
+                COUNT(*) AS n"""
+            segment_filter += "\n                AND data_scrape >= :fresh_cutoff"
+        return f"""
+            SELECT
+                marca_key,
+                COALESCE(series_key, '') AS model_series_key,
+                LOWER(COALESCE(model, '')) AS model_key,
+                an,
+                LOWER(COALESCE(combustibil, '')) AS combustibil,
+                LOWER(COALESCE(transmisie, '')) AS transmisie,
+                LOWER(COALESCE(caroserie, '')) AS caroserie,
+                CASE WHEN km IS NULL THEN {self.UNKNOWN_KM_BUCKET}
+                     ELSE LEAST(km / {self.KM_BUCKET}, {self.MAX_KM_BUCKET}) END AS km_bucket,
+                {group_column}
+            FROM listings
+            WHERE este_activ = true
+                AND pret IS NOT NULL
+                AND marca_key IS NOT NULL
+                AND an IS NOT NULL
+                {segment_filter}
+            GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+        """
+
+    @staticmethod
+    def _hour(moment: datetime) -> float:
+        """Hours since the epoch, like EXTRACT(EPOCH FROM timestamp) / 3600"""
+        return (moment - datetime(1970, 1, 1)).total_seconds() / 3600
+
+    async def _fetch_cells(self, segment_filter: str = "", params: Optional[Dict] = None) -> List[Dict]:
+        params = params or {}
+        rows = await database.fetch_all(self._cell_select(segment_filter), params)
+        fresh_rows = await database.fetch_all(self._cell_select(segment_filter, 'scrape_hour'), {
+            **params,
+            'fresh_cutoff': datetime.now() - timedelta(hours=self.DATA_FRESHNESS_HOURS),
+        })
+        return self._build_cells(rows, fresh_rows)
+
+    def _build_cells(self, rows, fresh_rows=()) -> List[Dict]:
+        """Fold (cell, price bin) and (cell, scrape hour) rows into one market_stats row per cell"""
+        refreshed_at = datetime.now()
+        cells = {}
+        for row in rows:
+            key = tuple(row[column] for column in self.KEY_COLUMNS)
+            cell = cells.get(key)
+            if cell is None:
+                cell = dict(zip(self.KEY_COLUMNS, key))
+                cell.update({
+                    'count': 0, 'price_sum': 0.0,
+                    'price_min': row['price_min'], 'price_max': row['price_max'],
+                    'histogram': {}, 'fresh_hours': [], 'last_scrape': row['last_scrape'],
+                    'refreshed_at': refreshed_at,
+                })
+                cells[key] = cell
+
+            cell['count'] += row['n']
+            cell['price_sum'] += row['price_sum']
+            cell['price_min'] = min(cell['price_min'], row['price_min'])
+            cell['price_max'] = max(cell['price_max'], row['price_max'])
+            cell['histogram'][row['price_bin']] = cell['histogram'].get(row['price_bin'], 0) + row['n']
+            if row['last_scrape'] and (cell['last_scrape'] is None or row['last_scrape'] > cell['last_scrape']):
+                cell['last_scrape'] = row['last_scrape']
+
+        for row in fresh_rows:
+            cell = cells.get(tuple(row[column] for column in self.KEY_COLUMNS))
+            if cell is not None:
+                cell['fresh_hours'].append([row['scrape_hour'], row['n']])
+
+        for cell in cells.values():
+            # Sparse [[bin, count], ...] - JSON object keys would be strings
+            cell['histogram'] = sorted(cell['histogram'].items())
+            cell['fresh_hours'].sort()
+        return list(cells.values())
+
+    async def refresh_segments(self, segments: Iterable[Tuple[str, Optional[str]]]) -> int:
+        """
+        Recompute the cells of the given segments
+
+        Args:
+            segments: (marca_key, series_key) pairs whose listings changed
+
+        Returns:
+            Number of cells written
+        """
+        keys = {
+            (marca_key, series_key or '')
+            for marca_key, series_key in segments
+            if marca_key
+        }
+        written = 0
+        for marca_key, series_key in keys:
+            written += await self._refresh_segment(marca_key, series_key)
+        return written
+
+    async def _lock(self, segment: Optional[str] = None):
+        """
+        Take the refresh lock for the current transaction
+
+        A segment refresh holds its segment's lock plus the shared cube lock,
+        `refresh_all` (segment None) the exclusive cube lock. Cells are read
+        after the lock is granted, so a waiting refresh sees the listings the
+        one before it saw, or newer.
+        """
+        if segment is None:
+            await database.execute(
+                "SELECT pg_advisory_xact_lock(hashtext(:namespace), 0)", {'namespace': self.LOCK_NAMESPACE}
+            )
+            return
+        await database.execute(
+            "SELECT pg_advisory_xact_lock_shared(hashtext(:namespace), 0)", {'namespace': self.LOCK_NAMESPACE}
+        )
+        await database.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(:namespace), hashtext(:segment))",
+            {'namespace': self.LOCK_NAMESPACE, 'segment': segment}
+        )
+
+    async def _refresh_segment(self, marca_key: str, series_key: str) -> int:
+        async with database.transaction():
+            await self._lock(f"{marca_key}/{series_key}")
+            cells = await self._fetch_cells(
+                "AND marca_key = :marca_key AND COALESCE(series_key, '') = :series_key",
+                {'marca_key': marca_key, 'series_key': series_key}
+            )
+            await database.execute(
+                market_stats.delete().where(
+                    (market_stats.c.marca_key == marca_key) &
+                    (market_stats.c.model_series_key == series_key)
+                )
+            )
+            await self._insert_cells(cells)
+        return len(cells)
+
+    async def refresh_all(self) -> int:
+        """Rebuild the whole cube (after bulk changes such as cleanup_inactive_listings)"""
+        async with database.transaction():
+            await self._lock()
+            cells = await self._fetch_cells()
+            await database.execute(market_stats.delete())
+            await self._insert_cells(cells)
+        return len(cells)
+
+    async def _insert_cells(self, cells: List[Dict]):
+        for start in range(0, len(cells), self.INSERT_BATCH_SIZE):
+            await database.execute(market_stats.insert().values(cells[start:start + self.INSERT_BATCH_SIZE]))
+
+    async def get_stats(
+        self,
+        marca: str,
+        model: str,
+        an_min: int,
+        an_max: int,
+        km_min: Optional[int] = None,
+        km_max: Optional[int] = None,
+        combustibil: Optional[str] = None,
+        transmisie: Optional[str] = None,
+        caroserie: Optional[str] = None,
+    ) -> Dict:
+        """
+        Merge the cells matching an analysis request
+
+        Same predicates as the listing query it replaces, on the normalized
+        keys; the km range is widened to whole buckets.
+
+        Returns:
+            {'count', 'fresh_count', 'last_scrape', 'price_mean', 'price_min',
+             'price_max', 'p10', 'p25', 'p50', 'p75', 'p90'} - quantiles are
+            None when count is 0
+        """
+        c = market_stats.c
+        conditions = [
+            c.marca_key == search_keys.marca_key(marca),
+            (c.model_series_key == search_keys.series_key(marca, model)) | c.model_key.like(f'%{model.lower()}%'),
+            c.an.between(an_min, an_max),
+        ]
+
+        if km_min and km_max:
+            conditions.append(c.km_bucket.between(
+                min(km_min // self.KM_BUCKET, self.MAX_KM_BUCKET),
+                min(km_max // self.KM_BUCKET, self.MAX_KM_BUCKET)
+            ))
+
+        if combustibil:
+            conditions.append(c.combustibil == combustibil.lower())
+
+        if transmisie:
+            conditions.append(c.transmisie == transmisie.lower())
+
+        if caroserie:
+            conditions.append(c.caroserie == caroserie.lower())
+
+        # Table select (not raw SQL) so the JSON histogram comes back decoded
+        query = sqlalchemy.select([
+            c.count, c.price_sum, c.price_min, c.price_max,
+            c.histogram, c.fresh_hours, c.last_scrape,
+        ]).where(sqlalchemy.and_(*conditions))
+
+        rows = await database.fetch_all(query)
+        return self.merge(rows)
+
+    def merge(self, rows, now: Optional[datetime] = None) -> Dict:
+        """
+        Combine cells into one summary with approximate quantiles
+
+        fresh_count only counts scrape hours that lie entirely inside the
+        last DATA_FRESHNESS_HOURS (as of `now`), so it never includes
+        listings older than the window - at worst it misses the oldest hour.
+        """
+        first_fresh_hour = math.ceil(
+            self._hour((now or datetime.now()) - timedelta(hours=self.DATA_FRESHNESS_HOURS))
+        )
+        counts = np.zeros(self.PRICE_BINS, dtype=np.int64)
+        total = 0
+        fresh = 0
+        price_sum = 0.0
+        price_min = None
+        price_max = None
+        last_scrape = None
+
+        for row in rows:
+            total += row['count']
+            price_sum += row['price_sum']
+            fresh += sum(n for hour, n in row['fresh_hours'] or () if hour >= first_fresh_hour)
+            price_min = row['price_min'] if price_min is None else min(price_min, row['price_min'])
+            price_max = row['price_max'] if price_max is None else max(price_max, row['price_max'])
+            if row['last_scrape'] and (last_scrape is None or row['last_scrape'] > last_scrape):
+                last_scrape = row['last_scrape']
+            for price_bin, n in row['histogram']:
+                counts[price_bin] += n
+
+        summary = {
+            'count': total,
+            'fresh_count': fresh,
+            'last_scrape': last_scrape,
+            'price_mean': price_sum / total if total else None,
+            'price_min': price_min,
+            'price_max': price_max,
+        }
+        names = ('p10', 'p25', 'p50', 'p75', 'p90')
+        if total:
+            # Never outside the exact extremes of the merged cells
+            values = price_stats.histogram_quantiles(
+                counts, (0.10, 0.25, 0.50, 0.75, 0.90),
+                self.PRICE_FLOOR, self.BIN_RATIO, price_min, price_max
+            )
+        else:
+            values = [None] * len(names)
+        summary.update(zip(names, values))
+        return summary
+
+
+# Global instance
+market_stats_cube = MarketStatsCube()
@@ -4,18 +4,17 @@
 # ============================================
 
 import numpy as np
+import sqlalchemy
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from sklearn.linear_model import LinearRegression
 
+from app.analysis.depreciation_model import depreciation_model
+from app.analysis.price_stats import price_stats
 from app.database import database, listings, car_models, dotari
 
 class PriceAnalyzer:
     """Analizează prețurile folosind date reale și ML"""
     
-    def __init__(self):
-        self.model = LinearRegression()
-    
     async def calculate_optimal_price(
         self,
         marca: str,
@@ -77,64 +76,39 @@ class PriceAnalyzer:
         Returns:
             Dict cu statistici piață
         """
-        # Obține anunțuri similare (±2 ani, ±30k km)
-        query = listings.select().where(
-            (listings.c.marca == marca) &
-            (listings.c.model == model) &
-            (listings.c.an.between(an - 2, an + 2)) &
-            (listings.c.km.between(max(0, km - 30000), km + 30000)) &
-            (listings.c.este_activ == True)
+        # Obține anunțuri similare (±2 ani, ±30k km), coloană cu coloană
+        columns = await price_stats.fetch_columns(
+            [
+                listings.c.marca == marca,
+                listings.c.model == model,
+                listings.c.an.between(an - 2, an + 2),
+                listings.c.km.between(max(0, km - 30000), km + 30000),
+                listings.c.este_activ == True,
+            ],
+            {
+                'pret': listings.c.pret,
+                'zile': price_stats.days_on_market(),
+                'locatie': sqlalchemy.func.coalesce(listings.c.locatie, 'Necunoscut'),
+            }
         )
-        
-        results = await database.fetch_all(query)
-        
-        if not results:
+
+        # Toate statisticile într-o singură trecere vectorizată
+        stats = price_stats.describe(columns['pret'], days=columns['zile'], groups=columns['locatie'])
+
+        if not stats['count']:
             raise ValueError(f"Nu s-au găsit suficiente date pentru {marca} {model}")
-        
-        # Calculează statistici
-        prices = [r['pret'] for r in results]
-        kms = [r['km'] for r in results]
-        anos = [r['an'] for r in results]
-        
-        # Statistici de bază
-        total_listings = len(prices)
-        price_mean = np.mean(prices)
-        price_median = np.median(prices)
-        price_std = np.std(prices)
-        price_min = np.min(prices)
-        price_max = np.max(prices)
-        
-        # Percentile
-        percentile_25 = np.percentile(prices, 25)
-        percentile_75 = np.percentile(prices, 75)
-        
-        # Calculează zile pe piață
-        days_on_market = []
-        now = datetime.now()
-        for r in results:
-            if r['data_publicare']:
-                days = (now - r['data_publicare']).days
-                days_on_market.append(days)
-        
-        days_on_market_avg = np.mean(days_on_market) if days_on_market else 0
-        
-        # Distribuție regională
-        regional_distribution = {}
-        for r in results:
-            loc = r['locatie']
-            regional_distribution[loc] = regional_distribution.get(loc, 0) + 1
-        
+
         return {
-            'total_listings': total_listings,
-            'price_mean': round(price_mean, 2),
-            'price_median': round(price_median, 2),
-            'price_std': round(price_std, 2),
-            'price_min': round(price_min, 2),
-            'price_max': round(price_max, 2),
-            'percentile_25': round(percentile_25, 2),
-            'percentile_75': round(percentile_75, 2),
-            'days_on_market_avg': round(days_on_market_avg, 1),
-            'regional_distribution': regional_distribution
+            'total_listings': stats['count'],
+            'price_mean': round(stats['mean'], 2),
+            'price_median': round(stats['median'], 2),
+            'price_std': round(stats['std'], 2),
+            'price_min': round(stats['min'], 2),
+            'price_max': round(stats['max'], 2),
+            'percentile_25': round(stats['p25'], 2),
+            'percentile_75': round(stats['p75'], 2),
+            'days_on_market_avg': round(stats['days_on_market_avg'], 1),
+            'regional_distribution': stats['group_counts']
         }
     
     async def _calculate_base_price(
@@ -168,19 +142,25 @@ class PriceAnalyzer:
             final_price = depreciated_price * km_factor
             
         else:
-            # Fallback: folosește mediana pieței
-            final_price = market_data['price_median']
+            # Curbele de depreciere antrenate pe anunțuri (an + km), din memorie
+            prediction = depreciation_model.predict(marca, model, an, km)
             
-            # Ajustare pentru kilometri
-            avg_km = 15000 * (datetime.now().year - an)  # 15k km/an medie
-            km_diff = km - avg_km
-            
-            if km_diff > 0:
-                # Mai mulți km = scădere preț
-                final_price *= (1 - (km_diff / 100000) * 0.05)
+            if prediction:
+                final_price = prediction['price']
             else:
-                # Mai puțini km = creștere preț
-                final_price *= (1 + abs(km_diff) / 100000 * 0.03)
+                # Fallback: folosește mediana pieței
+                final_price = market_data['price_median']
+                
+                # Ajustare pentru kilometri
+                avg_km = 15000 * (datetime.now().year - an)  # 15k km/an medie
+                km_diff = km - avg_km
+                
+                if km_diff > 0:
+                    # Mai mulți km = scădere preț
+                    final_price *= (1 - (km_diff / 100000) * 0.05)
+                else:
+                    # Mai puțini km = creștere preț
+                    final_price *= (1 + abs(km_diff) / 100000 * 0.03)
         
         return max(final_price, market_data['price_min'] * 0.8)
     
@@ -285,32 +265,37 @@ class PriceAnalyzer:
     async def get_market_overview(self, marca: str, model: str) -> Dict:
         """Obține o privire de ansamblu asupra pieței"""
         
-        query = listings.select().where(
-            (listings.c.marca == marca) &
-            (listings.c.model == model) &
-            (listings.c.este_activ == True)
+        # Agregat în Postgres: un singur rând, nu toate anunțurile
+        stats = await price_stats.aggregate(
+            [
+                listings.c.marca == marca,
+                listings.c.model == model,
+                listings.c.este_activ == True,
+            ],
+            {
+                'avg_year': sqlalchemy.func.avg(listings.c.an),
+                'newest_year': sqlalchemy.func.max(listings.c.an),
+                'oldest_year': sqlalchemy.func.min(listings.c.an),
+                'most_common_year': sqlalchemy.func.mode().within_group(listings.c.an),
+            }
         )
-        
-        results = await database.fetch_all(query)
-        
-        if not results:
+
+        if not stats['count']:
             return {
                 'total_listings': 0,
                 'message': 'Nu există date pentru această mașină'
             }
-        
-        prices = [r['pret'] for r in results]
-        anos = [r['an'] for r in results]
-        
+
         return {
-            'total_listings': len(results),
-            'avg_price': round(np.mean(prices), 2),
-            'median_price': round(np.median(prices), 2),
-            'min_price': round(np.min(prices), 2),
-            'max_price': round(np.max(prices), 2),
-            'avg_year': round(np.mean(anos), 1),
-            'newest_year': max(anos),
-            'oldest_year': min(anos)
+            'total_listings': stats['count'],
+            'avg_price': round(stats['mean'], 2),
+            'median_price': round(stats['median'], 2),
+            'min_price': round(stats['min'], 2),
+            'max_price': round(stats['max'], 2),
+            'avg_year': round(stats['avg_year'], 1),
+            'newest_year': stats['newest_year'],
+            'oldest_year': stats['oldest_year'],
+            'most_common_year': stats['most_common_year']
         }
     
     async def get_price_trends(
@@ -323,34 +308,28 @@ class PriceAnalyzer:
         
         cutoff_date = datetime.now() - timedelta(days=days)
         
-        query = listings.select().where(
-            (listings.c.marca == marca) &
-            (listings.c.model == model) &
-            (listings.c.data_scraping >= cutoff_date) &
-            (listings.c.este_activ == True)
-        ).order_by(listings.c.data_scraping.asc())
-        
-        results = await database.fetch_all(query)
-        
-        if not results:
+        columns = await price_stats.fetch_columns(
+            [
+                listings.c.marca == marca,
+                listings.c.model == model,
+                listings.c.data_scraping >= cutoff_date,
+                listings.c.este_activ == True,
+                listings.c.pret.isnot(None),
+            ],
+            {
+                'pret': listings.c.pret,
+                'week': sqlalchemy.cast(sqlalchemy.extract('week', listings.c.data_scraping), sqlalchemy.Integer),
+            }
+        )
+
+        if not columns['pret'].size:
             return {'message': 'Nu există date suficiente pentru tendințe'}
-        
-        # Grupează pe săptămână
-        weekly_prices = {}
-        for r in results:
-            week = r['data_scraping'].isocalendar()[1]
-            if week not in weekly_prices:
-                weekly_prices[week] = []
-            weekly_prices[week].append(r['pret'])
-        
-        # Calculează medie pe săptămână
-        trends = []
-        for week, prices in sorted(weekly_prices.items()):
-            trends.append({
-                'week': week,
-                'avg_price': round(np.mean(prices), 2),
-                'count': len(prices)
-            })
+
+        # Medie pe săptămână (ISO), vectorizat
+        trends = [
+            {'week': int(group['key']), 'avg_price': round(group['mean'], 2), 'count': group['count']}
+            for group in price_stats.group_stats(columns['week'], columns['pret'])
+        ]
         
         return {
             'trends': trends,
@@ -0,0 +1,191 @@
+"""
+Price Stats - Vectorized price statistics shared by the analyzers
+Listing columns arrive as whole arrays (one array_agg row from Postgres, no
+dict per listing) and every statistic is computed with NumPy in one pass;
+when only summary numbers are needed, Postgres computes them instead
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+
+from app.database import database, listings
+
+
+class PriceStatsEngine:
+    """
+    - `aggregate`: count, mean, std, min/max and percentiles computed in
+      Postgres - a single row comes back, whatever the number of listings
+    - `fetch_columns`: listing columns matching a filter, as NumPy arrays
+    - `describe`: count, mean, median, std, min/max, percentiles, trimmed
+      mean, dispersion, days on market and group counts
+    - `group_stats`: count and mean price per group key (e.g. week)
+    - `histogram_quantiles`: quantiles of a geometric price histogram
+      (market_stats cube)
+    """
+
+    PERCENTILES = (10, 25, 50, 75, 90)
+    TRIM_FRACTION = 0.10  # Cut from each end for the trimmed mean
+
+    @staticmethod
+    def days_on_market():
+        """Days since publication, computed in SQL (NULL when unknown)"""
+        return sqlalchemy.extract(
+            'epoch', sqlalchemy.func.localtimestamp() - listings.c.data_publicare
+        ) / 86400
+
+    async def aggregate(self, conditions: Sequence, extra: Optional[Dict[str, sqlalchemy.sql.ColumnElement]] = None) -> Dict:
+        """
+        Price summary of the listings matching `conditions`, computed in SQL
+
+        Args:
+            conditions: SQLAlchemy WHERE conditions on `listings`
+            extra: Additional aggregates by output name, e.g.
+                {'most_common_year': func.mode().within_group(listings.c.an)}
+
+        Returns:
+            {'count', 'mean', 'median', 'std', 'min', 'max', 'p10', 'p25',
+             'p50', 'p75', 'p90', **extra} - same meaning as `describe`;
+            everything but count is None when no listing has a price
+        """
+        price = listings.c.pret
+        columns = [
+            sqlalchemy.func.count(price).label('count'),
+            sqlalchemy.func.avg(price).label('mean'),
+            sqlalchemy.func.stddev_pop(price).label('std'),  # np.std (ddof=0)
+            sqlalchemy.func.min(price).label('min'),
+            sqlalchemy.func.max(price).label('max'),
+        ]
+        columns += [
+            sqlalchemy.func.percentile_cont(sqlalchemy.literal_column(str(p / 100))).within_group(price).label(f'p{p}')
+            for p in self.PERCENTILES
+        ]
+        columns += [expression.label(name) for name, expression in (extra or {}).items()]
+
+        row = await database.fetch_one(sqlalchemy.select(columns).where(sqlalchemy.and_(*conditions)))
+        summary = {
+            name: float(value) if isinstance(value, Decimal) else value
+            for name, value in dict(row).items()
+        }
+        summary['median'] = summary['p50']
+        return summary
+
+    async def fetch_columns(self, conditions: Sequence, columns: Dict[str, sqlalchemy.sql.ColumnElement]) -> Dict[str, np.ndarray]:
+        """
+        Columns of the listings matching `conditions`, one array per column
+
+        Args:
+            conditions: SQLAlchemy WHERE conditions on `listings`
+            columns: output name -> column/expression; numeric ones become
+                float arrays (NULL -> nan), text ones object arrays
+
+        Returns:
+            {name: np.ndarray}, all the same length, row-aligned (in id order)
+        """
+        # Each array_agg has its own order unless told otherwise - pin them all to id
+        query = sqlalchemy.select([
+            postgresql.array_agg(postgresql.aggregate_order_by(expression, listings.c.id)).label(name)
+            for name, expression in columns.items()
+        ]).where(sqlalchemy.and_(*conditions))
+
+        row = await database.fetch_one(query)
+        arrays = {}
+        for name, expression in columns.items():
+            values = (row[name] if row else None) or []
+            numeric = isinstance(expression.type, (sqlalchemy.Integer, sqlalchemy.Float, sqlalchemy.Numeric))
+            arrays[name] = np.array(values, dtype=float if numeric else object)
+        return arrays
+
+    def describe(
+        self,
+        prices: np.ndarray,
+        days: Optional[np.ndarray] = None,
+        groups: Optional[np.ndarray] = None,
+    ) -> Dict:
+        """
+        Summary statistics of a price array
+
+        Args:
+            prices: Prices (nan entries are ignored)
+            days: Days on market per listing (nan = unknown)
+            groups: Group key per listing (e.g. location) for counts
+
+        Returns:
+            {'count', 'mean', 'median', 'std', 'min', 'max', 'p10', 'p25',
+             'p50', 'p75', 'p90', 'trimmed_mean', 'iqr', 'cv',
+             'days_on_market_avg', 'group_counts'} - price fields are None
+            when there are no prices
+        """
+        valid = ~np.isnan(prices)
+        values = np.sort(prices[valid])
+        n = values.size
+
+        summary = {'count': int(n)}
+        if n:
+            percentiles = np.percentile(values, self.PERCENTILES)
+            trim = int(n * self.TRIM_FRACTION)
+            mean = float(values.mean())
+            std = float(values.std())
+            summary.update({
+                'mean': mean,
+                'median': float(percentiles[self.PERCENTILES.index(50)]),
+                'std': std,
+                'min': float(values[0]),
+                'max': float(values[-1]),
+                'trimmed_mean': float(values[trim:n - trim].mean()),
+                'iqr': float(percentiles[self.PERCENTILES.index(75)] - percentiles[self.PERCENTILES.index(25)]),
+                'cv': std / mean if mean else 0.0,
+            })
+            summary.update({f'p{p}': float(v) for p, v in zip(self.PERCENTILES, percentiles)})
+        else:
+            for key in ('mean', 'median', 'std', 'min', 'max', 'trimmed_mean', 'iqr', 'cv',
+                        *[f'p{p}' for p in self.PERCENTILES]):
+                summary[key] = None
+
+        if days is not None:
+            known = days[~np.isnan(days)]
+            summary['days_on_market_avg'] = float(np.floor(known).mean()) if known.size else 0.0
+
+        if groups is not None:
+            keys, counts = np.unique(groups, return_counts=True)
+            summary['group_counts'] = {key: int(count) for key, count in zip(keys.tolist(), counts.tolist())}
+
+        return summary
+
+    def group_stats(self, keys: np.ndarray, prices: np.ndarray) -> List[Dict]:
+        """Count and mean price per key, sorted by key"""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=unique.size)
+        sums = np.bincount(inverse, weights=prices, minlength=unique.size)
+        return [
+            {'key': key, 'count': int(count), 'mean': float(total / count)}
+            for key, count, total in zip(unique.tolist(), counts.tolist(), sums.tolist())
+        ]
+
+    def histogram_quantiles(
+        self,
+        counts: np.ndarray,
+        quantiles: Iterable[float],
+        floor: float,
+        ratio: float,
+        low: float,
+        high: float,
+    ) -> List[float]:
+        """
+        Quantiles of geometric bins (bin i covers floor*ratio^i .. floor*ratio^(i+1)),
+        interpolated geometrically inside the bin and clipped to [low, high]
+        """
+        cumulative = np.cumsum(counts)
+        ranks = np.asarray(list(quantiles)) * cumulative[-1]
+        bins = np.minimum(np.searchsorted(cumulative, ranks, side='right'), counts.size - 1)
+        in_bin = counts[bins]
+        seen = cumulative[bins] - in_bin
+        fraction = np.divide(ranks - seen, in_bin, out=np.ones_like(ranks), where=in_bin > 0)
+        values = floor * ratio ** (bins + fraction)
+        return np.clip(values, low, high).tolist()
+
+
+# Global instance
+price_stats = PriceStatsEngine()
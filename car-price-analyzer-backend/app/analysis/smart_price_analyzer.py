@@ -2,9 +2,19 @@
 Smart Price Analyzer - Auto-scraping when data is missing
 Checks DB first, triggers scraping if needed, returns realistic prices
 """
-from typing import Dict, List, Optional
+import asyncio
+import time
+import uuid
 from datetime import datetime, timedelta
-from app.database import database, listings
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+
+from app.analysis.analysis_cache import analysis_cache
+from app.analysis.comparables import comparables_index
+from app.analysis.market_stats import market_stats_cube
+from app.analysis.price_stats import price_stats
+from app.database import analysis_refreshes, database
 from app.scrapers.olx_filtered_scraper import olx_filtered_scraper
 from app.scrapers.scraper_service import scraper_service
 
@@ -15,10 +25,29 @@ class SmartPriceAnalyzer:
     1. Checks DB for recent data (< 24h old)
     2. If insufficient data → triggers scraping with user's filters
     3. Calculates realistic price range from real market data
+
+    Prices come from the nearest comparable listings (comparables index)
+    matching the request's filters and ranges when there are enough of them,
+    else from the precomputed market_stats cube.
+
+    Background refreshes (stale-while-revalidate) run in the process that
+    started them but keep their state in `analysis_refreshes`, so a poll can
+    land on any API process; the refreshed analysis also goes into the
+    analysis cache.
     """
 
     MIN_LISTINGS_REQUIRED = 5  # Minimum listings needed for analysis
+    COMPARABLES_K = 20  # Comparables wanted (fewer are used when that's all there is)
     DATA_FRESHNESS_HOURS = 24  # Consider data fresh if < 24h old
+    SCRAPE_REUSE_SECONDS = 120  # Requests this soon after a scrape reuse its result
+    REFRESH_RETENTION_HOURS = 1  # How long finished background refreshes can be polled
+
+    def __init__(self):
+        # Scrapes in progress / recently finished, keyed by normalized filters
+        self._inflight_scrapes: Dict[Tuple, asyncio.Task] = {}
+        self._recent_scrapes: Dict[Tuple, Tuple[float, Dict]] = {}
+        # Background refreshes running in this process (state is in analysis_refreshes)
+        self._refresh_tasks: Set[asyncio.Task] = set()
 
     async def analyze_with_auto_scraping(
         self,
@@ -31,6 +60,9 @@ class SmartPriceAnalyzer:
         combustibil: Optional[str] = None,
         transmisie: Optional[str] = None,
         caroserie: Optional[str] = None,
+        stale_while_revalidate: bool = False,
+        an: Optional[int] = None,
+        km: Optional[int] = None,
     ) -> Dict:
         """
         Smart analysis with auto-scraping
@@ -45,6 +77,11 @@ class SmartPriceAnalyzer:
             combustibil: Fuel type (diesel, benzina, etc.)
             transmisie: Transmission (manuala, automata)
             caroserie: Body type (sedan, hatchback, etc.)
+            stale_while_revalidate: When data is stale, answer from what is in
+                the DB right away and scrape in the background; the response's
+                market_data carries a refresh_id to poll with `get_refresh`
+            an: Target year for the comparables (default: middle of the range)
+            km: Target km for the comparables (default: middle of the range)
 
         Returns:
             Dict with price analysis and market data
@@ -52,20 +89,35 @@ class SmartPriceAnalyzer:
         print(f"\n=== Smart Price Analysis ===")
         print(f"Car: {marca} {model} ({an_min}-{an_max})")
 
-        # Step 1: Check DB for existing data
-        db_listings = await self._get_db_listings(
+        # Step 1: Check the market stats cube for existing data
+        stats = await market_stats_cube.get_stats(
             marca, model, an_min, an_max, km_min, km_max,
             combustibil, transmisie, caroserie
         )
 
-        print(f"Found {len(db_listings)} listings in DB")
+        print(f"Found {stats['count']} listings in DB")
 
         # Step 2: Check if data is fresh and sufficient
-        fresh_listings = self._filter_fresh_listings(db_listings)
-        print(f"Fresh listings (< {self.DATA_FRESHNESS_HOURS}h): {len(fresh_listings)}")
+        print(f"Fresh listings (< {self.DATA_FRESHNESS_HOURS}h): {stats['fresh_count']}")
+
+        filters = (marca, model, an_min, an_max, km_min, km_max, combustibil, transmisie, caroserie)
+        target = (
+            an if an is not None else (an_min + an_max) // 2,
+            km if km is not None else ((km_min or 0) + (km_max or km_min or 0)) // 2,
+        )
 
         # Step 3: If insufficient data → trigger scraping
-        if len(fresh_listings) < self.MIN_LISTINGS_REQUIRED:
+        if stats['fresh_count'] < self.MIN_LISTINGS_REQUIRED and stale_while_revalidate:
+            # Answer now from stale data, refresh in the background
+            refresh_id = await self._start_refresh(filters, target)
+            print(f"⚠️ Stale data, serving it and refreshing in background ({refresh_id})")
+
+            result = await self._result_from_stats(stats, filters, target)
+            result['market_data']['stale'] = True
+            result['market_data']['refresh_id'] = refresh_id
+            return result
+
+        if stats['fresh_count'] < self.MIN_LISTINGS_REQUIRED:
             print(f"⚠️ Insufficient data! Triggering scraping...")
 
             scraping_result = await self._trigger_scraping(
@@ -75,20 +127,113 @@ class SmartPriceAnalyzer:
 
             print(f"✅ Scraping complete: {scraping_result['total_saved']} new listings")
 
-            # Re-fetch DB listings after scraping
-            db_listings = await self._get_db_listings(
+            # Re-read the cube (saving refreshed the scraped segments)
+            stats = await market_stats_cube.get_stats(
                 marca, model, an_min, an_max, km_min, km_max,
                 combustibil, transmisie, caroserie
             )
 
         # Step 4: Calculate price range from real data
-        if len(db_listings) >= self.MIN_LISTINGS_REQUIRED:
-            return await self._calculate_price_range(db_listings, marca, model)
+        return await self._result_from_stats(stats, filters, target)
+
+    async def _result_from_stats(self, stats: Dict, filters: Tuple, target: Tuple[int, int]) -> Dict:
+        """
+        Price range from the comparables when there are enough of them, else
+        from market stats (generic formula when too few listings)
+
+        Args:
+            stats: Market stats for the filters
+            filters: (marca, model, an_min, an_max, km_min, km_max,
+                combustibil, transmisie, caroserie)
+            target: (an, km) the comparables are centered on
+        """
+        marca, model, an_min, an_max, km_min, km_max, combustibil, transmisie, caroserie = filters
+        comparables = comparables_index.nearest(
+            marca, model, target[0], target[1],
+            combustibil=combustibil,
+            transmisie=transmisie,
+            caroserie=caroserie,
+            an_min=an_min,
+            an_max=an_max,
+            km_min=km_min,
+            km_max=km_max,
+            k=self.COMPARABLES_K,
+        )
+
+        if comparables and len(comparables) >= self.MIN_LISTINGS_REQUIRED:
+            result = await self._price_range_from_comparables(comparables, marca, model)
+            result['market_data']['total_listings'] = stats['count']
+        elif stats['count'] >= self.MIN_LISTINGS_REQUIRED:
+            result = await self._calculate_price_range(stats, marca, model)
         else:
             # Fallback to generic formula if still no data
-            return await self._fallback_generic_price(marca, model, an_min, an_max, km_min or 150000)
+            result = await self._fallback_generic_price(marca, model, an_min, an_max, km_min or 150000)
+
+        if stats['last_scrape']:
+            age = datetime.now() - stats['last_scrape']
+            result['market_data']['data_age_hours'] = round(age.total_seconds() / 3600, 1)
+        return result
+
+    async def _start_refresh(self, filters: Tuple, target: Tuple[int, int]) -> str:
+        """Start a background scrape + re-analysis, return its refresh_id"""
+        now = datetime.now()
+        refresh_id = uuid.uuid4().hex
+        async with database.transaction():
+            await database.execute(analysis_refreshes.delete().where(
+                analysis_refreshes.c.started_at < now - timedelta(hours=self.REFRESH_RETENTION_HOURS)
+            ))
+            await database.execute(analysis_refreshes.insert().values(
+                id=refresh_id, status='running', started_at=now
+            ))
+
+        task = asyncio.create_task(self._refresh_analysis(refresh_id, filters, target))
+        # Keep a reference, or the task can be garbage-collected mid-scrape
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+        return refresh_id
+
+    async def _refresh_analysis(self, refresh_id: str, filters: Tuple, target: Tuple[int, int]):
+        try:
+            # Single-flight: concurrent refreshes of one segment share the scrape
+            await self._trigger_scraping(*filters)
+            stats = await market_stats_cube.get_stats(*filters)
+            result = await self._result_from_stats(stats, filters, target)
+            # Same key as POST /analyze, so the next request is a cache hit
+            marca, model = filters[:2]
+            await analysis_cache.set(
+                analysis_cache.make_key(*filters, *target), marca, model, target[0], target[1], result
+            )
+            values = {'status': 'completed', 'result': result}
+        except Exception as e:
+            values = {'status': 'failed', 'error': str(e)}
+
+        try:
+            await database.execute(
+                analysis_refreshes.update().where(analysis_refreshes.c.id == refresh_id).values(
+                    completed_at=datetime.now(), **values
+                )
+            )
+        except Exception as e:
+            print(f"Could not record refresh {refresh_id}: {e}")
+
+    async def get_refresh(self, refresh_id: str) -> Optional[Dict]:
+        """
+        Status of a background refresh, started by any process
+
+        Returns:
+            {'status': 'running' | 'completed' | 'failed', 'started_at',
+            'completed_at' (when finished), 'result': analysis (when
+            completed), 'error' (when failed)}, or None if unknown/expired
+        """
+        row = await database.fetch_one(analysis_refreshes.select().where(
+            (analysis_refreshes.c.id == refresh_id) &
+            (analysis_refreshes.c.started_at >= datetime.now() - timedelta(hours=self.REFRESH_RETENTION_HOURS))
+        ))
+        if row is None:
+            return None
+        return {key: value for key, value in dict(row).items() if value is not None and key != 'id'}
 
-    async def _get_db_listings(
+    async def _trigger_scraping(
         self,
         marca: str,
         model: str,
@@ -99,62 +244,58 @@ class SmartPriceAnalyzer:
         combustibil: Optional[str],
         transmisie: Optional[str],
         caroserie: Optional[str],
-    ) -> List[Dict]:
-        """Query DB for matching listings"""
-        query = """
-            SELECT *
-            FROM listings
-            WHERE
-                LOWER(marca) = LOWER(:marca)
-                AND (LOWER(model_series) = LOWER(:model) OR LOWER(model) LIKE :model_like)
-                AND an BETWEEN :an_min AND :an_max
-                AND este_activ = true
+    ) -> Dict:
         """
+        Trigger OLX scraping with user's filters (single-flight)
 
-        params = {
-            'marca': marca,
-            'model': model,
-            'model_like': f'%{model}%',
-            'an_min': an_min,
-            'an_max': an_max,
-        }
-
-        # Add optional filters
-        if km_min and km_max:
-            query += " AND km BETWEEN :km_min AND :km_max"
-            params['km_min'] = km_min
-            params['km_max'] = km_max
-
-        if combustibil:
-            query += " AND LOWER(combustibil) = LOWER(:combustibil)"
-            params['combustibil'] = combustibil
-
-        if transmisie:
-            query += " AND LOWER(transmisie) = LOWER(:transmisie)"
-            params['transmisie'] = transmisie
-
-        if caroserie:
-            query += " AND LOWER(caroserie) = LOWER(:caroserie)"
-            params['caroserie'] = caroserie
-
-        query += " ORDER BY pret"
-
-        result = await database.fetch_all(query, params)
-        return [dict(row) for row in result]
-
-    def _filter_fresh_listings(self, listings: List[Dict]) -> List[Dict]:
-        """Filter listings that are fresh (< 24h old)"""
-        cutoff = datetime.now() - timedelta(hours=self.DATA_FRESHNESS_HOURS)
-        fresh = []
-
-        for listing in listings:
-            scrape_date = listing.get('data_scrape') or listing.get('data_scraping')
-            if scrape_date and scrape_date > cutoff:
-                fresh.append(listing)
+        Concurrent requests for the same filters share one scrape; requests
+        arriving within SCRAPE_REUSE_SECONDS after it finished reuse its result.
+        """
+        key = self._scrape_key(
+            marca, model, an_min, an_max, km_min, km_max,
+            combustibil, transmisie, caroserie
+        )
 
-        return fresh
+        recent = self._recent_scrapes.get(key)
+        if recent and time.monotonic() - recent[0] < self.SCRAPE_REUSE_SECONDS:
+            print(f"♻️ Reusing scrape finished {time.monotonic() - recent[0]:.0f}s ago")
+            return recent[1]
 
-    async def _trigger_scraping(
+        task = self._inflight_scrapes.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run_scraping(
+                marca, model, an_min, an_max, km_min, km_max,
+                combustibil, transmisie, caroserie
+            ))
+            self._inflight_scrapes[key] = task
+            task.add_done_callback(lambda done: self._finish_scrape(key, done))
+        else:
+            print(f"⏳ Joining scrape already running for: {marca} {model}")
+
+        # Shielded - one caller disconnecting must not cancel everyone's scrape
+        return await asyncio.shield(task)
+
+    def _scrape_key(self, marca: str, model: str, *filters) -> Tuple:
+        """Normalized filter tuple (case and surrounding spaces ignored)"""
+        normalized = [marca.strip().lower(), model.strip().lower()]
+        for value in filters:
+            normalized.append(value.strip().lower() if isinstance(value, str) else value)
+        return tuple(normalized)
+
+    def _finish_scrape(self, key: Tuple, task: asyncio.Task):
+        """Move a finished scrape from the in-flight registry to the reuse window"""
+        self._inflight_scrapes.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return  # Failures are not cached - the next request retries
+
+        now = time.monotonic()
+        self._recent_scrapes[key] = (now, task.result())
+        # Drop expired entries so the registry stays small
+        for old_key, (finished, _) in list(self._recent_scrapes.items()):
+            if now - finished >= self.SCRAPE_REUSE_SECONDS:
+                del self._recent_scrapes[old_key]
+
+    async def _run_scraping(
         self,
         marca: str,
         model: str,
@@ -166,7 +307,7 @@ class SmartPriceAnalyzer:
         transmisie: Optional[str],
         caroserie: Optional[str],
     ) -> Dict:
-        """Trigger OLX scraping with user's filters"""
+        """Scrape OLX with the user's filters and save the results"""
         print(f"🔍 Scraping OLX for: {marca} {model}")
 
         # Use filtered scraper with exact user filters
@@ -183,51 +324,34 @@ class SmartPriceAnalyzer:
             max_pages=2  # Scrape 2 pages max (fast)
         )
 
-        # Save to database
-        saved_count = 0
-        for listing in new_listings:
-            try:
-                # Check duplicates
-                existing = await database.fetch_one(
-                    listings.select().where(listings.c.url == listing['url'])
-                )
-                if existing:
-                    continue
-
-                # Insert
-                await database.execute(listings.insert().values(**listing))
-                saved_count += 1
-            except Exception as e:
-                print(f"Error saving: {e}")
-                continue
+        # Save to database (batched upsert)
+        counts = await scraper_service.save_listings(new_listings)
 
         return {
             'total_found': len(new_listings),
-            'total_saved': saved_count
+            'total_saved': counts['inserted'],
+            'updated': counts['updated'],
+            'unchanged': counts['unchanged']
         }
 
     async def _calculate_price_range(
         self,
-        db_listings: List[Dict],
+        stats: Dict,
         marca: str,
         model: str
     ) -> Dict:
-        """Calculate realistic price range from DB listings"""
-        prices = [l['pret'] for l in db_listings if l.get('pret')]
-
-        if not prices:
+        """Calculate realistic price range from merged market stats"""
+        if not stats['count']:
             return await self._fallback_generic_price(marca, model, 2015, 2020, 150000)
 
-        prices.sort()
-
-        # Calculate percentiles
-        n = len(prices)
-        price_min = prices[int(n * 0.10)]  # 10th percentile
-        price_p25 = prices[int(n * 0.25)]  # 25th percentile
-        price_avg = sum(prices) / n
-        price_median = prices[n // 2]
-        price_p75 = prices[int(n * 0.75)]  # 75th percentile
-        price_max = prices[int(n * 0.90)]  # 90th percentile
+        # Percentiles (approximate, from the cube's price histograms)
+        n = stats['count']
+        price_min = stats['p10']  # 10th percentile
+        price_p25 = stats['p25']  # 25th percentile
+        price_avg = stats['price_mean']
+        price_median = stats['p50']
+        price_p75 = stats['p75']  # 75th percentile
+        price_max = stats['p90']  # 90th percentile
 
         return {
             'pret_rapid': {
@@ -253,10 +377,10 @@ class SmartPriceAnalyzer:
             'valoare_dotari': 0,  # Calculated separately if needed
             'market_data': {
                 'source': 'database_filtered',
-                'confidence': min(95, 60 + (len(prices) * 2)),  # More data = higher confidence
-                'description': f'Analiză bazată pe {len(prices)} anunțuri reale',
-                'sample_size': len(prices),
-                'total_listings': len(db_listings),
+                'confidence': min(95, 60 + (n * 2)),  # More data = higher confidence
+                'description': f'Analiză bazată pe {n} anunțuri reale',
+                'sample_size': n,
+                'total_listings': n,
                 'price_mean': round(price_avg, 2),
                 'price_median': round(price_median, 2),
                 'price_min': round(price_min, 2),
@@ -266,6 +390,18 @@ class SmartPriceAnalyzer:
             }
         }
 
+    async def _price_range_from_comparables(self, comparables, marca: str, model: str) -> Dict:
+        """Price range from the k nearest listings (same shape as `_calculate_price_range`)"""
+        summary = price_stats.describe(np.array([c['pret'] for c in comparables], dtype=float))
+        result = await self._calculate_price_range({**summary, 'price_mean': summary['mean']}, marca, model)
+        result['market_data'].update({
+            'source': 'comparables',
+            'description': f'Analiză bazată pe cele mai apropiate {len(comparables)} anunțuri active',
+            'sample_size': len(comparables),
+            'comparables': comparables,
+        })
+        return result
+
     async def _fallback_generic_price(
         self,
         marca: str,
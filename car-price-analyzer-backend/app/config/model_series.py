@@ -0,0 +1,117 @@
+"""
+Model Series Patterns
+Regex patterns that group free-text model names into catalog series,
+per brand (lowercase brand names)
+"""
+
+MODEL_SERIES_PATTERNS = {
+    'bmw': {
+        'Seria 1': [r'1\d{2}', r'seria 1', r'series 1'],
+        'Seria 2': [r'2\d{2}', r'seria 2', r'series 2'],
+        'Seria 3': [r'3\d{2}', r'seria 3', r'series 3'],
+        'Seria 4': [r'4\d{2}', r'seria 4', r'series 4'],
+        'Seria 5': [r'5\d{2}', r'seria 5', r'series 5'],
+        'Seria 6': [r'6\d{2}', r'seria 6', r'series 6'],
+        'Seria 7': [r'7\d{2}', r'seria 7', r'series 7'],
+        'Seria 8': [r'8\d{2}', r'seria 8', r'series 8'],
+        'X1': [r'x1'],
+        'X2': [r'x2'],
+        'X3': [r'x3'],
+        'X4': [r'x4'],
+        'X5': [r'x5'],
+        'X6': [r'x6'],
+        'X7': [r'x7'],
+        'Z4': [r'z4'],
+        'i3': [r'i3'],
+        'i4': [r'i4'],
+        'i8': [r'i8'],
+    },
+    'mercedes': {
+        'A-Class': [r'a\s*\d{2,3}', r'a-class', r'clasa a'],
+        'B-Class': [r'b\s*\d{2,3}', r'b-class', r'clasa b'],
+        'C-Class': [r'c\s*\d{2,3}', r'c-class', r'clasa c'],
+        'E-Class': [r'e\s*\d{2,3}', r'e-class', r'clasa e'],
+        'S-Class': [r's\s*\d{2,3}', r's-class', r'clasa s'],
+        'CLA': [r'cla'],
+        'CLS': [r'cls'],
+        'GLA': [r'gla'],
+        'GLB': [r'glb'],
+        'GLC': [r'glc'],
+        'GLE': [r'gle'],
+        'GLS': [r'gls'],
+        'G-Class': [r'g\s*\d{2,3}', r'g-class'],
+    },
+    'audi': {
+        'A1': [r'a1'],
+        'A3': [r'a3'],
+        'A4': [r'a4'],
+        'A5': [r'a5'],
+        'A6': [r'a6'],
+        'A7': [r'a7'],
+        'A8': [r'a8'],
+        'Q2': [r'q2'],
+        'Q3': [r'q3'],
+        'Q5': [r'q5'],
+        'Q7': [r'q7'],
+        'Q8': [r'q8'],
+        'TT': [r'tt'],
+        'R8': [r'r8'],
+        'e-tron': [r'e-tron', r'etron'],
+    },
+    'volkswagen': {
+        'Golf': [r'golf'],
+        'Polo': [r'polo'],
+        'Passat': [r'passat'],
+        'Jetta': [r'jetta'],
+        'Tiguan': [r'tiguan'],
+        'Touareg': [r'touareg'],
+        'Arteon': [r'arteon'],
+        'T-Roc': [r't-roc', r'troc'],
+        'ID.3': [r'id\.?3'],
+        'ID.4': [r'id\.?4'],
+    },
+    'dacia': {
+        'Logan': [r'logan'],
+        'Sandero': [r'sandero'],
+        'Duster': [r'duster'],
+        'Lodgy': [r'lodgy'],
+        'Dokker': [r'dokker'],
+        'Spring': [r'spring'],
+        'Jogger': [r'jogger'],
+    },
+    'skoda': {
+        'Fabia': [r'fabia'],
+        'Octavia': [r'octavia'],
+        'Superb': [r'superb'],
+        'Rapid': [r'rapid'],
+        'Scala': [r'scala'],
+        'Kamiq': [r'kamiq'],
+        'Karoq': [r'karoq'],
+        'Kodiaq': [r'kodiaq'],
+    },
+    'ford': {
+        'Fiesta': [r'fiesta'],
+        'Focus': [r'focus'],
+        'Mondeo': [r'mondeo'],
+        'Kuga': [r'kuga'],
+        'Puma': [r'puma'],
+        'EcoSport': [r'ecosport'],
+        'Mustang': [r'mustang'],
+    },
+    'renault': {
+        'Clio': [r'clio'],
+        'Megane': [r'megane'],
+        'Captur': [r'captur'],
+        'Kadjar': [r'kadjar'],
+        'Talisman': [r'talisman'],
+        'Zoe': [r'zoe'],
+    },
+    'opel': {
+        'Corsa': [r'corsa'],
+        'Astra': [r'astra'],
+        'Insignia': [r'insignia'],
+        'Mokka': [r'mokka'],
+        'Crossland': [r'crossland'],
+        'Grandland': [r'grandland'],
+    }
+}
@@ -64,6 +64,10 @@ listings = sqlalchemy.Table(
     sqlalchemy.Column("model", sqlalchemy.String(100)),
     sqlalchemy.Column("model_series", sqlalchemy.String(50)),  # NEW: "Seria 1", "Golf", etc.
     sqlalchemy.Column("model_variant", sqlalchemy.String(50)),  # NEW: "GTI", "R", "M", "AMG", etc.
+    # Chei de căutare normalizate la inserare (app/services/search_keys.py)
+    sqlalchemy.Column("marca_key", sqlalchemy.String(50)),  # "mercedesbenz"
+    sqlalchemy.Column("series_key", sqlalchemy.String(100)),  # "seria 3", "c-class"
+    sqlalchemy.Column("variant_key", sqlalchemy.String(50)),  # "m sport"
     sqlalchemy.Column("an", sqlalchemy.Integer),
     sqlalchemy.Column("km", sqlalchemy.Integer),
     sqlalchemy.Column("pret", sqlalchemy.Float),
@@ -86,6 +90,35 @@ listings = sqlalchemy.Table(
     sqlalchemy.Column("zile_pe_piata", sqlalchemy.Integer, default=0),  # For compatibility
 )
 
+# Indecși pentru predicatele de căutare (migrare: migrate_listing_indexes.py)
+# Segment: marca_key = ... AND series_key = ... AND an/km în interval
+sqlalchemy.Index(
+    "ix_listings_search_keys",
+    listings.c.marca_key,
+    listings.c.series_key,
+    listings.c.an,
+    listings.c.km,
+    postgresql_where=listings.c.este_activ == True,
+)
+# Listare exactă după marcă și model, în ordinea implicită a paginării keyset
+# (GET /listings/{marca}/{model}, /models/{marca})
+sqlalchemy.Index(
+    "ix_listings_marca_model_scraped",
+    listings.c.marca,
+    listings.c.model,
+    listings.c.data_scraping,
+    listings.c.id,
+    postgresql_where=listings.c.este_activ == True,
+)
+# Potriviri fuzzy ILIKE '%x%' (necesită extensia pg_trgm)
+for _column in ("marca", "model", "model_series"):
+    sqlalchemy.Index(
+        f"ix_listings_{_column}_trgm",
+        listings.c[_column],
+        postgresql_using="gin",
+        postgresql_ops={_column: "gin_trgm_ops"},
+    )
+
 # Tabel pentru istoricul prețurilor
 price_history = sqlalchemy.Table(
     "price_history",
@@ -96,6 +129,79 @@ price_history = sqlalchemy.Table(
     sqlalchemy.Column("data_modificare", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
 )
 
+# Tabel pentru statistici de piață precalculate (vezi app/analysis/market_stats.py)
+market_stats = sqlalchemy.Table(
+    "market_stats",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("marca_key", sqlalchemy.String(50), nullable=False),  # listings.marca_key
+    sqlalchemy.Column("model_series_key", sqlalchemy.String(100), nullable=False),  # listings.series_key, '' = necunoscut
+    sqlalchemy.Column("model_key", sqlalchemy.String(100), nullable=False),  # LOWER(model)
+    sqlalchemy.Column("an", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("combustibil", sqlalchemy.String(20), nullable=False),  # '' = necunoscut
+    sqlalchemy.Column("transmisie", sqlalchemy.String(20), nullable=False),
+    sqlalchemy.Column("caroserie", sqlalchemy.String(30), nullable=False),
+    sqlalchemy.Column("km_bucket", sqlalchemy.Integer, nullable=False),  # km // 5000, -1 = necunoscut
+    sqlalchemy.Column("count", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("fresh_hours", sqlalchemy.JSON),  # [[oră scrape, count], ...] pentru anunțurile < 24h
+    sqlalchemy.Column("price_sum", sqlalchemy.Float, nullable=False),
+    sqlalchemy.Column("price_min", sqlalchemy.Float),
+    sqlalchemy.Column("price_max", sqlalchemy.Float),
+    sqlalchemy.Column("histogram", sqlalchemy.JSON),  # [[price_bin, count], ...]
+    sqlalchemy.Column("last_scrape", sqlalchemy.DateTime),
+    sqlalchemy.Column("refreshed_at", sqlalchemy.DateTime),
+    sqlalchemy.Index("idx_market_stats_segment", "marca_key", "model_series_key", "an"),
+)
+
+# Tabel pentru coada de job-uri de scraping (vezi app/scrapers/scrape_jobs.py)
+scrape_jobs = sqlalchemy.Table(
+    "scrape_jobs",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("kind", sqlalchemy.String(20), nullable=False),  # 'model', 'popular'
+    sqlalchemy.Column("params", sqlalchemy.JSON, nullable=False),
+    sqlalchemy.Column("dedup_key", sqlalchemy.String(500), nullable=False),
+    sqlalchemy.Column("status", sqlalchemy.String(20), nullable=False),  # pending, running, completed, failed
+    sqlalchemy.Column("progress", sqlalchemy.Integer, default=0),
+    sqlalchemy.Column("message", sqlalchemy.Text),
+    sqlalchemy.Column("attempts", sqlalchemy.Integer, default=0),
+    sqlalchemy.Column("max_attempts", sqlalchemy.Integer, default=3),
+    sqlalchemy.Column("result", sqlalchemy.JSON),
+    sqlalchemy.Column("error", sqlalchemy.Text),
+    sqlalchemy.Column("worker_id", sqlalchemy.String(100)),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Column("run_after", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Column("started_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("heartbeat_at", sqlalchemy.DateTime),
+    sqlalchemy.Column("finished_at", sqlalchemy.DateTime),
+    sqlalchemy.Index("idx_scrape_jobs_pending", "status", "run_after"),
+    # Un singur job activ pentru aceiași parametri
+    sqlalchemy.Index(
+        "idx_scrape_jobs_active_dedup", "dedup_key", unique=True,
+        postgresql_where=sqlalchemy.text("status IN ('pending', 'running')")
+    ),
+)
+
+# Tabel pentru evenimentele de progres ale job-urilor (stream SSE)
+scrape_job_events = sqlalchemy.Table(
+    "scrape_job_events",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("job_id", sqlalchemy.Integer, sqlalchemy.ForeignKey("scrape_jobs.id", ondelete="CASCADE"), nullable=False),
+    sqlalchemy.Column("type", sqlalchemy.String(20), nullable=False),  # page, saved, query, retry, summary, failed
+    sqlalchemy.Column("data", sqlalchemy.JSON),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
+    sqlalchemy.Index("idx_scrape_job_events_job", "job_id", "id"),
+)
+
+# Tabel pentru bugetul de request-uri per host, comun tuturor proceselor (vezi app/scrapers/scrape_scheduler.py)
+scrape_rate_limits = sqlalchemy.Table(
+    "scrape_rate_limits",
+    metadata,
+    sqlalchemy.Column("host", sqlalchemy.String(255), primary_key=True),
+    sqlalchemy.Column("next_slot_at", sqlalchemy.DateTime(timezone=True), nullable=False),
+)
+
 # Tabel pentru analize salvate
 saved_analyses = sqlalchemy.Table(
     "saved_analyses",
@@ -108,9 +214,24 @@ saved_analyses = sqlalchemy.Table(
     sqlalchemy.Column("dotari", sqlalchemy.JSON),
     sqlalchemy.Column("pret_optim", sqlalchemy.Float),
     sqlalchemy.Column("rezultat_complet", sqlalchemy.JSON),
+    sqlalchemy.Column("cache_key", sqlalchemy.String(64), index=True),  # Set for AnalysisCache entries
+    sqlalchemy.Column("series_key", sqlalchemy.String(100)),  # AnalysisCache: series the analysis read
     sqlalchemy.Column("created_at", sqlalchemy.DateTime, server_default=sqlalchemy.func.now()),
 )
 
+# Tabel pentru reîmprospătările de analize din background (stale-while-revalidate),
+# citit de orice proces API (vezi app/analysis/smart_price_analyzer.py)
+analysis_refreshes = sqlalchemy.Table(
+    "analysis_refreshes",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.String(32), primary_key=True),  # refresh_id
+    sqlalchemy.Column("status", sqlalchemy.String(20), nullable=False),  # running, completed, failed
+    sqlalchemy.Column("result", sqlalchemy.JSON),
+    sqlalchemy.Column("error", sqlalchemy.Text),
+    sqlalchemy.Column("started_at", sqlalchemy.DateTime, nullable=False),
+    sqlalchemy.Column("completed_at", sqlalchemy.DateTime),
+)
+
 # Tabel pentru cache-uirea makes din API-uri
 api_makes_cache = sqlalchemy.Table(
     "api_makes_cache",
@@ -172,6 +293,9 @@ engine = sqlalchemy.create_engine(DATABASE_URL)
 
 # Creare tabele
 def create_tables():
+    # Indecșii trigram de pe listings au nevoie de pg_trgm
+    with engine.begin() as connection:
+        connection.execute(sqlalchemy.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     metadata.create_all(engine)
     print("Tables created successfully")
 
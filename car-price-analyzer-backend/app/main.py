@@ -5,24 +5,43 @@ from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
+from app.analysis.comparables import comparables_index
+from app.analysis.depreciation_model import depreciation_model
 from app.database import database
 from app.routers import scraping, analysis, listings, vehicles, catalog
 from app.integrations.carquery import carquery_client
 from app.integrations.nhtsa import nhtsa_client
+from app.scrapers.parse_pool import parse_pool
+from app.database import analysis_refreshes, engine, scrape_job_events, scrape_jobs, scrape_rate_limits
+from app.services.db_listener import db_listener
+from app.services.view_counter import view_counter
 
 load_dotenv()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Tables the API writes before any scrape_worker.py has started
+    for table in (scrape_jobs, scrape_job_events, scrape_rate_limits, analysis_refreshes):
+        table.create(engine, checkfirst=True)
     await database.connect()
     print("✓ Database connected")
+    view_counter.start()
+    depreciation_model.start()  # Loads the published table, then watches for new versions
+    comparables_index.start()  # Built in the background; analyses use the cube until it is ready
+    await db_listener.start()  # Listing changes and scrape job events from other processes
     yield
     # Cleanup
+    await db_listener.stop()
+    await comparables_index.stop()
+    await depreciation_model.stop()
+    await view_counter.stop()  # Buffered listing views, before the DB goes away
     await database.disconnect()
     await carquery_client.close()
     await nhtsa_client.close()
+    parse_pool.shutdown()
     print("✓ Database disconnected")
     print("✓ API clients closed")
+    print("✓ Parse pool stopped")
 
 app = FastAPI(
     title="Car Price Analyzer API",
@@ -39,6 +58,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Paginare keyset (GET /listings/{marca}/{model})
 )
 
 # IMPORTANT - Include all routers
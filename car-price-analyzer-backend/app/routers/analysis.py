@@ -5,18 +5,35 @@ from app.schemas import CarAnalysisRequest, PriceAnalysisResponse, PricingStrate
 from app.analysis.price_analyzer import PriceAnalyzer
 from app.analysis.flexible_price_analyzer import flexible_analyzer
 from app.analysis.smart_price_analyzer import smart_analyzer
+from app.analysis.analysis_cache import analysis_cache
 from app.database import database, saved_analyses
 
 router = APIRouter()
 
+def _analysis_response(result: dict) -> PriceAnalysisResponse:
+    """Build the API response from an analyzer result dict"""
+    return PriceAnalysisResponse(
+        pret_rapid=PricingStrategy(**result['pret_rapid']),
+        pret_optim=PricingStrategy(**result['pret_optim']),
+        pret_negociere=PricingStrategy(**result['pret_negociere']),
+        pret_maxim=PricingStrategy(**result['pret_maxim']),
+        valoare_dotari=result['valoare_dotari'],
+        market_data=MarketAnalysisResponse(**result['market_data']),
+        timestamp=datetime.now()
+    )
+
 @router.post("/analyze", response_model=PriceAnalysisResponse)
-async def analyze_car_price(request: CarAnalysisRequest):
+async def analyze_car_price(request: CarAnalysisRequest, stale_while_revalidate: bool = False):
     """
     Analizează prețul optim pentru o mașină
     Folosește SMART ANALYZER cu auto-scraping:
     1. Verifică DB pentru date recente
     2. Dacă lipsesc → trigger scraping automat
     3. Returnează prețuri realiste din piața reală
+
+    Cu ?stale_while_revalidate=true răspunde imediat din datele existente
+    (market_data.stale, market_data.data_age_hours) și face scraping-ul în
+    background; analiza actualizată vine din GET /analyze/refresh/{refresh_id}
     """
     try:
         # Use SMART analyzer with auto-scraping!
@@ -56,6 +73,16 @@ async def analyze_car_price(request: CarAnalysisRequest):
         print(f"Search range: Year {an_min}-{an_max}, KM {km_min:,}-{km_max:,}")
         print(f"Filters: {request.combustibil}, {request.transmisie or 'any'}, {request.caroserie or 'any'}")
 
+        cache_key = analysis_cache.make_key(
+            request.marca, request.model, an_min, an_max, km_min, km_max,
+            request.combustibil, request.transmisie, request.caroserie,
+            request.an, request.km
+        )
+        cached = await analysis_cache.get(cache_key)
+        if cached is not None:
+            print("✓ Analysis cache hit")
+            return _analysis_response(cached)
+
         result = await smart_analyzer.analyze_with_auto_scraping(
             marca=request.marca,
             model=request.model,
@@ -66,20 +93,47 @@ async def analyze_car_price(request: CarAnalysisRequest):
             combustibil=request.combustibil,
             transmisie=request.transmisie,
             caroserie=request.caroserie,
+            stale_while_revalidate=stale_while_revalidate,
+            an=request.an,
+            km=request.km,
         )
 
-        response = PriceAnalysisResponse(
-            pret_rapid=PricingStrategy(**result['pret_rapid']),
-            pret_optim=PricingStrategy(**result['pret_optim']),
-            pret_negociere=PricingStrategy(**result['pret_negociere']),
-            pret_maxim=PricingStrategy(**result['pret_maxim']),
-            valoare_dotari=result['valoare_dotari'],
-            market_data=MarketAnalysisResponse(**result['market_data']),
-            timestamp=datetime.now()
-        )
+        # Stale answers are replaced by their refresh, never cached
+        if not result['market_data'].get('stale'):
+            await analysis_cache.set(cache_key, request.marca, request.model, request.an, request.km, result)
 
-        return response
+        return _analysis_response(result)
 
     except Exception as e:
         # This should NEVER happen with flexible analyzer, but just in case
-        raise HTTPException(status_code=500, detail=f"Eroare neașteptată: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Eroare neașteptată: {str(e)}")
+
+@router.get("/analyze/cache/stats")
+async def get_analysis_cache_stats():
+    """
+    Contoare cache analize (hit/miss pe L1 memorie și L2 saved_analyses)
+    """
+    return analysis_cache.get_stats()
+
+@router.get("/analyze/refresh/{refresh_id}")
+async def get_analysis_refresh(refresh_id: str):
+    """
+    Status-ul unei reîmprospătări pornite de /analyze?stale_while_revalidate=true
+    Când status = 'completed', 'analysis' conține analiza pe date proaspete
+    """
+    refresh = await smart_analyzer.get_refresh(refresh_id)
+    if refresh is None:
+        raise HTTPException(status_code=404, detail="Refresh not found")
+
+    response = {
+        'refresh_id': refresh_id,
+        'status': refresh['status'],
+        'started_at': refresh['started_at'].isoformat(),
+    }
+    if 'completed_at' in refresh:
+        response['completed_at'] = refresh['completed_at'].isoformat()
+    if refresh['status'] == 'completed':
+        response['analysis'] = _analysis_response(refresh['result'])
+    if refresh['status'] == 'failed':
+        response['error'] = refresh['error']
+    return response
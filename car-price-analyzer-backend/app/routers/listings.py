@@ -3,21 +3,114 @@
 # Router pentru gestionarea anunțurilor
 # ============================================
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional, List
+import base64
+import json
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from typing import Any, Optional, List, Tuple
 from datetime import datetime, timedelta
+import sqlalchemy
 
-from app.schemas import ListingResponse
+from app.schemas import ListingProjection, ListingResponse
 from app.database import database, listings
+from app.services.listing_export import listing_exporter, listing_filters
+from app.services.view_counter import view_counter
 
 router = APIRouter()
 
-@router.get("/listings/{marca}/{model}", response_model=List[ListingResponse])
+# Câmpurile ListingResponse, selectabile cu ?fields=
+LISTING_FIELDS = list(ListingResponse.model_fields)
+
+
+def _days_on_market():
+    """zile_pe_piata calculat în SQL (valoarea stocată dacă lipsește data_publicare)"""
+    return sqlalchemy.case(
+        (listings.c.data_publicare.is_(None), listings.c.zile_pe_piata),
+        else_=sqlalchemy.cast(
+            sqlalchemy.extract('day', sqlalchemy.func.localtimestamp() - listings.c.data_publicare),
+            sqlalchemy.Integer
+        )
+    ).label('zile_pe_piata')
+
+
+def _encode_cursor(sort_value, listing_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    payload = json.dumps([sort_value, listing_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def _decode_cursor(cursor: str, sort_by: str) -> Tuple[Any, int]:
+    try:
+        sort_value, listing_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if sort_value is not None and sort_by == "data_scraping":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(listing_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+# Rutele cu prefix fix de două segmente (/listings/detail/..., /listings/stats/...)
+# sunt declarate înaintea lui /listings/{marca}/{model}, care altfel le-ar captura
+
+@router.get("/listings/detail/{listing_id}", response_model=ListingResponse)
+async def get_listing_detail(listing_id: int):
+    """
+    Obține detalii complete despre un anunț specific
+    """
+    query = listings.select().where(listings.c.id == listing_id)
+    result = await database.fetch_one(query)
+    
+    if not result:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    
+    listing_dict = dict(result)
+    
+    # Calculează zile pe piață
+    if listing_dict['data_publicare']:
+        days_diff = (datetime.now() - listing_dict['data_publicare']).days
+        listing_dict['zile_pe_piata'] = days_diff
+    
+    # Incrementează vizualizări (scrise în lot de view_counter)
+    view_counter.increment(listing_id)
+    
+    return listing_dict
+
+@router.get("/listings/stats/summary")
+async def get_listings_summary():
+    """
+    Obține statistici generale despre anunțuri
+    """
+    query = """
+        SELECT 
+            COUNT(*) as total_active,
+            AVG(pret) as avg_price,
+            MIN(pret) as min_price,
+            MAX(pret) as max_price,
+            COUNT(DISTINCT marca) as total_brands,
+            COUNT(DISTINCT model) as total_models,
+            COUNT(DISTINCT source) as total_sources
+        FROM listings
+        WHERE este_activ = true
+    """
+    
+    result = await database.fetch_one(query)
+    
+    return dict(result)
+
+@router.get(
+    "/listings/{marca}/{model}",
+    response_model=List[ListingProjection],
+    response_model_exclude_unset=True,  # Câmpurile necerute lipsesc din răspuns
+)
 async def get_listings(
     marca: str,
     model: str,
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    offset: int = Query(0, ge=0, deprecated=True),
+    fields: Optional[str] = None,
     an_min: Optional[int] = None,
     an_max: Optional[int] = None,
     pret_min: Optional[float] = None,
@@ -28,91 +121,136 @@ async def get_listings(
 ):
     """
     Obține anunțuri pentru o marcă și model
-    
+
+    Paginare keyset: răspunsul are headerul X-Next-Cursor când mai există
+    rezultate; trimite-l înapoi ca ?cursor= pentru pagina următoare (orice
+    pagină costă cât prima).
+
     Query params:
         - limit: număr maxim de rezultate (1-200)
-        - offset: pentru paginare
+        - cursor: cursor opac din X-Next-Cursor
+        - offset: paginare veche (deprecated, costă liniar cu offset-ul)
+        - fields: câmpuri returnate, separate prin virgulă (implicit toate)
         - an_min, an_max: filtrare după an
         - pret_min, pret_max: filtrare după preț
         - locatie: filtrare după locație
         - sort_by: sortare după (pret|an|km|data_scraping)
         - sort_order: ordine (asc|desc)
     """
+    # Proiecție: doar coloanele cerute (fără descriere/dotari/imagini dacă nu sunt cerute)
+    selected = [f.strip() for f in fields.split(',') if f.strip()] if fields else LISTING_FIELDS
+    unknown = [f for f in selected if f not in LISTING_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+    after = _decode_cursor(cursor, sort_by) if cursor else None
+
     try:
-        # Construiește query
-        query = listings.select().where(
-            (listings.c.marca == marca) &
-            (listings.c.model == model) &
-            (listings.c.este_activ == True)
-        )
-        
-        # Filtre opționale
-        if an_min:
-            query = query.where(listings.c.an >= an_min)
-        if an_max:
-            query = query.where(listings.c.an <= an_max)
-        if pret_min:
-            query = query.where(listings.c.pret >= pret_min)
-        if pret_max:
-            query = query.where(listings.c.pret <= pret_max)
-        if locatie:
-            query = query.where(listings.c.locatie.ilike(f"%{locatie}%"))
-        
-        # Sortare
-        sort_column = getattr(listings.c, sort_by)
+        columns = [
+            _days_on_market() if f == 'zile_pe_piata' else listings.c[f]
+            for f in selected
+        ]
+        # id și coloana de sortare sunt necesare pentru cursor
+        for column in (listings.c.id, listings.c[sort_by]):
+            if column.name not in selected:
+                columns.append(column)
+
+        # Construiește query (aceleași filtre ca exportul)
+        query = sqlalchemy.select(columns).where(sqlalchemy.and_(*listing_filters(
+            marca=marca, model=model, an_min=an_min, an_max=an_max,
+            pret_min=pret_min, pret_max=pret_max, locatie=locatie
+        )))
+
+        # Sortare (id departajează valorile egale); ordinea NULL-urilor e cea
+        # implicită din Postgres: primele la desc, ultimele la asc
+        sort_column = listings.c[sort_by]
         if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
+            query = query.order_by(sort_column.desc(), listings.c.id.desc())
         else:
-            query = query.order_by(sort_column.asc())
-        
-        # Paginare
-        query = query.limit(limit).offset(offset)
-        
-        # Execută query
-        results = await database.fetch_all(query)
-        
-        # Calculează zile pe piață
-        now = datetime.now()
-        listings_with_days = []
-        for r in results:
-            listing_dict = dict(r)
-            if listing_dict['data_publicare']:
-                days_diff = (now - listing_dict['data_publicare']).days
-                listing_dict['zile_pe_piata'] = days_diff
-            listings_with_days.append(listing_dict)
-        
-        return listings_with_days
-        
+            query = query.order_by(sort_column.asc(), listings.c.id.asc())
+
+        # Paginare keyset: continuă după (valoare sortare, id) din cursor
+        if after:
+            after_value, after_id = after
+            if after_value is None:
+                # Cursorul e în zona de NULL-uri
+                if sort_order == "desc":
+                    query = query.where(
+                        (sort_column.is_(None) & (listings.c.id < after_id)) | sort_column.isnot(None)
+                    )
+                else:
+                    query = query.where(sort_column.is_(None) & (listings.c.id > after_id))
+            elif sort_order == "desc":
+                query = query.where(
+                    sqlalchemy.tuple_(sort_column, listings.c.id) < sqlalchemy.tuple_(after_value, after_id)
+                )
+            else:
+                query = query.where(
+                    (sqlalchemy.tuple_(sort_column, listings.c.id) > sqlalchemy.tuple_(after_value, after_id)) |
+                    sort_column.is_(None)
+                )
+        elif offset:
+            query = query.offset(offset)
+
+        # Un rând în plus arată dacă mai există o pagină
+        results = await database.fetch_all(query.limit(limit + 1))
+
+        rows = [dict(r) for r in results[:limit]]
+        if len(results) > limit:
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = _encode_cursor(last[sort_by], last['id'])
+
+        # Returnează doar câmpurile cerute
+        return [{f: row[f] for f in selected} for row in rows]
+
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/listings/detail/{listing_id}", response_model=ListingResponse)
-async def get_listing_detail(listing_id: int):
+@router.get("/listings/export")
+async def export_listings(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    compress: bool = False,
+    fields: Optional[str] = None,
+    marca: Optional[str] = None,
+    model: Optional[str] = None,
+    an_min: Optional[int] = None,
+    an_max: Optional[int] = None,
+    pret_min: Optional[float] = None,
+    pret_max: Optional[float] = None,
+    locatie: Optional[str] = None,
+    include_inactive: bool = False
+):
     """
-    Obține detalii complete despre un anunț specific
+    Export complet al anunțurilor, transmis în flux (memorie constantă)
+
+    Query params:
+        - format: ndjson | csv
+        - compress: gzip din mers (fișier .gz)
+        - fields: coloane exportate, separate prin virgulă (implicit toate)
+        - marca, model, an_min, an_max, pret_min, pret_max, locatie:
+          aceleași filtre ca GET /listings/{marca}/{model} (opționale)
+        - include_inactive: include și anunțurile inactive
     """
-    query = listings.select().where(listings.c.id == listing_id)
-    result = await database.fetch_one(query)
-    
-    if not result:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    
-    listing_dict = dict(result)
-    
-    # Calculează zile pe piață
-    if listing_dict['data_publicare']:
-        days_diff = (datetime.now() - listing_dict['data_publicare']).days
-        listing_dict['zile_pe_piata'] = days_diff
-    
-    # Incrementează vizualizări
-    update_query = listings.update().where(
-        listings.c.id == listing_id
-    ).values(
-        vizualizari=listings.c.vizualizari + 1
+    try:
+        columns = listing_exporter.resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    query = listing_exporter.build_query(columns, listing_filters(
+        marca=marca, model=model, an_min=an_min, an_max=an_max,
+        pret_min=pret_min, pret_max=pret_max, locatie=locatie,
+        include_inactive=include_inactive
+    ))
+
+    filename = f"listings.{format}" + (".gz" if compress else "")
+    media_type = "application/gzip" if compress else (
+        "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    )
+    return StreamingResponse(
+        listing_exporter.stream(query, columns, format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
-    await database.execute(update_query)
-    
-    return listing_dict
 
 @router.get("/listings/recent")
 async def get_recent_listings(
@@ -140,6 +278,7 @@ async def get_popular_listings(
 ):
     """
     Obține anunțurile cele mai vizualizate
+    (inclusiv vizualizările încă nescrise în baza de date)
     """
     query = listings.select().where(
         listings.c.este_activ == True
@@ -148,7 +287,21 @@ async def get_popular_listings(
     ).limit(limit)
     
     results = await database.fetch_all(query)
-    return [dict(r) for r in results]
+
+    # Anunțurile cu vizualizări în buffer pot urca în top
+    top_ids = {r['id'] for r in results}
+    buffered_ids = [i for i in view_counter.buffered_ids() if i not in top_ids]
+    if buffered_ids:
+        results = list(results) + await database.fetch_all(
+            listings.select().where(
+                listings.c.id.in_(buffered_ids) &
+                (listings.c.este_activ == True)
+            )
+        )
+
+    merged = view_counter.merge(results)
+    merged.sort(key=lambda r: r['vizualizari'], reverse=True)
+    return merged[:limit]
 
 @router.get("/brands")
 async def get_available_brands():
@@ -211,25 +364,3 @@ async def deactivate_listing(listing_id: int):
         "success": True,
         "message": f"Listing {listing_id} deactivated"
     }
-
-@router.get("/listings/stats/summary")
-async def get_listings_summary():
-    """
-    Obține statistici generale despre anunțuri
-    """
-    query = """
-        SELECT 
-            COUNT(*) as total_active,
-            AVG(pret) as avg_price,
-            MIN(pret) as min_price,
-            MAX(pret) as max_price,
-            COUNT(DISTINCT marca) as total_brands,
-            COUNT(DISTINCT model) as total_models,
-            COUNT(DISTINCT source) as total_sources
-        FROM listings
-        WHERE este_activ = true
-    """
-    
-    result = await database.fetch_one(query)
-    
-    return dict(result)
\ No newline at end of file
@@ -3,67 +3,78 @@
 # Router pentru operații de scraping
 # ============================================
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+import json
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
 from datetime import datetime
 from typing import List, Optional
 
 from app.schemas import ScrapeRequest, ScrapeStatusResponse
 from app.scrapers.scraper_service import scraper_service
+from app.scrapers.scrape_jobs import scrape_job_notifier, scrape_job_queue
 from app.database import database, listings
 
 router = APIRouter()
 
-# Cache pentru status-ul scraping-ului
-scraping_status = {}
+# Stream SSE: cât de des verificăm evenimente noi fără LISTEN/NOTIFY și cât de des
+# trimitem keep-alive (cu notificări, stream-ul citește doar când jobul se schimbă)
+STREAM_POLL_SECONDS = 1.0
+STREAM_KEEPALIVE_SECONDS = 15.0
 
-async def scrape_task(marca: str, model: Optional[str], task_id: str):
-    """Task de scraping care rulează în background"""
-    try:
-        scraping_status[task_id] = {
-            "status": "running",
-            "progress": 0,
-            "sources": {}
-        }
-
-        # Use scraper service
-        result = await scraper_service.update_specific_model(marca, model)
-
-        # Update status
-        scraping_status[task_id]["progress"] = 100
-        scraping_status[task_id]["status"] = "completed"
-        scraping_status[task_id]["total_found"] = result['total_found']
-        scraping_status[task_id]["total_saved"] = result['total_saved']
-        scraping_status[task_id]["sources"] = {'olx': result['total_saved']}
-        scraping_status[task_id]["completed_at"] = datetime.now().isoformat()
-
-    except Exception as e:
-        scraping_status[task_id]["status"] = "failed"
-        scraping_status[task_id]["error"] = str(e)
+def _job_status(job: dict) -> dict:
+    """Job row -> status payload (same fields as the old in-memory status)"""
+    status = {
+        "task_id": str(job['id']),
+        "status": job['status'],
+        "progress": job['progress'] or 0,
+        "message": job['message'],
+        "attempts": job['attempts'],
+        "created_at": job['created_at'].isoformat() if job['created_at'] else None,
+        "sources": {},
+    }
+    result = job['result']
+    if result:
+        status["result"] = result
+        status["total_found"] = result.get('total_found', 0)
+        status["total_saved"] = result.get('total_saved', 0)
+        status["sources"] = {'olx': result.get('total_saved', 0)}
+    if job['finished_at']:
+        status["completed_at"] = job['finished_at'].isoformat()
+    if job['error']:
+        status["error"] = job['error']
+    return status
 
 @router.post("/scrape", response_model=ScrapeStatusResponse)
-async def start_scraping(
-    request: ScrapeRequest,
-    background_tasks: BackgroundTasks
-):
+async def start_scraping(request: ScrapeRequest):
     """
     Pornește procesul de scraping pentru o mașină
     Uses OLX RSS feeds (100% legal)
 
+    Job-ul intră în coada scrape_jobs și e rulat de scrape_worker.py;
+    un job identic deja în așteptare/rulare este refolosit
+
     Returns:
         - task_id: ID pentru tracking
         - status: status initial
     """
-    # Generează task ID
-    task_id = f"{request.marca}_{request.model}_{datetime.now().timestamp()}"
+    job = await scrape_job_queue.enqueue('model', {
+        'marca': request.marca,
+        'model': request.model,
+        'incremental': request.incremental,
+    })
+    task_id = str(job['id'])
 
-    # Pornește task în background
-    background_tasks.add_task(scrape_task, request.marca, request.model, task_id)
+    message = f"Scraping queued. Track progress with task_id: {task_id}"
+    if job.get('deduplicated'):
+        message = f"Same scrape already {job['status']}. Track progress with task_id: {task_id}"
 
     return ScrapeStatusResponse(
         success=True,
         total_found=0,
         sources={},
-        message=f"Scraping started. Track progress with task_id: {task_id}"
+        message=message,
+        task_id=task_id
     )
 
 @router.get("/scrape/status/{task_id}")
@@ -71,10 +82,82 @@ async def get_scraping_status(task_id: str):
     """
     Obține status-ul unui task de scraping
     """
-    if task_id not in scraping_status:
+    job = await scrape_job_queue.get(int(task_id)) if task_id.isdigit() else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    return _job_status(job)
+
+def _sse(event_id: Optional[int], event_type: str, data: dict) -> str:
+    """Format one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+@router.get("/scrape/stream/{task_id}")
+async def stream_scraping_progress(task_id: str, last_event_id: Optional[str] = Header(default=None)):
+    """
+    Stream de progres (Server-Sent Events) pentru un task de scraping
+
+    Evenimente: page (pagini descărcate, anunțuri parsate, așteptare rate limit),
+    saved (anunțuri inserate), query (query-uri terminate), retry, iar la final
+    summary sau failed, urmat de end. Fiecare eveniment include totalurile
+    pages_fetched, listings_parsed, listings_inserted.
+    La reconectare, header-ul Last-Event-ID reia stream-ul de unde a rămas.
+    """
+    job = await scrape_job_queue.get(int(task_id)) if task_id.isdigit() else None
+    if job is None:
         raise HTTPException(status_code=404, detail="Task not found")
-    
-    return scraping_status[task_id]
+
+    job_id = job['id']
+    start_after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def events():
+        last_id = start_after
+        idle = 0.0
+        yield _sse(None, 'status', _job_status(job))
+
+        with scrape_job_notifier.subscribe(job_id) as changed:
+            while True:
+                # Cleared before reading, so a change during the read wakes the next wait
+                changed.clear()
+                new_events = await scrape_job_queue.events_after(job_id, last_id)
+                for event in new_events:
+                    last_id = event['id']
+                    yield _sse(event['id'], event['type'], event['data'] or {})
+
+                if new_events:
+                    idle = 0.0
+                else:
+                    current = await scrape_job_queue.get(job_id)
+                    if current is None or current['status'] in ('completed', 'failed'):
+                        # Final events are written before the status changes;
+                        # send any that landed after the fetch above
+                        for event in await scrape_job_queue.events_after(job_id, last_id):
+                            yield _sse(event['id'], event['type'], event['data'] or {})
+                        yield _sse(None, 'end', _job_status(current) if current else {'status': 'deleted'})
+                        return
+
+                    if idle >= STREAM_KEEPALIVE_SECONDS:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+
+                wait = STREAM_KEEPALIVE_SECONDS if scrape_job_notifier.listening else STREAM_POLL_SECONDS
+                started = asyncio.get_running_loop().time()
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                idle += asyncio.get_running_loop().time() - started
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @router.post("/scrape/sync", response_model=ScrapeStatusResponse)
 async def scrape_synchronous(request: ScrapeRequest):
@@ -85,7 +168,8 @@ async def scrape_synchronous(request: ScrapeRequest):
     try:
         result = await scraper_service.update_specific_model(
             marca=request.marca,
-            model=request.model
+            model=request.model,
+            incremental=request.incremental
         )
 
         return ScrapeStatusResponse(
@@ -100,38 +184,23 @@ async def scrape_synchronous(request: ScrapeRequest):
 
 
 @router.post("/scrape/popular")
-async def scrape_popular_models(background_tasks: BackgroundTasks):
+async def scrape_popular_models(incremental: bool = False):
     """
     Scrape popular car models in Romania
     Uses OLX RSS feeds (100% legal)
-    Runs in background to avoid timeout
+    Queued for the scrape workers to avoid timeout
+
+    With incremental=true only new listings are fetched (scheduled refreshes)
     """
     try:
-        # Run in background for large scraping operations
-        task_id = f"popular_{datetime.now().timestamp()}"
-
-        scraping_status[task_id] = {
-            "status": "running",
-            "progress": 0,
-            "message": "Scraping popular models..."
-        }
-
-        async def popular_task():
-            try:
-                result = await scraper_service.update_popular_models()
-                scraping_status[task_id]["status"] = "completed"
-                scraping_status[task_id]["progress"] = 100
-                scraping_status[task_id]["result"] = result
-            except Exception as e:
-                scraping_status[task_id]["status"] = "failed"
-                scraping_status[task_id]["error"] = str(e)
-
-        background_tasks.add_task(popular_task)
+        job = await scrape_job_queue.enqueue('popular', {'incremental': incremental})
+        task_id = str(job['id'])
 
         return {
             'success': True,
             'task_id': task_id,
-            'message': 'Scraping popular models in background. Check status with /scrape/status/{task_id}'
+            'deduplicated': bool(job.get('deduplicated')),
+            'message': f'Scraping popular models queued. Check status with /scrape/status/{task_id}'
         }
 
     except Exception as e:
@@ -89,6 +89,7 @@ class ScrapeRequest(BaseModel):
     pret_min: Optional[float] = None
     pret_max: Optional[float] = None
     locatie: Optional[str] = None
+    incremental: bool = False  # Stop paging at listings already in the DB
 
     class Config:
         schema_extra = {
@@ -130,10 +131,29 @@ class ListingResponse(BaseModel):
         orm_mode = True
 
 
+class ListingProjection(BaseModel):
+    """Anunț cu doar câmpurile cerute prin ?fields= (aceleași ca ListingResponse)"""
+    id: Optional[int] = None
+    source: Optional[str] = None
+    url: Optional[str] = None
+    marca: Optional[str] = None
+    model: Optional[str] = None
+    an: Optional[int] = None
+    km: Optional[int] = None
+    pret: Optional[float] = None
+    combustibil: Optional[str] = None
+    locatie: Optional[str] = None
+    dotari: Optional[List[str]] = None
+    imagini: Optional[List[str]] = None
+    descriere: Optional[str] = None
+    data_publicare: Optional[datetime] = None
+    zile_pe_piata: Optional[int] = None
+
+
 class MarketAnalysisResponse(BaseModel):
     """Response pentru analiză piață - FLEXIBIL pentru noul sistem"""
     # Required fields (always present)
-    source: str  # 'database_exact', 'database_similar', 'generic_formula'
+    source: str  # 'comparables', 'database_filtered', 'database_exact', 'database_similar', 'depreciation_model', 'generic_formula'
     confidence: int  # 60-95%
     description: str  # Human-readable description
     sample_size: int  # Number of listings used (0 for generic)
@@ -150,6 +170,17 @@ class MarketAnalysisResponse(BaseModel):
     days_on_market_avg: Optional[float] = 0.0
     regional_distribution: Optional[dict] = {}
 
+    # Data freshness (stale-while-revalidate mode)
+    data_age_hours: Optional[float] = None  # Hours since the newest listing used was scraped
+    stale: Optional[bool] = False  # True when served from stale data while refreshing
+    refresh_id: Optional[str] = None  # Poll GET /api/analyze/refresh/{refresh_id}
+
+    # Fallback analyzer: duration of each tier it ran
+    tier_timings_ms: Optional[dict] = None
+
+    # Smart analyzer: nearest active listings used for the price range
+    comparables: Optional[List[dict]] = None  # id, an, km, putere_cp, capacitate_cilindrica, pret, distance
+
     class Config:
         schema_extra = {
             "example": {
@@ -208,6 +239,7 @@ class ScrapeStatusResponse(BaseModel):
     total_found: int
     sources: dict
     message: str
+    task_id: Optional[str] = None  # Set for queued scrapes (GET /scrape/status/{task_id})
 
     class Config:
         schema_extra = {
@@ -0,0 +1,241 @@
+"""
+Listing Attribute Extractor - All car attributes from listing text in one pass
+Shared by every OLX scraper: year, km, power, engine size, fuel, transmission,
+drivetrain and body type
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+
+class ListingAttributeExtractor:
+    """
+    Precompiled single-pass extractor
+
+    All keywords and numeric patterns are compiled into one regex that is run
+    once over the lowercased text. Results follow the original per-field
+    rules: priority order between keywords, title before text for year/km,
+    first match per numeric pattern plus sanity ranges.
+    """
+
+    # (field, value, keywords) in priority order - first value present wins
+    KEYWORD_RULES = [
+        ('transmisie', 'automata', ['automat', 'automata', 'dsg', 'cvt', 'tiptronic', 'steptronic', 's-tronic']),
+        ('transmisie', 'manuala', ['manual', 'manuala', 'cutie manuala']),
+        ('tractiune', '4x4', ['4x4', '4wd', 'awd', 'quattro', 'xdrive', '4motion', '4matic']),
+        ('tractiune', 'spate', ['rwd', 'propulsie', 'spate']),
+        ('caroserie', 'suv', ['suv', 'crossover', 'off-road', 'offroad']),
+        ('caroserie', 'coupe', ['coupe', 'coupé']),
+        ('caroserie', 'cabrio', ['cabrio', 'cabriolet', 'convertible', 'descapotabil']),
+        ('caroserie', 'break', ['break', 'combi', 'touring', 'avant', 'estate', 'wagon']),
+        ('caroserie', 'sedan', ['sedan', 'limuzina', 'berlina']),
+        ('combustibil', 'diesel', ['diesel', 'motorina']),
+        ('combustibil', 'benzina', ['benzina', 'petrol']),
+        ('combustibil', 'electric', ['electric']),
+        ('combustibil', 'hybrid', ['hybrid', 'hibrid']),
+        ('combustibil', 'gpl', ['gpl', 'lpg']),
+    ]
+
+    DEFAULTS = {
+        'transmisie': 'unknown',
+        'tractiune': 'fata',
+        'caroserie': 'hatchback',
+        'combustibil': 'benzina',
+    }
+
+    # Model series that are always SUVs (checked after SUV keywords)
+    SUV_MODELS = ['x1', 'x2', 'x3', 'x4', 'x5', 'x6', 'x7', 'q3', 'q5', 'q7', 'q8',
+                  'gle', 'glc', 'gla', 'tiguan', 'touareg', 'cayenne', 'macan']
+
+    # Numeric tokens, tried in this order at the start of every number
+    # (lowercased text). Each token kind keeps its first occurrence.
+    NUMERIC_PATTERNS = [
+        # "2.0 tdi", "1.6l" - unit in a lookahead so "2.0 limuzina" keeps its keyword
+        ('liters', r'(\d\.\d)(?=\s*(tdi|tsi|l))'),
+        # "190.000 km", "85 000 km", "180000km", "200 mii km". A separator is
+        # only read before a group of exactly 3 digits, so the year in
+        # "2015 180000 km" is never glued to the km (possessive: no
+        # backtracking into a shorter number)
+        ('km', r'(\d{1,3}(?:[.\s]\d{3})+|\d++)(?!\d)\s*(km|mii\s*km)'),
+        ('power', r'(\d{2,3})\s*(cp|cai|hp)'),
+        ('cm3', r'(\d{3,4})\s*cm'),
+        ('year', r'\b(19\d{2}|20[0-2]\d)\b'),
+    ]
+
+    POWER_UNITS = ['cp', 'cai', 'hp']
+    LITERS_UNITS = ['l', 'tdi', 'tsi']
+
+    YEAR_RANGE = (1990, 2025)
+    POWER_RANGE = (50, 1000)
+    KM_MAX = 1000000
+
+    def __init__(self):
+        # keyword -> every (field, value) it proves present. Keywords are
+        # matched left to right without overlaps, longest first, so a keyword
+        # also stands for every shorter keyword inside it
+        # ("automata" -> "automat", "cutie manuala" -> "manual")
+        keyword_values: Dict[str, set] = {}
+        for field, value, keywords in self.KEYWORD_RULES:
+            for keyword in keywords:
+                keyword_values.setdefault(keyword, set()).add((field, value))
+
+        self._implied: Dict[str, frozenset] = {}
+        for keyword in keyword_values:
+            implied = set()
+            for other, values in keyword_values.items():
+                if other in keyword:
+                    implied |= values
+            self._implied[keyword] = frozenset(implied)
+
+        # Token = a keyword, a numeric token, or any other digit run (consumed
+        # whole, so numbers are only read from their first digit). The digit
+        # lookahead lets most positions fail on one test.
+        numeric = [pattern for _, pattern in self.NUMERIC_PATTERNS] + [r'\d+']
+        self._token_re = re.compile(
+            '(' + self._trie_pattern(list(keyword_values)) + r')|(?=\d)(?:' + '|'.join(numeric) + ')'
+        )
+
+        # Field priority lists, e.g. {'transmisie': ['automata', 'manuala']}
+        self._priorities: Dict[str, List[str]] = {}
+        for field, value, _ in self.KEYWORD_RULES:
+            self._priorities.setdefault(field, []).append(value)
+
+    @staticmethod
+    def _trie_pattern(words: List[str]) -> str:
+        """
+        Build a prefix-trie regex ("a(?:utomata?|wd|vant)|...")
+
+        The regex engine tries alternatives one by one; sharing prefixes keeps
+        the work per text position down to a single character test.
+        """
+        trie: Dict = {}
+        for word in words:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def build(node: Dict) -> str:
+            branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branches:
+                return ''
+            body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+            # Greedy optional tail -> longest keyword wins
+            return f'(?:{body})?' if '' in node else body
+
+        return build(trie)
+
+    def _scan(self, text: str) -> Tuple[set, Dict[str, tuple]]:
+        """
+        One pass over lowercased text
+
+        Returns:
+            ({(field, value), ...} keywords present,
+             {'km' / 'year' / 'cm3' / 'power_<unit>' / 'liters_<unit>': groups of first match})
+        """
+        present = set()
+        first = {}
+
+        for keyword, liters, liters_unit, km, km_unit, power, power_unit, cm3, year \
+                in self._token_re.findall(text):
+            if keyword:
+                present |= self._implied[keyword]
+            elif liters:
+                first.setdefault('liters_' + liters_unit, (liters,))
+            elif km_unit:
+                first.setdefault('km', (km, km_unit))
+            elif power:
+                first.setdefault('power_' + power_unit, (power,))
+            elif cm3:
+                first.setdefault('cm3', (cm3,))
+            elif year:
+                first.setdefault('year', (year,))
+
+        return present, first
+
+    def extract(self, title: str, text: Optional[str] = None, model_series: Optional[str] = None) -> Dict:
+        """
+        Extract every attribute from a listing
+
+        Args:
+            title: Listing title
+            text: Full card text (defaults to the title)
+            model_series: Model series, used for SUV detection
+
+        Returns:
+            Dict keyed like the listing dict: an, km, putere_cp,
+            capacitate_cilindrica, combustibil, transmisie, tractiune, caroserie
+        """
+        title_present, title_first = self._scan(title.lower())
+        if text is None:
+            text_present, text_first = title_present, title_first
+        else:
+            text_present, text_first = self._scan(text.lower())
+
+        attributes = {
+            'an': self._year(title_first, text_first),
+            'km': self._km(title_first, text_first),
+            'putere_cp': self._power(text_first),
+            'capacitate_cilindrica': self._capacity(text_first),
+        }
+
+        for field in ('transmisie', 'tractiune', 'caroserie'):
+            attributes[field] = self._pick(field, text_present)
+        # Fuel looks at title and text together
+        attributes['combustibil'] = self._pick('combustibil', title_present | text_present)
+
+        # Body type: SUV model series outrank every keyword but the SUV ones
+        if attributes['caroserie'] != 'suv' and model_series:
+            series_lower = model_series.lower()
+            if any(mdl in series_lower for mdl in self.SUV_MODELS):
+                attributes['caroserie'] = 'suv'
+
+        return attributes
+
+    def _pick(self, field: str, present: set) -> str:
+        for value in self._priorities[field]:
+            if (field, value) in present:
+                return value
+        return self.DEFAULTS[field]
+
+    def _year(self, *sources: Dict[str, tuple]) -> Optional[int]:
+        for first in sources:
+            groups = first.get('year')
+            if groups:
+                year = int(groups[0])
+                if self.YEAR_RANGE[0] <= year <= self.YEAR_RANGE[1]:
+                    return year
+        return None
+
+    def _km(self, *sources: Dict[str, tuple]) -> int:
+        for first in sources:
+            groups = first.get('km')
+            if groups:
+                km = int(re.sub(r'\D', '', groups[0]))
+                if 'mii' in groups[1]:
+                    km *= 1000
+                if 0 <= km <= self.KM_MAX:
+                    return km
+        return 0
+
+    def _power(self, first: Dict[str, tuple]) -> Optional[int]:
+        for unit in self.POWER_UNITS:
+            groups = first.get('power_' + unit)
+            if groups:
+                power = int(groups[0])
+                if self.POWER_RANGE[0] <= power <= self.POWER_RANGE[1]:
+                    return power
+        return None
+
+    def _capacity(self, first: Dict[str, tuple]) -> Optional[int]:
+        for unit in self.LITERS_UNITS:
+            groups = first.get('liters_' + unit)
+            if groups:
+                return int(float(groups[0]) * 1000)
+        groups = first.get('cm3')
+        if groups:
+            return int(groups[0])
+        return None
+
+
+# Global instance
+listing_attribute_extractor = ListingAttributeExtractor()
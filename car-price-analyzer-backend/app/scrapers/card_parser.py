@@ -0,0 +1,97 @@
+"""
+Listing Card Parser - Fast extraction of OLX listing cards
+Locates div[data-cy="l-card"] with lxml (C parser + precompiled XPath)
+and only builds BeautifulSoup trees for the card subtrees
+"""
+import os
+from typing import List
+
+from bs4 import BeautifulSoup, Tag
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+    LXML_AVAILABLE = True
+except ImportError:  # pragma: no cover - lxml is pinned in requirements.txt
+    LXML_AVAILABLE = False
+
+
+class ListingCardParser:
+    """
+    Pluggable parser backend for OLX search pages
+
+    Backends:
+    - 'lxml': whole page parsed in C, cards located with a precompiled XPath,
+      the card subtrees re-serialized and handed to BeautifulSoup together
+    - 'html.parser': original behavior, pure-Python parse of the whole page
+
+    Both return BeautifulSoup Tags, so the scrapers' `_parse_listing_card`
+    code works unchanged and produces the same dicts.
+    """
+
+    BACKENDS = ('lxml', 'html.parser')
+    DEFAULT_BACKEND = 'lxml'
+
+    # Tree builder used for the card fragments
+    FRAGMENT_BUILDER = 'lxml'
+
+    CARD_TAG = 'div'
+    CARD_ATTRS = {'data-cy': 'l-card'}
+
+    def __init__(self, backend: str = None):
+        backend = backend or os.getenv('SCRAPER_PARSER_BACKEND', self.DEFAULT_BACKEND)
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown parser backend '{backend}'. Use one of: {', '.join(self.BACKENDS)}")
+        if backend == 'lxml' and not LXML_AVAILABLE:
+            backend = 'html.parser'
+
+        self.backend = backend
+        self._card_xpath = etree.XPath(
+            '//div[@data-cy="l-card"][not(ancestor::div[@data-cy="l-card"])]'
+        ) if LXML_AVAILABLE else None
+
+    def parse_cards(self, html: str) -> List[Tag]:
+        """
+        Extract listing cards from a search results page
+
+        Args:
+            html: Raw page HTML
+
+        Returns:
+            List of BeautifulSoup Tags, one per listing card
+        """
+        if not html or not html.strip():
+            return []
+
+        if self.backend == 'lxml':
+            try:
+                return self._parse_cards_lxml(html)
+            except (etree.ParserError, ValueError) as e:
+                print(f"lxml card parsing failed ({e}), falling back to html.parser")
+
+        return self._parse_cards_html_parser(html)
+
+    def _parse_cards_html_parser(self, html: str) -> List[Tag]:
+        """Original path: parse the whole page with html.parser"""
+        soup = BeautifulSoup(html, 'html.parser')
+        return soup.find_all(self.CARD_TAG, self.CARD_ATTRS)
+
+    def _parse_cards_lxml(self, html: str) -> List[Tag]:
+        """Parse the page in C, build one soup holding only the card subtrees"""
+        root = lxml_html.document_fromstring(html)
+
+        # Outermost cards only - nested ones come back from find_all below,
+        # exactly as they would from a whole-page find_all
+        fragments = [
+            etree.tostring(element, encoding='unicode', method='html', with_tail=False)
+            for element in self._card_xpath(root)
+        ]
+        if not fragments:
+            return []
+
+        soup = BeautifulSoup(''.join(fragments), self.FRAGMENT_BUILDER)
+        return soup.find_all(self.CARD_TAG, self.CARD_ATTRS)
+
+
+# Global instance
+listing_card_parser = ListingCardParser()
@@ -7,8 +7,16 @@ import aiohttp
 from bs4 import BeautifulSoup
 import re
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Callable, Awaitable
 from urllib.parse import quote, urljoin
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+from app.scrapers.card_parser import listing_card_parser
+from app.scrapers.known_urls import KnownURLIndex
+from app.scrapers.olx_state import olx_state_parser
+from app.scrapers.part_filter import car_part_filter
+from app.scrapers.page_archive import page_archive
+from app.scrapers.parse_pool import parse_pool
+from app.scrapers.scrape_scheduler import scrape_scheduler
 
 
 class DetailedOLXScraper:
@@ -18,6 +26,7 @@ class DetailedOLXScraper:
 
     BASE_URL = "https://www.olx.ro"
     SEARCH_URL = "https://www.olx.ro/d/oferte/q-{query}/"
+    NEWEST_FIRST = "search%5Border%5D=created_at:desc"
     DELAY_BETWEEN_REQUESTS = 10  # seconds
     USER_AGENT = "CarAnalyzer/2.0 (+https://github.com/MihaiDBR/CarAnalyzer) Research Bot"
 
@@ -59,7 +68,14 @@ class DetailedOLXScraper:
         if self.session and not self.session.closed:
             await self.session.close()
 
-    async def search_cars(self, marca: str, model: Optional[str] = None, max_pages: int = 2) -> List[Dict]:
+    async def search_cars(
+        self,
+        marca: str,
+        model: Optional[str] = None,
+        max_pages: int = 2,
+        known_urls: Optional[KnownURLIndex] = None,
+        on_event: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> List[Dict]:
         """
         Search for detailed car listings
 
@@ -67,6 +83,10 @@ class DetailedOLXScraper:
             marca: Car brand
             model: Car model (optional)
             max_pages: Maximum pages to scrape
+            known_urls: Incremental mode - results are sorted newest first and
+                paging stops at the first page that is mostly already known
+            on_event: Optional coroutine called with a 'page' event after
+                every parsed page (listings found, rate-limit wait)
 
         Returns:
             List of detailed car listings
@@ -78,6 +98,8 @@ class DetailedOLXScraper:
 
         encoded_query = quote(search_query.lower().replace(' ', '-'))
         url = self.SEARCH_URL.format(query=encoded_query)
+        if known_urls is not None:
+            url = f"{url}?{self.NEWEST_FIRST}"
 
         print(f"Searching: {search_query}")
 
@@ -86,11 +108,10 @@ class DetailedOLXScraper:
 
         try:
             for page in range(1, max_pages + 1):
-                page_url = url if page == 1 else f"{url}?page={page}"
+                separator = '&' if '?' in url else '?'
+                page_url = url if page == 1 else f"{url}{separator}page={page}"
 
-                if self.request_count > 0:
-                    print(f"Rate limiting: {self.DELAY_BETWEEN_REQUESTS}s...")
-                    await asyncio.sleep(self.DELAY_BETWEEN_REQUESTS)
+                wait = await scrape_scheduler.acquire(page_url)
 
                 print(f"Fetching page {page}...")
                 async with session.get(page_url) as response:
@@ -101,14 +122,31 @@ class DetailedOLXScraper:
                     html = await response.text()
                     self.request_count += 1
 
-                page_listings = self._parse_search_page(html, marca, model)
+                await page_archive.store(page_url, html, parse_search_page, marca, model)
+
+                page_listings = await parse_pool.parse(parse_search_page, html, marca, model)
                 listings.extend(page_listings)
 
                 print(f"Found {len(page_listings)} listings on page {page}")
 
+                if on_event:
+                    await on_event({
+                        'type': 'page',
+                        'query': search_query,
+                        'page': page,
+                        'listings': len(page_listings),
+                        'wait': round(wait, 1),
+                    })
+
                 if not page_listings:
                     break
 
+                # Newest first: once a page is mostly known, older pages are too
+                if known_urls is not None and known_urls.should_stop(page_listings):
+                    known = known_urls.known_fraction(page_listings)
+                    print(f"Page {page} is {known:.0%} known, stopping")
+                    break
+
             print(f"Total: {len(listings)} listings")
 
         except Exception as e:
@@ -117,12 +155,29 @@ class DetailedOLXScraper:
         return listings
 
     def _parse_search_page(self, html: str, marca: str, model: Optional[str]) -> List[Dict]:
-        """Parse search results page"""
-        soup = BeautifulSoup(html, 'html.parser')
-        cards = soup.find_all('div', {'data-cy': 'l-card'})
+        """Parse search results page (embedded JSON state first, DOM as fallback)"""
+        ads = olx_state_parser.parse_ads(html)
+        if ads is not None:
+            # Filter car parts for the whole page at once
+            is_part = car_part_filter.classify([ad['title'] for ad in ads])
+
+            listings = []
+            for ad, part in zip(ads, is_part):
+                if part:
+                    continue
+                listing = self._listing_from_state(ad, marca, model)
+                if listing:
+                    listings.append(listing)
+            return listings
+
+        cards = listing_card_parser.parse_cards(html)
+        # Same page-level part filter as the JSON path
+        is_part = car_part_filter.classify([self._card_title(card) for card in cards])
 
         listings = []
-        for card in cards:
+        for card, part in zip(cards, is_part):
+            if part:
+                continue
             try:
                 listing = self._parse_listing_card(card, marca, model)
                 if listing:
@@ -132,8 +187,13 @@ class DetailedOLXScraper:
 
         return listings
 
+    @staticmethod
+    def _card_title(card) -> str:
+        title_elem = card.find('h6') or card.find('h4')
+        return title_elem.get_text(strip=True) if title_elem else ""
+
     def _parse_listing_card(self, card, marca: str, model: Optional[str]) -> Optional[Dict]:
-        """Parse detailed listing card"""
+        """Parse detailed listing card (car parts are filtered per page, in `_parse_search_page`)"""
         try:
             # Extract URL
             link = card.find('a', href=True)
@@ -142,40 +202,24 @@ class DetailedOLXScraper:
             url = urljoin(self.BASE_URL, link['href'])
 
             # Extract title and full text
-            title_elem = card.find('h6') or card.find('h4')
-            title = title_elem.get_text(strip=True) if title_elem else ""
+            title = self._card_title(card)
             if not title:
                 return None
 
             full_text = card.get_text()
 
-            # Filter car parts
-            if self._is_car_part(title):
-                return None
-
             # Extract price
             price = self._extract_price_from_card(card)
             if not price or price < 3000:
                 return None
 
-            # Extract year (CRITICAL)
-            year = self._extract_year(title, full_text)
-            if not year:
-                return None  # Skip if no year - can't calculate depreciation
-
-            # Extract kilometers
-            km = self._extract_km(title, full_text)
-
             # Extract model series and variant
             model_series, model_variant = self._extract_model_details(title, marca, model)
 
-            # Extract technical specs
-            fuel_type = self._extract_fuel_type(title, full_text)
-            power_cp = self._extract_power(title, full_text)
-            capacity_cc = self._extract_engine_capacity(title, full_text)
-            transmission = self._extract_transmission(title, full_text)
-            drivetrain = self._extract_drivetrain(title, full_text)
-            body_type = self._extract_body_type(title, full_text, model_series)
+            # Extract year, km and technical specs in one pass
+            attributes = listing_attribute_extractor.extract(title, full_text, model_series)
+            if not attributes['an']:
+                return None  # Skip if no year - can't calculate depreciation
 
             # Extract location
             location = self._extract_location(card)
@@ -188,15 +232,15 @@ class DetailedOLXScraper:
                 'model': model.title() if model else model_series,
                 'model_series': model_series,
                 'model_variant': model_variant,
-                'an': year,
-                'km': km,
+                'an': attributes['an'],
+                'km': attributes['km'],
                 'pret': price,
-                'combustibil': fuel_type,
-                'putere_cp': power_cp,
-                'capacitate_cilindrica': capacity_cc,
-                'transmisie': transmission,
-                'tractiune': drivetrain,
-                'caroserie': body_type,
+                'combustibil': attributes['combustibil'],
+                'putere_cp': attributes['putere_cp'],
+                'capacitate_cilindrica': attributes['capacitate_cilindrica'],
+                'transmisie': attributes['transmisie'],
+                'tractiune': attributes['tractiune'],
+                'caroserie': attributes['caroserie'],
                 'locatie': location,
                 'dotari': [],
                 'imagini': [],
@@ -211,32 +255,56 @@ class DetailedOLXScraper:
         except Exception as e:
             return None
 
-    def _is_car_part(self, title: str) -> bool:
-        """Check if listing is for a car part"""
-        title_lower = title.lower()
-        parts_keywords = [
-            'jante', 'janta', 'roata', 'roti', 'anvelope',
-            'stopuri', 'stop', 'faruri', 'far', 'oglinda',
-            'bara', 'portiera', 'capota', 'haion',
-            'volant', 'scaune', 'bord',
-            'motor', 'cutie viteze', 'turbo', 'alternator',
-            'carcasa', 'deflector', 'senzori',
-            'perna', 'amortizor', 'suspensie',
-            'radiator', 'intercooler', 'toba',
-            'filtru', 'curea', 'ulei'
-        ]
-
-        for keyword in parts_keywords:
-            if keyword in title_lower:
-                # Exception: full car sale indicators
-                if any(word in title_lower for word in ['vand ', 'schimb', 'urgent', 'full']):
-                    has_year = re.search(r'\b20\d{2}\b', title)
-                    has_km = re.search(r'\d+\s*km', title_lower)
-                    if has_year and has_km and len(title.split()) > 6:
-                        return False
-                return True
-
-        return False
+    def _listing_from_state(self, ad: Dict, marca: str, model: Optional[str]) -> Optional[Dict]:
+        """
+        Build a detailed listing from an embedded-state ad
+
+        Structured OLX params are used as-is; text extraction only fills
+        the gaps (e.g. drivetrain, which OLX does not expose). Car parts are
+        already filtered out by `_parse_search_page`.
+        """
+        title = ad['title']
+        text = f"{title} {ad['params_text']}"
+
+        price = ad['price']
+        if not price or price < 3000:
+            return None
+
+        model_series, model_variant = self._extract_model_details(title, marca, model)
+        attributes = listing_attribute_extractor.extract(title, text, model_series)
+
+        year = ad['year'] if ad['year'] and 1990 <= ad['year'] <= 2025 else attributes['an']
+        if not year:
+            return None
+
+        km = ad['km'] if ad['km'] is not None else attributes['km']
+
+        published = ad['created'] or datetime.now()
+
+        return {
+            'source': 'olx',
+            'url': ad['url'],
+            'marca': marca.title(),
+            'model': model.title() if model else model_series,
+            'model_series': model_series,
+            'model_variant': model_variant,
+            'an': year,
+            'km': km,
+            'pret': price,
+            'combustibil': ad['fuel_type'] or attributes['combustibil'],
+            'putere_cp': ad['power_cp'] or attributes['putere_cp'],
+            'capacitate_cilindrica': ad['engine_cc'] or attributes['capacitate_cilindrica'],
+            'transmisie': ad['transmission'] or attributes['transmisie'],
+            'tractiune': attributes['tractiune'],
+            'caroserie': ad['body_type'] or attributes['caroserie'],
+            'locatie': ad['location'] or "Romania",
+            'dotari': [],
+            'imagini': ad['photos'],
+            'descriere': title[:500],
+            'data_publicare': published,
+            'zile_pe_piata': max(0, (datetime.now() - published).days),
+            'este_activ': True
+        }
 
     def _extract_model_details(self, title: str, marca: str, model: Optional[str]) -> tuple:
         """
@@ -252,8 +320,10 @@ class DetailedOLXScraper:
 
         # Extract variant (GTI, R, M, AMG, etc.)
         variant = None
-        variants_to_check = self.PERFORMANCE_VARIANTS.get(marca_lower, [])
-        variants_to_check += self.PERFORMANCE_VARIANTS.get(model.lower() if model else '', [])
+        variants_to_check = (
+            self.PERFORMANCE_VARIANTS.get(marca_lower, []) +
+            self.PERFORMANCE_VARIANTS.get(model.lower() if model else '', [])
+        )
 
         for perf_variant in variants_to_check:
             if perf_variant.lower() in title_lower:
@@ -292,97 +362,6 @@ class DetailedOLXScraper:
             return words[0]
         return "Unknown"
 
-    def _extract_power(self, title: str, text: str) -> Optional[int]:
-        """Extract power in CP"""
-        # Look for "150 CP", "200cp", "180 cai"
-        for pattern in [r'(\d{2,3})\s*cp', r'(\d{2,3})\s*cai', r'(\d{2,3})\s*hp']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                power = int(match.group(1))
-                if 50 <= power <= 1000:  # Sanity check
-                    return power
-        return None
-
-    def _extract_engine_capacity(self, title: str, text: str) -> Optional[int]:
-        """Extract engine capacity in cm3"""
-        # Look for "2.0", "1.6", "3.0L"
-        for pattern in [r'(\d\.\d)\s*l', r'(\d\.\d)\s*tdi', r'(\d\.\d)\s*tsi']:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                liters = float(match.group(1))
-                return int(liters * 1000)  # Convert to cm3
-
-        # Look for direct cm3 mention
-        match = re.search(r'(\d{3,4})\s*cm', text, re.IGNORECASE)
-        if match:
-            return int(match.group(1))
-
-        return None
-
-    def _extract_transmission(self, title: str, text: str) -> str:
-        """Extract transmission type"""
-        text_lower = text.lower()
-
-        # Keywords for automatic
-        auto_keywords = ['automat', 'automata', 'dsg', 'cvt', 'tiptronic', 'steptronic', 's-tronic']
-        if any(kw in text_lower for kw in auto_keywords):
-            return 'automata'
-
-        # Keywords for manual
-        manual_keywords = ['manual', 'manuala', 'cutie manuala']
-        if any(kw in text_lower for kw in manual_keywords):
-            return 'manuala'
-
-        return 'unknown'
-
-    def _extract_drivetrain(self, title: str, text: str) -> str:
-        """Extract drivetrain (fata, spate, 4x4)"""
-        text_lower = text.lower()
-
-        # 4WD / AWD
-        if any(kw in text_lower for kw in ['4x4', '4wd', 'awd', 'quattro', 'xdrive', '4motion', '4matic']):
-            return '4x4'
-
-        # RWD
-        if any(kw in text_lower for kw in ['rwd', 'propulsie', 'spate']):
-            return 'spate'
-
-        # FWD (most common)
-        return 'fata'
-
-    def _extract_body_type(self, title: str, text: str, model_series: str) -> str:
-        """Extract body type"""
-        text_lower = text.lower()
-
-        # SUV / Crossover
-        suv_keywords = ['suv', 'crossover', 'off-road', 'offroad']
-        suv_models = ['x1', 'x2', 'x3', 'x4', 'x5', 'x6', 'x7', 'q3', 'q5', 'q7', 'q8',
-                      'gle', 'glc', 'gla', 'tiguan', 'touareg', 'cayenne', 'macan']
-
-        if any(kw in text_lower for kw in suv_keywords):
-            return 'suv'
-        if model_series and any(mdl in model_series.lower() for mdl in suv_models):
-            return 'suv'
-
-        # Coupe
-        if 'coupe' in text_lower or 'coupé' in text_lower:
-            return 'coupe'
-
-        # Cabrio / Convertible
-        if any(kw in text_lower for kw in ['cabrio', 'cabriolet', 'convertible', 'descapotabil']):
-            return 'cabrio'
-
-        # Break / Wagon / Estate
-        if any(kw in text_lower for kw in ['break', 'combi', 'touring', 'avant', 'estate', 'wagon']):
-            return 'break'
-
-        # Sedan / Limousine
-        if any(kw in text_lower for kw in ['sedan', 'limuzina', 'berlina']):
-            return 'sedan'
-
-        # Hatchback (default for compact cars)
-        return 'hatchback'
-
     def _extract_price_from_card(self, card) -> Optional[float]:
         """Extract and convert price"""
         price_elem = card.find('p', {'data-testid': 'ad-price'})
@@ -420,49 +399,6 @@ class DetailedOLXScraper:
 
         return None
 
-    def _extract_year(self, title: str, text: str) -> Optional[int]:
-        """Extract year"""
-        for source in [title, text]:
-            match = re.search(r'\b(19\d{2}|20[0-2]\d)\b', source)
-            if match:
-                year = int(match.group(1))
-                if 1990 <= year <= 2025:
-                    return year
-        return None
-
-    def _extract_km(self, title: str, text: str) -> int:
-        """Extract kilometers"""
-        for source in [title, text]:
-            match = re.search(r'(\d+)[.\s]?(\d+)?\s*(km|mii\s*km)', source, re.IGNORECASE)
-            if match:
-                km_str = match.group(1) + (match.group(2) or '')
-                try:
-                    km = int(km_str)
-                    if 'mii' in match.group(3).lower():
-                        km *= 1000
-                    if 0 <= km <= 1000000:
-                        return km
-                except ValueError:
-                    pass
-        return 0
-
-    def _extract_fuel_type(self, title: str, text: str) -> str:
-        """Extract fuel type"""
-        text_lower = (title + ' ' + text).lower()
-
-        if 'diesel' in text_lower or 'motorina' in text_lower:
-            return 'diesel'
-        elif 'benzina' in text_lower or 'petrol' in text_lower:
-            return 'benzina'
-        elif 'electric' in text_lower:
-            return 'electric'
-        elif 'hybrid' in text_lower or 'hibrid' in text_lower:
-            return 'hybrid'
-        elif 'gpl' in text_lower or 'lpg' in text_lower:
-            return 'gpl'
-
-        return 'benzina'
-
     def _extract_location(self, card) -> str:
         """Extract location"""
         location_elem = card.find('p', {'data-testid': 'location-date'})
@@ -472,32 +408,70 @@ class DetailedOLXScraper:
         return "Romania"
 
 
-    async def bulk_search(self, search_queries: List[Dict]) -> List[Dict]:
+    async def bulk_search(
+        self,
+        search_queries: List[Dict],
+        on_listings: Optional[Callable[[List[Dict]], Awaitable[None]]] = None,
+        max_pages: int = 1,
+        known_urls: Optional[KnownURLIndex] = None,
+        on_event: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> List[Dict]:
         """
         Bulk search for multiple car models
 
+        Queries run concurrently through the shared scrape scheduler; the
+        per-host token bucket keeps the request rate within the politeness budget.
+
         Args:
             search_queries: List of dicts with 'marca' and 'model' keys
+            on_listings: Optional coroutine called with each query's listings
+                as soon as they are parsed (e.g. to save them to the DB)
+            max_pages: Maximum pages per query
+            known_urls: Incremental mode (see `search_cars`)
+            on_event: Optional coroutine called with progress events - 'page'
+                (see `search_cars`) and 'query' ({'done', 'total'}) after each
+                query finishes
 
         Returns:
             Combined list of all listings
         """
-        all_listings = []
+        total = len(search_queries)
+        done = 0
 
-        for i, query in enumerate(search_queries):
+        async def run_query(i: int, query: Dict) -> List[Dict]:
             marca = query.get('marca')
             model = query.get('model')
 
-            print(f"\n[{i+1}/{len(search_queries)}] Searching: {marca} {model or ''}")
-
-            listings = await self.search_cars(marca, model, max_pages=1)
-            all_listings.extend(listings)
+            print(f"\n[{i+1}/{total}] Searching: {marca} {model or ''}")
 
+            listings = await self.search_cars(
+                marca, model, max_pages=max_pages, known_urls=known_urls, on_event=on_event
+            )
             print(f"Found {len(listings)} listings")
 
+            if on_listings and listings:
+                await on_listings(listings)
+
+            nonlocal done
+            done += 1
+            if on_event:
+                await on_event({'type': 'query', 'done': done, 'total': total})
+            return listings
+
+        results = await scrape_scheduler.run(search_queries, run_query)
+
+        all_listings = []
+        for listings in results:
+            all_listings.extend(listings or [])
+
         print(f"\nTotal listings found: {len(all_listings)}")
         return all_listings
 
 
+def parse_search_page(html: str, marca: str, model: Optional[str]) -> List[Dict]:
+    """Parse-pool entry point - module-level so worker processes can import it"""
+    return detailed_olx_scraper._parse_search_page(html, marca, model)
+
+
 # Global instance
 detailed_olx_scraper = DetailedOLXScraper()
@@ -0,0 +1,61 @@
+"""
+Known URLs - In-memory index of listing URLs already in the database
+Lets incremental scrapes stop paging once a page is mostly ads we already have
+"""
+import os
+from typing import Dict, Iterable, List
+
+
+class KnownURLIndex:
+    """
+    Set of listing URLs already stored in `listings`
+
+    Filled by ScraperService (which owns the DB access) and kept current as
+    new listings are saved. A plain set is enough: 100k OLX URLs take a few
+    tens of MB and membership checks are exact, unlike a Bloom filter.
+    """
+
+    # Stop paging when at least this fraction of a page is already known
+    DEFAULT_STOP_FRACTION = 0.8
+
+    def __init__(self, stop_fraction: float = None):
+        """
+        Args:
+            stop_fraction: Known fraction that ends paging
+                (default: SCRAPER_INCREMENTAL_STOP env var)
+        """
+        if stop_fraction is None:
+            stop_fraction = float(os.getenv('SCRAPER_INCREMENTAL_STOP', self.DEFAULT_STOP_FRACTION))
+        self.stop_fraction = stop_fraction
+        self.urls = set()
+        self.loaded = False
+
+    def replace(self, urls: Iterable[str]):
+        """Swap in a fresh snapshot of the stored URLs"""
+        self.urls = set(urls)
+        self.loaded = True
+
+    def add(self, urls: Iterable[str]):
+        """Record URLs that were just saved"""
+        self.urls.update(urls)
+
+    def known_fraction(self, listings: List[Dict]) -> float:
+        """Fraction of the listings whose URL is already stored (0.0 for an empty page)"""
+        if not listings:
+            return 0.0
+        known = sum(1 for listing in listings if listing.get('url') in self.urls)
+        return known / len(listings)
+
+    def should_stop(self, listings: List[Dict]) -> bool:
+        """True when a parsed page is known enough that older pages are not worth fetching"""
+        return bool(listings) and self.known_fraction(listings) >= self.stop_fraction
+
+    def __contains__(self, url: str) -> bool:
+        return url in self.urls
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+
+# Global instance
+known_url_index = KnownURLIndex()
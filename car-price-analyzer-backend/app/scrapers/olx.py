@@ -11,6 +11,7 @@ from typing import List, Optional
 from bs4 import BeautifulSoup
 
 from app.scrapers.autovit import CarListing  # Refolosim dataclass-ul
+from app.scrapers.card_parser import listing_card_parser
 
 class OLXScraper:
     """Scraper pentru OLX.ro"""
@@ -50,14 +51,13 @@ class OLXScraper:
                     
                     html = await response.text()
             
-            soup = BeautifulSoup(html, 'html.parser')
-            
             # Găsește toate anunțurile
             listings = []
             
             # OLX folosește diferite structuri, încercăm ambele
-            ads = soup.find_all('div', {'data-cy': 'l-card'})
+            ads = listing_card_parser.parse_cards(html)
             if not ads:
+                soup = BeautifulSoup(html, 'html.parser')
                 ads = soup.find_all('div', {'class': 'css-1sw7q4x'})
             
             print(f"✓ Găsite {len(ads)} anunțuri pe OLX")
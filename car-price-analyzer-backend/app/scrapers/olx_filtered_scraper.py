@@ -9,6 +9,12 @@ import re
 from datetime import datetime
 from typing import List, Dict, Optional
 from urllib.parse import urlencode
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+from app.scrapers.card_parser import listing_card_parser
+from app.scrapers.olx_state import olx_state_parser
+from app.scrapers.page_archive import page_archive
+from app.scrapers.parse_pool import parse_pool
+from app.scrapers.scrape_scheduler import scrape_scheduler
 
 
 class OLXFilteredScraper:
@@ -257,9 +263,7 @@ class OLXFilteredScraper:
             for page in range(1, max_pages + 1):
                 page_url = url if page == 1 else f"{url}&page={page}"
 
-                if self.request_count > 0:
-                    print(f"Rate limiting: {self.DELAY_BETWEEN_REQUESTS}s...")
-                    await asyncio.sleep(self.DELAY_BETWEEN_REQUESTS)
+                await scrape_scheduler.acquire(page_url)
 
                 print(f"Fetching page {page}...")
                 async with session.get(page_url) as response:
@@ -270,7 +274,9 @@ class OLXFilteredScraper:
                     html = await response.text()
                     self.request_count += 1
 
-                page_listings = self._parse_search_page(html, marca, model, filters)
+                await page_archive.store(page_url, html, parse_search_page, marca, model, filters)
+
+                page_listings = await parse_pool.parse(parse_search_page, html, marca, model, filters)
                 listings.extend(page_listings)
 
                 print(f"Found {len(page_listings)} listings on page {page}")
@@ -286,9 +292,17 @@ class OLXFilteredScraper:
         return listings
 
     def _parse_search_page(self, html: str, marca: str, model: Optional[str], filters: Dict) -> List[Dict]:
-        """Parse search results page"""
-        soup = BeautifulSoup(html, 'html.parser')
-        cards = soup.find_all('div', {'data-cy': 'l-card'})
+        """Parse search results page (embedded JSON state first, DOM as fallback)"""
+        ads = olx_state_parser.parse_ads(html)
+        if ads is not None:
+            listings = []
+            for ad in ads:
+                listing = self._listing_from_state(ad, marca, model, filters)
+                if listing:
+                    listings.append(listing)
+            return listings
+
+        cards = listing_card_parser.parse_cards(html)
 
         listings = []
         for card in cards:
@@ -327,8 +341,9 @@ class OLXFilteredScraper:
 
             # Since we used filters, we can trust the filter values!
             # But still extract from text as backup
-            year = self._extract_year(title, full_text) or filters.get('year_from')
-            km = self._extract_km(title, full_text) or filters.get('km_from', 0)
+            attributes = listing_attribute_extractor.extract(title, full_text)
+            year = attributes['an'] or filters.get('year_from')
+            km = attributes['km'] or filters.get('km_from', 0)
 
             # Use filter values as primary source
             fuel_type = filters.get('fuel_type', 'benzina')
@@ -369,6 +384,44 @@ class OLXFilteredScraper:
         except Exception as e:
             return None
 
+    def _listing_from_state(self, ad: Dict, marca: str, model: Optional[str], filters: Dict) -> Optional[Dict]:
+        """Build listing from an embedded-state ad - exact OLX params, filters as backup"""
+        title = ad['title']
+
+        price = ad['price']
+        if not price or price < 3000:
+            return None
+
+        attributes = listing_attribute_extractor.extract(title)
+        year = ad['year'] or attributes['an'] or filters.get('year_from')
+        km = ad['km'] if ad['km'] is not None else (attributes['km'] or filters.get('km_from', 0))
+        published = ad['created'] or datetime.now()
+
+        return {
+            'source': 'olx_filtered',
+            'url': ad['url'],
+            'marca': marca.title(),
+            'model': model or marca,
+            'model_series': model,
+            'model_variant': None,
+            'an': year,
+            'km': km,
+            'pret': price,
+            'combustibil': ad['fuel_type'] or filters.get('fuel_type', 'benzina'),
+            'putere_cp': ad['power_cp'],
+            'capacitate_cilindrica': ad['engine_cc'],
+            'transmisie': ad['transmission'] or filters.get('transmission', 'unknown'),
+            'tractiune': 'fata',  # Default
+            'caroserie': ad['body_type'] or filters.get('body_type', 'hatchback'),
+            'locatie': ad['location'] or "Romania",
+            'dotari': [],
+            'imagini': ad['photos'],
+            'descriere': title[:500],
+            'data_publicare': published,
+            'zile_pe_piata': max(0, (datetime.now() - published).days),
+            'este_activ': True
+        }
+
     def _extract_price_from_card(self, card) -> Optional[float]:
         """Extract and convert price - multiple methods for robustness"""
         # Method 1: data-testid attribute (most reliable)
@@ -419,30 +472,6 @@ class OLXFilteredScraper:
                 pass
         return None
 
-    def _extract_year(self, title: str, text: str) -> Optional[int]:
-        """Extract year"""
-        for source in [title, text]:
-            match = re.search(r'\b(20\d{2})\b', source)
-            if match:
-                year = int(match.group(1))
-                if 2000 <= year <= 2025:
-                    return year
-        return None
-
-    def _extract_km(self, title: str, text: str) -> int:
-        """Extract kilometers"""
-        for source in [title, text]:
-            match = re.search(r'(\d+)[.\s]?(\d+)?\s*km', source, re.IGNORECASE)
-            if match:
-                km_str = match.group(1) + (match.group(2) or '')
-                try:
-                    km = int(km_str)
-                    if 0 <= km <= 1000000:
-                        return km
-                except ValueError:
-                    pass
-        return 0
-
     def _extract_location(self, card) -> str:
         """Extract location"""
         location_elem = card.find('p', {'data-testid': 'location-date'})
@@ -452,5 +481,10 @@ class OLXFilteredScraper:
         return "Romania"
 
 
+def parse_search_page(html: str, marca: str, model: Optional[str], filters: Dict) -> List[Dict]:
+    """Parse-pool entry point - module-level so worker processes can import it"""
+    return olx_filtered_scraper._parse_search_page(html, marca, model, filters)
+
+
 # Global instance
 olx_filtered_scraper = OLXFilteredScraper()
@@ -10,6 +10,8 @@ import re
 from datetime import datetime
 from typing import List, Dict, Optional
 from urllib.parse import quote
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+from app.scrapers.scrape_scheduler import scrape_scheduler
 
 class OLXRSScraper:
     """
@@ -56,7 +58,7 @@ class OLXRSScraper:
         print(f"Fetching RSS from: {rss_url}")
 
         # Rate limiting
-        await self._rate_limit()
+        await self._rate_limit(rss_url)
 
         # Parse RSS feed
         try:
@@ -102,8 +104,8 @@ class OLXRSScraper:
             if not price:
                 return None
 
-            # Extract year
-            year = self._extract_year(title, description)
+            # Extract year and fuel type
+            attributes = listing_attribute_extractor.extract(title, description)
 
             # Extract kilometers
             km = self._extract_km(title, description)
@@ -111,9 +113,6 @@ class OLXRSScraper:
             # Extract location (city)
             location = self._extract_location(description)
 
-            # Extract fuel type
-            fuel_type = self._extract_fuel_type(description)
-
             # Parse published date
             try:
                 pub_date = datetime.strptime(published, '%a, %d %b %Y %H:%M:%S %z')
@@ -128,10 +127,10 @@ class OLXRSScraper:
                 'url': url,
                 'marca': marca.title(),
                 'model': model.title() if model else self._extract_model(title, marca),
-                'an': year,
+                'an': attributes['an'],
                 'km': km,
                 'pret': price,
-                'combustibil': fuel_type,
+                'combustibil': attributes['combustibil'],
                 'locatie': location,
                 'dotari': [],  # RSS doesn't include detailed equipment
                 'imagini': [],  # Would need to scrape individual page
@@ -166,19 +165,6 @@ class OLXRSScraper:
 
         return None
 
-    def _extract_year(self, title: str, description: str) -> Optional[int]:
-        """Extract year (2000-2025)"""
-        year_pattern = r'\b(19\d{2}|20[0-2]\d)\b'
-
-        for text in [title, description]:
-            match = re.search(year_pattern, text)
-            if match:
-                year = int(match.group(1))
-                if 1990 <= year <= 2025:
-                    return year
-
-        return None
-
     def _extract_km(self, title: str, description: str) -> int:
         """Extract kilometers"""
         km_pattern = r'(\d[\d\s,\.]*)\s*(km|kilometri)'
@@ -213,23 +199,6 @@ class OLXRSScraper:
 
         return 'Romania'
 
-    def _extract_fuel_type(self, description: str) -> str:
-        """Extract fuel type"""
-        description_lower = description.lower()
-
-        if 'diesel' in description_lower:
-            return 'diesel'
-        elif 'benzina' in description_lower or 'petrol' in description_lower:
-            return 'benzina'
-        elif 'electric' in description_lower:
-            return 'electric'
-        elif 'hybrid' in description_lower or 'hibrid' in description_lower:
-            return 'hybrid'
-        elif 'gpl' in description_lower or 'lpg' in description_lower:
-            return 'gpl'
-
-        return 'benzina'  # default
-
     def _extract_model(self, title: str, marca: str) -> str:
         """Extract model from title when not provided"""
         # Remove marca from title
@@ -253,17 +222,15 @@ class OLXRSScraper:
         # Limit length
         return clean[:500]
 
-    async def _rate_limit(self):
-        """Implement rate limiting (1 request per 10 seconds)"""
-        if self.request_count > 0:
-            print(f"Rate limiting: waiting {self.DELAY_BETWEEN_REQUESTS} seconds...")
-            await asyncio.sleep(self.DELAY_BETWEEN_REQUESTS)
-
+    async def _rate_limit(self, url: str):
+        """Implement rate limiting (shared per-host token bucket, 6 req/min for OLX)"""
+        await scrape_scheduler.acquire(url)
         self.request_count += 1
 
     async def bulk_search(self, search_queries: List[Dict]) -> List[Dict]:
         """
         Bulk search for multiple car models
+        Queries run concurrently; the shared scheduler enforces the rate limit
 
         Args:
             search_queries: List of dicts with 'marca' and 'model' keys
@@ -271,18 +238,23 @@ class OLXRSScraper:
         Returns:
             Combined list of all listings
         """
-        all_listings = []
+        total = len(search_queries)
 
-        for i, query in enumerate(search_queries):
+        async def run_query(i: int, query: Dict) -> List[Dict]:
             marca = query.get('marca')
             model = query.get('model')
 
-            print(f"\n[{i+1}/{len(search_queries)}] Searching: {marca} {model or ''}")
+            print(f"\n[{i+1}/{total}] Searching: {marca} {model or ''}")
 
             listings = await self.search_cars(marca, model)
-            all_listings.extend(listings)
-
             print(f"Found {len(listings)} listings")
+            return listings
+
+        results = await scrape_scheduler.run(search_queries, run_query)
+
+        all_listings = []
+        for listings in results:
+            all_listings.extend(listings or [])
 
         print(f"\n Total listings found: {len(all_listings)}")
         return all_listings
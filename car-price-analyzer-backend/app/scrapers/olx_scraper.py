@@ -10,6 +10,12 @@ import re
 from datetime import datetime
 from typing import List, Dict, Optional
 from urllib.parse import quote, urljoin
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+from app.scrapers.card_parser import listing_card_parser
+from app.scrapers.part_filter import CarPartFilter
+from app.scrapers.page_archive import page_archive
+from app.scrapers.parse_pool import parse_pool
+from app.scrapers.scrape_scheduler import scrape_scheduler
 
 
 class OLXScraper:
@@ -30,9 +36,17 @@ class OLXScraper:
     # User agent - transparent about being a scraper
     USER_AGENT = "CarAnalyzer/1.0 (+https://github.com/MihaiDBR/CarAnalyzer) Research Bot"
 
+    # Car part filter (broader than the detailed scraper's, lenient exception)
+    PART_KEYWORDS = CarPartFilter.PART_KEYWORDS + [
+        'cauciuc', 'aripa', 'consola', 'telescop', 'evacuare',
+        'kit', 'piese', 'componente', 'accesorii'
+    ]
+    FULL_CAR_INDICATORS = ['vand ', 'vanzare', 'schimb', 'urgent', 'full', 'dotari']
+
     def __init__(self):
         self.request_count = 0
         self.session = None
+        self.part_filter = CarPartFilter(self.PART_KEYWORDS, self.FULL_CAR_INDICATORS, strict=False)
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session"""
@@ -86,10 +100,8 @@ class OLXScraper:
                 # Add page parameter if not first page
                 page_url = url if page == 1 else f"{url}?page={page}"
 
-                # Rate limiting
-                if self.request_count > 0:
-                    print(f"Rate limiting: waiting {self.DELAY_BETWEEN_REQUESTS} seconds...")
-                    await asyncio.sleep(self.DELAY_BETWEEN_REQUESTS)
+                # Rate limiting (shared per-host budget)
+                await scrape_scheduler.acquire(page_url)
 
                 # Fetch page
                 print(f"Fetching page {page}...")
@@ -101,8 +113,11 @@ class OLXScraper:
                     html = await response.text()
                     self.request_count += 1
 
+                # Keep the raw page so it can be re-parsed later
+                await page_archive.store(page_url, html, parse_search_page, marca, model)
+
                 # Parse listings from page
-                page_listings = self._parse_search_page(html, marca, model)
+                page_listings = await parse_pool.parse(parse_search_page, html, marca, model)
                 listings.extend(page_listings)
 
                 print(f"Found {len(page_listings)} listings on page {page}")
@@ -128,19 +143,24 @@ class OLXScraper:
         - Title in h6
         - Location in p[data-testid="location-date"]
         """
-        soup = BeautifulSoup(html, 'html.parser')
         listings = []
 
         # Find listing cards
-        cards = soup.find_all('div', {'data-cy': 'l-card'})
+        cards = listing_card_parser.parse_cards(html)
 
         if not cards:
-            # Try alternative selectors
+            # Try alternative selectors (needs the full page tree)
+            soup = BeautifulSoup(html, 'html.parser')
             cards = soup.find_all('div', class_=re.compile(r'css-\w+'))  # OLX uses dynamic CSS classes
 
         print(f"Found {len(cards)} potential listing cards")
 
-        for card in cards:
+        # Filter out car parts for the whole page at once
+        is_part = self.part_filter.classify([self._card_title(card) for card in cards])
+
+        for card, part in zip(cards, is_part):
+            if part:
+                continue  # Skip this listing - it's a part
             try:
                 listing = self._parse_listing_card(card, marca, model)
                 if listing:
@@ -151,8 +171,13 @@ class OLXScraper:
 
         return listings
 
+    @staticmethod
+    def _card_title(card) -> str:
+        title_elem = card.find('h6') or card.find('h4') or card.find('strong')
+        return title_elem.get_text(strip=True) if title_elem else ""
+
     def _parse_listing_card(self, card, marca: str, model: Optional[str]) -> Optional[Dict]:
-        """Parse a single listing card"""
+        """Parse a single listing card (car parts are filtered per page, in `_parse_search_page`)"""
         try:
             # Extract URL
             link = card.find('a', href=True)
@@ -162,43 +187,11 @@ class OLXScraper:
             url = urljoin(self.BASE_URL, link['href'])
 
             # Extract title
-            title_elem = card.find('h6') or card.find('h4') or card.find('strong')
-            title = title_elem.get_text(strip=True) if title_elem else ""
+            title = self._card_title(card)
 
             if not title:
                 return None
 
-            # Filter out car parts (check title for part keywords)
-            title_lower = title.lower()
-            parts_keywords = [
-                'jante', 'janta', 'roata', 'roti', 'anvelope', 'cauciuc',
-                'stopuri', 'stop', 'faruri', 'far', 'oglinda', 'oglinzi',
-                'bara', 'portiera', 'capota', 'haion', 'aripa',
-                'volant', 'scaune', 'bord', 'consola',
-                'motor', 'cutie viteze', 'turbo', 'alternator',
-                'carcasa', 'deflector', 'senzori', 'senzor',
-                'kit', 'piese', 'componente', 'accesorii',
-                'perna', 'amortizor', 'suspensie', 'telescop',
-                'radiator', 'intercooler', 'evacuare', 'toba',
-                'filtru', 'curea', 'ulei'
-            ]
-
-            # Skip if title contains part keywords
-            for keyword in parts_keywords:
-                if keyword in title_lower:
-                    # Exception: if title contains indicators of full car sale
-                    full_car_indicators = ['vand ', 'vanzare', 'schimb', 'urgent', 'full', 'dotari']
-                    is_full_car = any(indicator in title_lower for indicator in full_car_indicators)
-
-                    # Also check if has year AND km (strong indicator of full car)
-                    has_year = re.search(r'\b(20\d{2})\b', title)
-                    has_km = re.search(r'\d+\s*km', title_lower)
-                    word_count = len(title.split())
-
-                    # Full car if: has indicators OR (has year AND km AND long title)
-                    if not (is_full_car or (has_year and has_km and word_count > 6)):
-                        return None  # Skip this listing - it's a part
-
             # Extract price
             price = self._extract_price_from_card(card)
             if not price or price == 0:
@@ -210,9 +203,7 @@ class OLXScraper:
             location = location.split(',')[0].strip()  # Get city only
 
             # Extract details from title
-            year = self._extract_year(title)
-            km = self._extract_km(title)
-            fuel_type = self._extract_fuel_type(title)
+            attributes = listing_attribute_extractor.extract(title)
 
             # Build listing
             listing = {
@@ -220,10 +211,10 @@ class OLXScraper:
                 'url': url,
                 'marca': marca.title(),
                 'model': model.title() if model else self._extract_model(title, marca),
-                'an': year,
-                'km': km,
+                'an': attributes['an'],
+                'km': attributes['km'],
                 'pret': price,
-                'combustibil': fuel_type,
+                'combustibil': attributes['combustibil'],
                 'locatie': location,
                 'dotari': [],  # Would need to scrape individual page
                 'imagini': [],
@@ -285,48 +276,6 @@ class OLXScraper:
 
         return None
 
-    def _extract_year(self, text: str) -> Optional[int]:
-        """Extract year (2000-2025)"""
-        match = re.search(r'\b(19\d{2}|20[0-2]\d)\b', text)
-        if match:
-            year = int(match.group(1))
-            if 1990 <= year <= 2025:
-                return year
-        return None
-
-    def _extract_km(self, text: str) -> int:
-        """Extract kilometers"""
-        match = re.search(r'(\d+)[.\s]?(\d+)?\s*(km|mii\s*km)', text, re.IGNORECASE)
-        if match:
-            km_str = match.group(1) + (match.group(2) or '')
-            try:
-                km = int(km_str)
-                # If it says "mii km" (thousands), multiply
-                if 'mii' in match.group(3).lower():
-                    km *= 1000
-                if 0 <= km <= 1000000:
-                    return km
-            except ValueError:
-                pass
-        return 0
-
-    def _extract_fuel_type(self, text: str) -> str:
-        """Extract fuel type"""
-        text_lower = text.lower()
-
-        if 'diesel' in text_lower:
-            return 'diesel'
-        elif 'benzina' in text_lower or 'petrol' in text_lower:
-            return 'benzina'
-        elif 'electric' in text_lower:
-            return 'electric'
-        elif 'hybrid' in text_lower or 'hibrid' in text_lower:
-            return 'hybrid'
-        elif 'gpl' in text_lower or 'lpg' in text_lower:
-            return 'gpl'
-
-        return 'benzina'  # default
-
     def _extract_model(self, title: str, marca: str) -> str:
         """Extract model from title when not provided"""
         # Remove marca from title
@@ -342,5 +291,10 @@ class OLXScraper:
         return 'Unknown'
 
 
+def parse_search_page(html: str, marca: str, model: Optional[str]) -> List[Dict]:
+    """Parse-pool entry point - module-level so worker processes can import it"""
+    return olx_scraper._parse_search_page(html, marca, model)
+
+
 # Global instance
 olx_scraper = OLXScraper()
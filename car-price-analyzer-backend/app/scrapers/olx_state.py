@@ -0,0 +1,223 @@
+"""
+OLX State Parser - Reads listings from the JSON state embedded in search pages
+OLX renders `window.__PRERENDERED_STATE__ = "<json>"` into every search page;
+decoding it is far cheaper than walking the DOM and gives exact param values
+"""
+import json
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - falls back to the stdlib decoder
+    _loads = json.loads
+
+
+class OLXStateParser:
+    """
+    Extracts normalized ad records from the embedded page state
+
+    `parse_ads` returns None when the blob is missing or has an unexpected
+    shape, so callers can fall back to DOM parsing.
+    """
+
+    STATE_MARKER = 'window.__PRERENDERED_STATE__'
+
+    # Where the ads live inside the decoded state
+    ADS_PATH = ('listing', 'listing', 'ads')
+
+    LEI_PER_EUR = 4.97  # Same rate as the DOM price parser
+
+    # OLX enum values -> our values
+    FUEL_TYPES = {
+        'petrol': 'benzina',
+        'diesel': 'diesel',
+        'electric': 'electric',
+        'hybrid': 'hybrid',
+        'lpg': 'gpl',
+    }
+
+    BODY_TYPES = {
+        'sedan': 'sedan',
+        'small': 'hatchback',
+        'hatchback': 'hatchback',
+        'kombi': 'break',
+        'coupe': 'coupe',
+        'suv': 'suv',
+        'cabrio': 'cabrio',
+        'van': 'van',
+    }
+
+    TRANSMISSIONS = {
+        'manual': 'manuala',
+        'automatic': 'automata',
+    }
+
+    # First number in a param value, thousands separators included
+    # ("120.000 km", "1 598 cm3"); later numbers are other values ("1.6 / 2010")
+    _number = re.compile(r'\d{1,3}(?:[.\s]\d{3})+(?!\d)|\d+')
+
+    def __init__(self):
+        self.enabled = os.getenv('SCRAPER_JSON_STATE', '1') != '0'
+        self._decoder = json.JSONDecoder()
+
+    def parse_ads(self, html: str) -> Optional[List[Dict]]:
+        """
+        Extract normalized ads from a search page
+
+        Args:
+            html: Raw page HTML
+
+        Returns:
+            List of ad dicts (see `_normalize_ad`), or None if no usable state
+        """
+        if not self.enabled or not html:
+            return None
+
+        state = self._load_state(html)
+        if state is None:
+            return None
+
+        ads = state
+        for key in self.ADS_PATH:
+            if not isinstance(ads, dict):
+                return None
+            ads = ads.get(key)
+        if not isinstance(ads, list):
+            return None
+
+        normalized = []
+        for ad in ads:
+            if isinstance(ad, dict):
+                record = self._normalize_ad(ad)
+                if record:
+                    normalized.append(record)
+        return normalized
+
+    def _load_state(self, html: str) -> Optional[Dict]:
+        """Locate the state assignment with one scan and decode it"""
+        marker = html.find(self.STATE_MARKER)
+        if marker == -1:
+            return None
+
+        start = html.find('=', marker + len(self.STATE_MARKER))
+        if start == -1:
+            return None
+        start += 1
+        while start < len(html) and html[start] in ' \t\r\n':
+            start += 1
+
+        try:
+            # The value is either a JSON string literal holding the state
+            # (current OLX markup) or a plain object literal
+            value, _ = self._decoder.raw_decode(html, start)
+            if isinstance(value, str):
+                value = _loads(value)
+        except ValueError:
+            return None
+
+        return value if isinstance(value, dict) else None
+
+    def _normalize_ad(self, ad: Dict) -> Optional[Dict]:
+        """Map one raw OLX ad to the fields our scrapers need"""
+        url = ad.get('url')
+        title = (ad.get('title') or '').strip()
+        if not url or not title:
+            return None
+
+        params = {}
+        for param in ad.get('params') or []:
+            if isinstance(param, dict) and param.get('key'):
+                params[param['key']] = param
+
+        location = ad.get('location') or {}
+        photos = []
+        for photo in ad.get('photos') or []:
+            link = photo.get('link') if isinstance(photo, dict) else photo
+            if isinstance(link, str):
+                photos.append(link)
+
+        return {
+            'url': url,
+            'title': title,
+            'price': self._price(ad.get('price')),
+            'year': self._int_param(params, 'year'),
+            'km': self._int_param(params, 'rulaj_pana'),
+            'fuel_type': self.FUEL_TYPES.get(self._enum_param(params, 'petrol')),
+            'transmission': self.TRANSMISSIONS.get(self._enum_param(params, 'gearbox')),
+            'body_type': self.BODY_TYPES.get(self._enum_param(params, 'car_body')),
+            'engine_cc': self._int_param(params, 'enginesize'),
+            'power_cp': self._int_param(params, 'engine_power'),
+            'model': self._enum_param(params, 'model'),
+            'params_text': ' '.join(self._param_text(p) for p in params.values()),
+            'location': location.get('cityName') if isinstance(location, dict) else None,
+            'photos': photos,
+            'created': self._datetime(ad.get('createdTime')),
+        }
+
+    def _price(self, price: Any) -> Optional[float]:
+        """regularPrice value in EUR, with the DOM parser's sanity range"""
+        if not isinstance(price, dict):
+            return None
+        regular = price.get('regularPrice') or {}
+        value = regular.get('value')
+        if not isinstance(value, (int, float)):
+            return None
+
+        value = float(value)
+        if (regular.get('currencyCode') or 'EUR').upper() in ('RON', 'LEI'):
+            value = value / self.LEI_PER_EUR
+
+        if 3000 <= value <= 500000:
+            return round(value, 2)
+        return None
+
+    def _raw_param(self, params: Dict, key: str) -> Any:
+        param = params.get(key)
+        if not param:
+            return None
+        value = param.get('normalizedValue')
+        if value in (None, ''):
+            value = param.get('value')
+        if isinstance(value, dict):
+            value = value.get('key') or value.get('label')
+        return value
+
+    def _int_param(self, params: Dict, key: str) -> Optional[int]:
+        value = self._raw_param(params, key)
+        if isinstance(value, (int, float)):
+            return int(value)
+        if isinstance(value, str):
+            number = self._number.search(value)
+            if number:
+                return int(re.sub(r'\D', '', number.group()))
+        return None
+
+    def _enum_param(self, params: Dict, key: str) -> Optional[str]:
+        value = self._raw_param(params, key)
+        return value.lower() if isinstance(value, str) else None
+
+    def _param_text(self, param: Dict) -> str:
+        value = param.get('value')
+        if isinstance(value, dict):
+            value = value.get('label') or value.get('key')
+        return str(value) if value is not None else ''
+
+    def _datetime(self, value: Any) -> Optional[datetime]:
+        """Naive local time, like the datetime.now() values stored next to it"""
+        if not isinstance(value, str):
+            return None
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+        if moment.tzinfo is not None:
+            moment = moment.astimezone().replace(tzinfo=None)
+        return moment
+
+
+# Global instance
+olx_state_parser = OLXStateParser()
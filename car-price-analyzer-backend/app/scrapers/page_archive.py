@@ -0,0 +1,185 @@
+"""
+Page Archive - Keeps every fetched search page on disk
+Pages are stored compressed and content-addressed (sha256), with an
+append-only index by URL and fetch time, so fixed extractors can be
+re-run over old pages without going back to OLX
+"""
+import asyncio
+import gzip
+import hashlib
+import importlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is pinned in requirements.txt
+    zstandard = None
+
+
+class PageArchive:
+    """
+    Content-addressed store of raw HTML pages
+
+    Layout under `root`:
+    - objects/ab/abcdef....html.zst - one compressed blob per distinct page
+      (gzip, `.html.gz`, when zstandard is not installed)
+    - index.jsonl - one record per fetch: url, fetch time, sha256 and the
+      parse function + arguments the page was scraped with
+
+    Identical pages (same query re-fetched, nothing changed) share one blob;
+    every fetch still gets its own index record.
+
+    Off unless an archive directory is configured: the archive grows with
+    every fetch, so where it lives has to be a deliberate choice.
+    """
+
+    INDEX_FILE = 'index.jsonl'
+    OBJECTS_DIR = 'objects'
+    ZSTD_LEVEL = 10
+
+    def __init__(self, root: Optional[str] = None, enabled: Optional[bool] = None):
+        """
+        Args:
+            root: Archive directory (default: SCRAPER_ARCHIVE_DIR env var)
+            enabled: Archive fetched pages (default: on when a directory is
+                configured and the SCRAPER_ARCHIVE env var is not 0/false/no)
+        """
+        self.root = root or os.getenv('SCRAPER_ARCHIVE_DIR') or None
+        if enabled is None:
+            enabled = (
+                self.root is not None
+                and os.getenv('SCRAPER_ARCHIVE', '1').lower() not in ('0', 'false', 'no')
+            )
+        self.enabled = enabled
+
+        self.extension = '.html.zst' if zstandard else '.html.gz'
+        self._index_lock = threading.Lock()
+
+    async def store(self, url: str, html: str, parser: Callable[..., Any], *args) -> Optional[str]:
+        """
+        Archive a fetched page (compression and disk writes run in a thread)
+
+        Args:
+            url: Page URL
+            html: Raw HTML as fetched
+            parser: Module-level parse function the page is scraped with
+            *args: Its arguments after the HTML (must be JSON-serializable)
+
+        Returns:
+            sha256 of the page, or None when archiving is disabled or failed
+        """
+        if not self.enabled:
+            return None
+
+        record = {
+            'url': url,
+            'fetched_at': datetime.now().isoformat(),
+            'parser': f"{parser.__module__}:{parser.__name__}",
+            'args': list(args),
+        }
+        try:
+            return await asyncio.to_thread(self._write, html, record)
+        except Exception as e:
+            # Never let the archive break a scrape
+            print(f"Error archiving {url}: {e}")
+            return None
+
+    def _write(self, html: str, record: Dict) -> str:
+        data = html.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so a crash never leaves a truncated blob
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(self._compress(data))
+            os.replace(tmp_path, path)
+
+        record['sha256'] = digest
+        record['size'] = len(data)
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._index_lock:
+            with open(os.path.join(self.root, self.INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(line)
+
+        return digest
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.root, self.OBJECTS_DIR, digest[:2], digest + self.extension)
+
+    def _compress(self, data: bytes) -> bytes:
+        if zstandard:
+            return zstandard.ZstdCompressor(level=self.ZSTD_LEVEL).compress(data)
+        return gzip.compress(data)
+
+    def load(self, digest: str) -> str:
+        """Read a page back by its sha256"""
+        for extension in ('.html.zst', '.html.gz'):
+            path = os.path.join(self.root, self.OBJECTS_DIR, digest[:2], digest + extension)
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            if extension == '.html.gz':
+                return gzip.decompress(data).decode('utf-8')
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst pages")
+            return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+        raise FileNotFoundError(f"Page {digest} not in archive")
+
+    def records(
+        self,
+        since: Optional[datetime] = None,
+        url_contains: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """
+        Stream index records in fetch order
+
+        Args:
+            since: Only pages fetched at or after this time
+            url_contains: Only pages whose URL contains this substring
+        """
+        index_path = os.path.join(self.root, self.INDEX_FILE)
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Partially written last line
+                if since and datetime.fromisoformat(record['fetched_at']) < since:
+                    continue
+                if url_contains and url_contains not in record['url']:
+                    continue
+                yield record
+
+    def resolve_parser(self, record: Dict) -> Callable[..., Any]:
+        """Import the parse function named in an index record"""
+        module_name, func_name = record['parser'].split(':')
+        return getattr(importlib.import_module(module_name), func_name)
+
+    def reparse_record(self, record: Dict) -> List[Dict]:
+        """
+        Run the current parser over an archived page
+
+        Use `reparse_archived_page` to run this in the parse pool.
+        """
+        parser = self.resolve_parser(record)
+        return parser(self.load(record['sha256']), *record['args'])
+
+
+def reparse_archived_page(root: str, record: Dict) -> List[Dict]:
+    """Parse-pool entry point - module-level so worker processes can import it"""
+    return PageArchive(root, enabled=False).reparse_record(record)
+
+
+# Global instance
+page_archive = PageArchive()
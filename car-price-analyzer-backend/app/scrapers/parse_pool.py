@@ -0,0 +1,155 @@
+"""
+Parse Pool - Runs page parsing off the event loop
+Fetch loops hand raw HTML to a bounded queue; a process (or thread) pool
+parses it and the listing dicts come back as awaitables, so API requests
+are not stuck behind BeautifulSoup while a scrape is running
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional
+
+
+class ParsePool:
+    """
+    Bounded parse stage between fetching and saving
+
+    Modes:
+    - 'process' (default): ProcessPoolExecutor - parsing is mostly pure
+      Python (BeautifulSoup, regexes), so it needs its own interpreter to
+      stop holding the GIL the API runs on
+    - 'thread': thread pool - enough when pages take the lxml/orjson paths,
+      which do most of their work in C
+    - 'inline': parse in the calling coroutine (old behavior, debugging)
+
+    Parse functions must be module-level so worker processes can import them.
+    At most `queue_size` pages wait for a worker; callers beyond that wait in
+    `parse()`, which slows the fetch loop down instead of piling up HTML.
+    """
+
+    MODES = ('process', 'thread', 'inline')
+    DEFAULT_MODE = 'process'
+    DEFAULT_WORKERS = 2
+    DEFAULT_QUEUE_SIZE = 8
+
+    # Workers start from a clean interpreter - forking a process that
+    # already runs an event loop and DB connections is not safe
+    START_METHOD = 'spawn'
+
+    def __init__(
+        self,
+        mode: Optional[str] = None,
+        workers: Optional[int] = None,
+        queue_size: Optional[int] = None
+    ):
+        """
+        Args:
+            mode: 'process', 'thread' or 'inline' (default: SCRAPER_PARSE_MODE env var)
+            workers: Pool size (default: SCRAPER_PARSE_WORKERS env var)
+            queue_size: Pages allowed to wait for a worker (default: SCRAPER_PARSE_QUEUE env var)
+        """
+        mode = (mode or os.getenv('SCRAPER_PARSE_MODE', self.DEFAULT_MODE)).lower()
+        if mode not in self.MODES:
+            print(f"Unknown parse mode '{mode}', using '{self.DEFAULT_MODE}'")
+            mode = self.DEFAULT_MODE
+
+        self.mode = mode
+        self.workers = max(1, workers or int(os.getenv('SCRAPER_PARSE_WORKERS', self.DEFAULT_WORKERS)))
+        self.queue_size = max(1, queue_size or int(os.getenv('SCRAPER_PARSE_QUEUE', self.DEFAULT_QUEUE_SIZE)))
+
+        self._executor: Optional[Executor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def parse(self, func: Callable[..., Any], *args) -> Any:
+        """
+        Parse a page in the pool
+
+        Args:
+            func: Module-level parse function, e.g. `parse_search_page`
+            *args: Its arguments (raw HTML first, by convention)
+
+        Returns:
+            Whatever `func` returns (usually a list of listing dicts)
+        """
+        if self.mode == 'inline':
+            return func(*args)
+
+        self._start()
+        future = self._loop.create_future()
+        # Blocks while the queue is full - backpressure on the fetch loop
+        await self._queue.put((func, args, future))
+        return await future
+
+    def _start(self):
+        """Create the executor and queue dispatchers for the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        # First call, or a new event loop (asyncio.run in scripts)
+        for task in self._dispatchers:
+            task.cancel()
+
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._dispatchers = [loop.create_task(self._dispatch()) for _ in range(self.workers)]
+
+    def _create_executor(self) -> Executor:
+        if self.mode == 'process':
+            context = multiprocessing.get_context(self.START_METHOD)
+            return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+        return ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='parse')
+
+    async def _dispatch(self):
+        """Feed queued pages to the executor, one at a time per worker"""
+        while True:
+            func, args, future = await self._queue.get()
+            try:
+                if future.cancelled():
+                    continue  # Caller gave up while the page was queued
+                try:
+                    result = await self._run(func, args)
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, func: Callable[..., Any], args: tuple) -> Any:
+        executor = self._executor
+        try:
+            return await self._loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A worker died (OOM, killed) - start a fresh pool and retry once.
+            # Other dispatchers hit the same error; only the first replaces it.
+            if self._executor is executor:
+                print("Parse pool broken, restarting workers")
+                executor.shutdown(wait=False)
+                self._executor = self._create_executor()
+            return await self._loop.run_in_executor(self._executor, func, *args)
+
+    def shutdown(self):
+        """Stop dispatchers and worker processes (call on app shutdown)"""
+        for task in self._dispatchers:
+            task.cancel()
+        self._dispatchers = []
+        self._loop = None
+        self._queue = None
+
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global instance
+parse_pool = ParsePool()
@@ -0,0 +1,152 @@
+"""
+Car Part Filter - Tells car parts/accessories apart from whole cars by title
+Titles are split into words and matched against keyword sets; a whole
+search page is normalized in one call and checked with set operations
+"""
+import os
+import re
+import string
+from typing import Dict, List, Optional, Tuple
+
+
+class CarPartFilter:
+    """
+    Word-boundary aware part/accessory classifier
+
+    A title is a part if it contains a part keyword as a whole word or
+    phrase ("far" matches "far xenon", not "fara accidente"; "motor" does
+    not match "motorina"). Titles that also look like a car sale are kept:
+
+    - strict (default): a full-car indicator AND year + km + more than
+      6 words in the title
+    - lenient: a full-car indicator OR year + km + more than 6 words
+    """
+
+    # Singular, plural and articulated forms are listed explicitly since
+    # keywords only match whole words
+    PART_KEYWORDS = [
+        'jante', 'janta', 'jantele', 'roata', 'roti', 'rotile', 'anvelope', 'anvelopele',
+        'stopuri', 'stop', 'stopurile', 'faruri', 'far', 'farurile', 'oglinda', 'oglinzi',
+        'bara', 'portiera', 'capota', 'haion',
+        'volant', 'scaune', 'scaunele', 'bord',
+        'motor', 'motoare', 'cutie viteze', 'turbo', 'alternator',
+        'carcasa', 'deflector', 'senzor', 'senzori',
+        'perna', 'amortizor', 'amortizoare', 'suspensie',
+        'radiator', 'intercooler', 'toba',
+        'filtru', 'curea', 'ulei'
+    ]
+
+    FULL_CAR_INDICATORS = ['vand ', 'schimb', 'urgent', 'full']
+
+    MIN_WORDS_FOR_CAR = 7
+
+    # Punctuation separates words ("R16,", "stop-uri", "(jante)")
+    _separators = str.maketrans(dict.fromkeys(string.punctuation + '–„”', ' '))
+
+    def __init__(
+        self,
+        keywords: Optional[List[str]] = None,
+        full_car_indicators: Optional[List[str]] = None,
+        strict: bool = True
+    ):
+        """
+        Args:
+            keywords: Part keywords or phrases (default: SCRAPER_PART_KEYWORDS
+                env var, comma-separated, or PART_KEYWORDS)
+            full_car_indicators: Phrases that suggest a whole car is for sale
+                (plain substrings, like "vand " or "full")
+            strict: Require an indicator AND year/km evidence to keep a title
+        """
+        if keywords is None:
+            env_keywords = os.getenv('SCRAPER_PART_KEYWORDS')
+            keywords = env_keywords.split(',') if env_keywords else self.PART_KEYWORDS
+
+        self.keywords = [k.strip().lower() for k in keywords if k.strip()]
+        self.full_car_indicators = [i.lower() for i in (full_car_indicators or self.FULL_CAR_INDICATORS)]
+        self.strict = strict
+
+        # Single words -> set lookup; phrases -> first word, then the rest
+        single_words = set()
+        self._phrases: Dict[str, List[Tuple[str, ...]]] = {}
+        for keyword in self.keywords:
+            words = keyword.translate(self._separators).split()
+            if len(words) == 1:
+                single_words.add(words[0])
+            elif words:
+                self._phrases.setdefault(words[0], []).append(tuple(words[1:]))
+        self._words = frozenset(single_words)
+        self._triggers = self._words | frozenset(self._phrases)
+
+        self._year = re.compile(r'\b20\d{2}\b')
+        self._km = re.compile(r'\d+\s*km')
+
+    def is_car_part(self, title: str) -> bool:
+        """
+        Check if a listing title is for a car part
+
+        One-off checks only: normalizing titles one by one is slower than
+        the old substring loop, so the scrapers filter pages with `classify`.
+
+        Args:
+            title: Listing title
+
+        Returns:
+            True if the listing should be dropped
+        """
+        return self._is_part(title, title.lower().translate(self._separators).split())
+
+    def classify(self, titles: List[str]) -> List[bool]:
+        """
+        Classify a whole page of titles at once
+
+        Args:
+            titles: Listing titles
+
+        Returns:
+            One flag per title, True for car parts
+        """
+        if not titles:
+            return []
+
+        # Normalize the whole page in one go - far cheaper than per title
+        lines = '\n'.join(titles).lower().translate(self._separators).split('\n')
+        if len(lines) != len(titles):
+            # A title with its own line breaks - classify one by one
+            return [self.is_car_part(title) for title in titles]
+
+        return [self._is_part(title, line.split()) for title, line in zip(titles, lines)]
+
+    def _is_part(self, title: str, words: List[str]) -> bool:
+        """Whole-word / whole-phrase keyword match, then the car-sale exception"""
+        if self._triggers.isdisjoint(words):
+            return False
+        if self._words.isdisjoint(words) and not self._has_phrase(words):
+            return False
+        return not self._looks_like_car(title)
+
+    def _has_phrase(self, words: List[str]) -> bool:
+        for i, word in enumerate(words):
+            for rest in self._phrases.get(word, ()):
+                if tuple(words[i + 1:i + 1 + len(rest)]) == rest:
+                    return True
+        return False
+
+    def _looks_like_car(self, title: str) -> bool:
+        """Part keyword found - decide if the title still reads like a car sale"""
+        title_lower = title.lower()
+        has_indicator = any(indicator in title_lower for indicator in self.full_car_indicators)
+
+        if self.strict and not has_indicator:
+            return False
+        if not self.strict and has_indicator:
+            return True
+
+        return bool(
+            self._year.search(title) and
+            self._km.search(title_lower) and
+            len(title.split()) >= self.MIN_WORDS_FOR_CAR
+        )
+
+
+# Global instance
+car_part_filter = CarPartFilter()
@@ -0,0 +1,303 @@
+"""
+Scrape Jobs - Durable scrape job queue in Postgres
+The API enqueues jobs; scrape workers (scrape_worker.py) claim them with
+SELECT ... FOR UPDATE SKIP LOCKED, so any number of worker processes on any
+host can share the queue and job state survives restarts
+"""
+import asyncio
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Set
+
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.database import database, scrape_job_events, scrape_jobs
+from app.services.db_listener import DatabaseListener, db_listener
+
+
+class JobLostError(Exception):
+    """The job is no longer running under this worker (requeued after a missed heartbeat)"""
+
+
+class ScrapeJobQueue:
+    """
+    Job lifecycle: pending -> running -> completed | failed
+
+    - Identical jobs (same kind + params) are deduplicated while one is
+      pending or running: enqueueing returns the existing job
+    - A failed run goes back to pending with a backoff until MAX_ATTEMPTS
+    - Running jobs whose worker stopped sending heartbeats for
+      STALE_AFTER_SECONDS are handed back to the queue; workers heartbeat
+      every HEARTBEAT_SECONDS. Progress, heartbeat and final writes only
+      apply while the job is still running under the worker that claimed
+      it, and raise JobLostError otherwise
+    - Workers append progress events to scrape_job_events, which the API
+      streams to clients (GET /scrape/stream/{task_id}); every new event and
+      final status is announced on NOTIFY_CHANNEL (see ScrapeJobNotifier)
+    - Events of jobs finished more than EVENT_RETENTION_HOURS ago are
+      pruned (`prune_events`)
+    """
+
+    KINDS = ('model', 'popular')
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    MAX_ATTEMPTS = 3
+    RETRY_BACKOFF_SECONDS = 60  # Multiplied by the attempt number
+    STALE_AFTER_SECONDS = 600
+    HEARTBEAT_SECONDS = 60
+    EVENT_RETENTION_HOURS = 24  # Finished streams stay replayable this long
+
+    NOTIFY_CHANNEL = 'scrape_job_events'
+
+    def _dedup_key(self, kind: str, params: Dict) -> str:
+        normalized = {
+            key: value.strip().lower() if isinstance(value, str) else value
+            for key, value in params.items()
+        }
+        return f"{kind}:{json.dumps(normalized, sort_keys=True)}"
+
+    async def enqueue(self, kind: str, params: Dict) -> Dict:
+        """
+        Add a job, or return the identical job that is already pending/running
+
+        Args:
+            kind: 'model' ({'marca', 'model', 'incremental'}) or 'popular' ({'incremental'})
+            params: Job arguments (JSON-serializable)
+
+        Returns:
+            The job row as a dict (with 'deduplicated': True when reused)
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown scrape job kind: {kind}")
+
+        dedup_key = self._dedup_key(kind, params)
+        # The partial unique index only covers active jobs, so a finished
+        # job never blocks a new one. The predicate must be literal SQL that
+        # matches the index: a bound IN (...) compiles to a POSTCOMPILE
+        # placeholder that Postgres rejects in ON CONFLICT
+        stmt = pg_insert(scrape_jobs).values(
+            kind=kind,
+            params=params,
+            dedup_key=dedup_key,
+            status='pending',
+            progress=0,
+            attempts=0,
+            max_attempts=self.MAX_ATTEMPTS,
+            created_at=datetime.now(),
+            run_after=datetime.now(),
+        ).on_conflict_do_nothing(
+            index_elements=[scrape_jobs.c.dedup_key],
+            index_where=sqlalchemy.text("status IN ('pending', 'running')")
+        ).returning(*scrape_jobs.c)
+
+        row = await database.fetch_one(stmt)
+        if row is not None:
+            return dict(row)
+
+        existing = await database.fetch_one(
+            scrape_jobs.select().where(
+                (scrape_jobs.c.dedup_key == dedup_key) &
+                scrape_jobs.c.status.in_(self.ACTIVE_STATUSES)
+            )
+        )
+        if existing is None:
+            # Finished between the insert and the select - try once more
+            return await self.enqueue(kind, params)
+        job = dict(existing)
+        job['deduplicated'] = True
+        return job
+
+    async def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Take the oldest runnable pending job
+
+        Returns:
+            The job (now 'running'), or None when the queue is empty
+        """
+        query = """
+            UPDATE scrape_jobs
+            SET status = 'running',
+                attempts = attempts + 1,
+                started_at = :now,
+                heartbeat_at = :now,
+                worker_id = :worker_id
+            WHERE id = (
+                SELECT id FROM scrape_jobs
+                WHERE status = 'pending' AND run_after <= :now
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id
+        """
+        row = await database.fetch_one(query, {'now': datetime.now(), 'worker_id': worker_id})
+        if row is None:
+            return None
+        return await self.get(row['id'])
+
+    async def _update_owned(self, job: Dict, **values):
+        """UPDATE the job if it is still running under the worker that claimed it"""
+        row = await database.fetch_one(
+            scrape_jobs.update().where(
+                (scrape_jobs.c.id == job['id']) &
+                (scrape_jobs.c.worker_id == job['worker_id']) &
+                (scrape_jobs.c.status == 'running')
+            ).values(**values).returning(scrape_jobs.c.id)
+        )
+        if row is None:
+            raise JobLostError(f"Job {job['id']} is no longer running under {job['worker_id']}")
+
+    async def heartbeat(self, job: Dict):
+        """Tell requeue_stale the job's worker is alive"""
+        await self._update_owned(job, heartbeat_at=datetime.now())
+
+    async def update_progress(self, job: Dict, progress: int, message: Optional[str] = None):
+        """Record progress (0-100); doubles as a heartbeat"""
+        values = {'progress': progress, 'heartbeat_at': datetime.now()}
+        if message is not None:
+            values['message'] = message
+        await self._update_owned(job, **values)
+
+    async def complete(self, job: Dict, result: Dict):
+        await self._update_owned(
+            job,
+            status='completed',
+            progress=100,
+            result=result,
+            error=None,
+            finished_at=datetime.now(),
+        )
+        await self._notify(job['id'])
+
+    async def fail(self, job: Dict, error: str) -> str:
+        """
+        Retry later with backoff, or mark failed after the last attempt
+
+        Returns:
+            The job's new status ('pending' or 'failed')
+        """
+        if job['attempts'] < job['max_attempts']:
+            values = {
+                'status': 'pending',
+                'error': error,
+                'run_after': datetime.now() + timedelta(seconds=self.RETRY_BACKOFF_SECONDS * job['attempts']),
+            }
+        else:
+            values = {'status': 'failed', 'error': error, 'finished_at': datetime.now()}
+        await self._update_owned(job, **values)
+        await self._notify(job['id'])
+        return values['status']
+
+    async def requeue_stale(self) -> int:
+        """
+        Hand back running jobs whose worker died (no heartbeat)
+
+        Returns:
+            Number of jobs requeued
+        """
+        now = datetime.now()
+        cutoff = now - timedelta(seconds=self.STALE_AFTER_SECONDS)
+        retry = scrape_jobs.c.attempts < scrape_jobs.c.max_attempts
+        rows = await database.fetch_all(
+            scrape_jobs.update().where(
+                (scrape_jobs.c.status == 'running') &
+                (scrape_jobs.c.heartbeat_at < cutoff)
+            ).values(
+                status=sqlalchemy.case((retry, 'pending'), else_='failed'),
+                error='Worker stopped responding',
+                # Same as fail(): only a final failure is finished
+                finished_at=sqlalchemy.case((retry, sqlalchemy.null()), else_=sqlalchemy.cast(now, sqlalchemy.DateTime)),
+            ).returning(scrape_jobs.c.id)
+        )
+        for row in rows:
+            await self._notify(row['id'])
+        return len(rows)
+
+    async def prune_events(self) -> int:
+        """
+        Delete the events of jobs finished more than EVENT_RETENTION_HOURS ago
+
+        Returns:
+            Number of events deleted
+        """
+        cutoff = datetime.now() - timedelta(hours=self.EVENT_RETENTION_HOURS)
+        finished = sqlalchemy.select([scrape_jobs.c.id]).where(
+            scrape_jobs.c.status.in_(('completed', 'failed')) &
+            (scrape_jobs.c.finished_at < cutoff)
+        )
+        rows = await database.fetch_all(
+            scrape_job_events.delete().where(
+                scrape_job_events.c.job_id.in_(finished)
+            ).returning(scrape_job_events.c.id)
+        )
+        return len(rows)
+
+    async def add_event(self, job_id: int, event_type: str, data: Dict):
+        """Append a progress event for the job's stream"""
+        await database.execute(
+            scrape_job_events.insert().values(job_id=job_id, type=event_type, data=data)
+        )
+        await self._notify(job_id)
+
+    async def _notify(self, job_id: int):
+        """Wake the API streams following this job"""
+        await DatabaseListener.notify(self.NOTIFY_CHANNEL, str(job_id))
+
+    async def events_after(self, job_id: int, last_event_id: int = 0) -> List[Dict]:
+        """Events of a job newer than `last_event_id`, oldest first"""
+        rows = await database.fetch_all(
+            scrape_job_events.select().where(
+                (scrape_job_events.c.job_id == job_id) &
+                (scrape_job_events.c.id > last_event_id)
+            ).order_by(scrape_job_events.c.id)
+        )
+        return [dict(row) for row in rows]
+
+    async def get(self, job_id: int) -> Optional[Dict]:
+        row = await database.fetch_one(scrape_jobs.select().where(scrape_jobs.c.id == job_id))
+        return dict(row) if row else None
+
+
+class ScrapeJobNotifier:
+    """
+    Wakes SSE streams when their job changes, instead of each stream
+    polling the database every second
+
+    The process's DatabaseListener LISTENs on ScrapeJobQueue.NOTIFY_CHANNEL
+    (payload: job id); this sets the asyncio events of the streams
+    subscribed to that job. While it is not listening (not started,
+    connection lost) streams fall back to polling.
+    """
+
+    def __init__(self, listener: Optional[DatabaseListener] = None):
+        self.listener = listener or db_listener
+        self._subscribers: Dict[int, Set[asyncio.Event]] = {}
+        self.listener.add(ScrapeJobQueue.NOTIFY_CHANNEL, self._on_notify)
+
+    @property
+    def listening(self) -> bool:
+        return self.listener.listening
+
+    def _on_notify(self, payload: str):
+        for event in self._subscribers.get(int(payload), ()):
+            event.set()
+
+    @contextmanager
+    def subscribe(self, job_id: int) -> Iterator[asyncio.Event]:
+        """Event set whenever the job gets a new event or status; clear it before each read"""
+        event = asyncio.Event()
+        self._subscribers.setdefault(job_id, set()).add(event)
+        try:
+            yield event
+        finally:
+            subscribers = self._subscribers.get(job_id)
+            subscribers.discard(event)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+
+# Global instances
+scrape_job_queue = ScrapeJobQueue()
+scrape_job_notifier = ScrapeJobNotifier()
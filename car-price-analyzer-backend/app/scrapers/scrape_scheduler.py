@@ -0,0 +1,184 @@
+"""
+Scrape Scheduler - Shared politeness budget for all scrapers
+Per-host token buckets kept in Postgres (one budget for the API and every
+scrape_worker.py process) + concurrent query pipeline
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from app.database import database
+
+
+class TokenBucket:
+    """
+    In-process token bucket rate limiter for a single host
+
+    Refills one token every 60 / rate_per_minute seconds, up to `capacity`.
+    Waiters are served in arrival order.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: int = 1):
+        self.interval = 60.0 / rate_per_minute
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = None
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Take one token, sleeping until one is available
+
+        Returns:
+            Seconds spent waiting
+        """
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            if self.updated is not None:
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) / self.interval)
+            self.updated = now
+
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) * self.interval
+                await asyncio.sleep(wait)
+                self.tokens = 1.0
+                self.updated = loop.time()
+
+            self.tokens -= 1
+            return wait
+
+
+class SharedTokenBucket:
+    """
+    Token bucket for a single host shared by every process through the
+    `scrape_rate_limits` table
+
+    The row holds the time the last reserved request slot ends (GCRA:
+    a bucket of `capacity` tokens refilled every `interval` seconds is
+    empty until next_slot_at - capacity * interval). Each acquire moves it
+    forward by one interval in a single upsert - the row lock orders
+    concurrent callers - then sleeps until its slot. Timestamps come from
+    the database clock, so processes on different hosts agree.
+
+    Falls back to an in-process TokenBucket while the database is
+    unreachable, so scraping degrades to a per-process budget instead of
+    failing.
+    """
+
+    RESERVE_SQL = """
+        INSERT INTO scrape_rate_limits AS r (host, next_slot_at)
+        VALUES (:host, NOW() + make_interval(secs => :interval))
+        ON CONFLICT (host) DO UPDATE
+            SET next_slot_at = GREATEST(r.next_slot_at, NOW()) + make_interval(secs => :interval)
+        RETURNING GREATEST(0, EXTRACT(EPOCH FROM r.next_slot_at - NOW())::float8 - :window) AS wait
+    """
+
+    def __init__(self, host: str, rate_per_minute: float, capacity: int = 1):
+        self.host = host
+        self.interval = 60.0 / rate_per_minute
+        self.capacity = capacity
+        self.local = TokenBucket(rate_per_minute, capacity)
+        self._warned = False
+
+    async def acquire(self) -> float:
+        """
+        Reserve the next request slot, sleeping until it starts
+
+        Returns:
+            Seconds spent waiting
+        """
+        try:
+            wait = await database.fetch_val(self.RESERVE_SQL, {
+                'host': self.host,
+                'interval': self.interval,
+                'window': self.capacity * self.interval,
+            })
+        except Exception as e:
+            if not self._warned:
+                print(f"Shared rate limit unavailable for {self.host}, using a per-process budget: {e}")
+                self._warned = True
+            return await self.local.acquire()
+
+        self._warned = False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class ScrapeScheduler:
+    """
+    Shared scheduler used by every scraper:
+    - one token bucket per host (the politeness budget is global, not per
+      scraper or per process - see SharedTokenBucket)
+    - runs many search queries concurrently so parsing and DB writes
+      overlap with the rate-limit wait instead of adding to it
+    """
+
+    # Requests per minute allowed per host
+    HOST_RATE_LIMITS = {
+        'www.olx.ro': 6,  # 1 request per 10 seconds
+        'olx.ro': 6,
+    }
+    DEFAULT_RATE_LIMIT = 6
+    BURST = 1  # No bursts - keep requests evenly spaced
+
+    # Queries in flight at once (the bucket still bounds the request rate)
+    MAX_CONCURRENT_QUERIES = 4
+
+    def __init__(self):
+        self.buckets: Dict[str, SharedTokenBucket] = {}
+
+    def _bucket_for(self, url: str) -> SharedTokenBucket:
+        """Get or create the token bucket for the URL's host"""
+        host = urlparse(url).netloc.lower()
+        if host not in self.buckets:
+            rate = self.HOST_RATE_LIMITS.get(host, self.DEFAULT_RATE_LIMIT)
+            self.buckets[host] = SharedTokenBucket(host, rate, self.BURST)
+        return self.buckets[host]
+
+    async def acquire(self, url: str) -> float:
+        """
+        Wait for permission to request `url`
+
+        Returns:
+            Seconds spent waiting
+        """
+        wait = await self._bucket_for(url).acquire()
+        if wait > 0:
+            print(f"Rate limiting: waited {wait:.1f}s for {urlparse(url).netloc}")
+        return wait
+
+    async def run(
+        self,
+        items: List[Any],
+        handler: Callable[[int, Any], Awaitable[Any]],
+        concurrency: Optional[int] = None
+    ) -> List[Any]:
+        """
+        Run `handler(index, item)` for every item with bounded concurrency
+
+        Args:
+            items: Work items (e.g. search queries)
+            handler: Coroutine function doing fetch + parse + save for one item
+            concurrency: Max handlers in flight (default MAX_CONCURRENT_QUERIES)
+
+        Returns:
+            Handler results in input order (None for handlers that raised)
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.MAX_CONCURRENT_QUERIES)
+
+        async def worker(index: int, item: Any) -> Any:
+            async with semaphore:
+                try:
+                    return await handler(index, item)
+                except Exception as e:
+                    print(f"Error processing {item}: {e}")
+                    return None
+
+        return await asyncio.gather(*(worker(i, item) for i, item in enumerate(items)))
+
+
+# Global instance
+scrape_scheduler = ScrapeScheduler()
@@ -3,31 +3,225 @@ Scraper Service - Manages data collection and database population
 """
 import asyncio
 from datetime import datetime
-from typing import List, Dict
+from typing import Awaitable, Callable, Dict, List, Optional
+import sqlalchemy
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.analysis.analysis_cache import analysis_cache
+from app.analysis.market_stats import market_stats_cube
 from app.database import database, listings
 from app.scrapers.detailed_olx_scraper import detailed_olx_scraper
+from app.scrapers.known_urls import known_url_index
+from app.services.listing_changes import listing_changes
+from app.services.search_keys import search_keys
 
 
 class ScraperService:
     """Service to manage scraping and database updates"""
 
+    # Rows per INSERT statement (asyncpg caps a statement at 32767 parameters)
+    UPSERT_BATCH_SIZE = 500
+
+    # Page budget per query in incremental mode (paging usually stops earlier)
+    INCREMENTAL_MAX_PAGES = 5
+
+    # Columns written on insert and refreshed on conflict
+    LISTING_COLUMNS = [
+        'source', 'marca', 'model', 'model_series', 'model_variant',
+        'an', 'km', 'pret', 'combustibil', 'putere_cp', 'capacitate_cilindrica',
+        'transmisie', 'tractiune', 'caroserie', 'locatie', 'dotari', 'imagini',
+        'descriere', 'data_publicare', 'zile_pe_piata', 'este_activ',
+        'marca_key', 'series_key', 'variant_key',
+    ]
+
+    # A conflicting row is only rewritten when one of these differs
+    TRACKED_COLUMNS = [
+        'pret', 'km', 'an', 'combustibil', 'putere_cp', 'capacitate_cilindrica',
+        'transmisie', 'tractiune', 'caroserie', 'model_series', 'model_variant',
+        'locatie', 'este_activ', 'marca_key', 'series_key', 'variant_key',
+    ]
+
+    # State only a live scrape knows - a reparsed archive page is a snapshot
+    # of the past, so reparsing never rewrites these on existing rows
+    LIVE_COLUMNS = ['data_publicare', 'zile_pe_piata', 'este_activ', 'data_scrape']
+
     def __init__(self):
         self.scraper = detailed_olx_scraper
+        self.known_urls = known_url_index
+
+    async def load_known_urls(self) -> int:
+        """
+        Load every stored listing URL into the known-URL index
+
+        Returns:
+            Number of URLs loaded
+        """
+        query = sqlalchemy.select([listings.c.url])
+        self.known_urls.replace([row['url'] async for row in database.iterate(query)])
+        print(f"Loaded {len(self.known_urls)} known listing URLs")
+        return len(self.known_urls)
+
+    def _listing_row(self, listing: Dict, scraped_at: datetime) -> Dict:
+        """Map a scraped listing dict to a full `listings` row"""
+        row = {'url': listing['url'], 'data_scrape': listing.get('data_scrape') or scraped_at}
+        for column in self.LISTING_COLUMNS:
+            row[column] = listing.get(column)
+        # Normalized once here so reads can match keys by equality
+        row.update(search_keys.listing_keys(listing))
+        if row['dotari'] is None:
+            row['dotari'] = []
+        if row['imagini'] is None:
+            row['imagini'] = []
+        if row['zile_pe_piata'] is None:
+            row['zile_pe_piata'] = 0
+        if row['este_activ'] is None:
+            row['este_activ'] = True
+        return row
+
+    def _build_upsert(self, rows: List[Dict], reparse: bool = False):
+        """
+        Build one multi-row INSERT ... ON CONFLICT (url) DO UPDATE
+
+        Existing rows are only rewritten when a tracked column changed, so
+        RETURNING yields inserted and updated rows; everything else is unchanged.
+        With `reparse`, LIVE_COLUMNS of existing rows are left alone.
+        """
+        stmt = pg_insert(listings).values(rows)
+        excluded = stmt.excluded
+
+        skipped = self.LIVE_COLUMNS if reparse else []
+        update_columns = {
+            column: excluded[column]
+            for column in self.LISTING_COLUMNS + ['data_scrape']
+            if column not in skipped
+        }
+
+        changed = sqlalchemy.or_(*[
+            listings.c[column].is_distinct_from(excluded[column])
+            for column in self.TRACKED_COLUMNS
+            if column not in skipped
+        ])
+
+        return stmt.on_conflict_do_update(
+            index_elements=[listings.c.url],
+            set_=update_columns,
+            where=changed
+        ).returning(
+            listings.c.id,
+            sqlalchemy.literal_column('(xmax = 0)').label('inserted')
+        )
+
+    async def save_listings(self, scraped_listings: List[Dict], reparse: bool = False) -> Dict:
+        """
+        Persist scraped listings with batched upserts
+
+        Args:
+            scraped_listings: Listing dicts as produced by the scrapers; a
+                'data_scrape' key overrides the scrape time of new rows
+                (reparsed archive pages carry their fetch time)
+            reparse: Listings come from archived pages - update parsed
+                fields only, keep LIVE_COLUMNS of existing rows
+
+        Returns:
+            {'inserted': int, 'updated': int, 'unchanged': int}
+        """
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        scraped_at = datetime.now()
+
+        # ON CONFLICT cannot touch the same row twice in one statement,
+        # so keep only the last occurrence of every URL
+        unique = {}
+        for listing in scraped_listings:
+            if listing.get('url'):
+                unique[listing['url']] = listing
+        counts['unchanged'] += len(scraped_listings) - len(unique)
+
+        rows = [self._listing_row(listing, scraped_at) for listing in unique.values()]
+        # (marca_key, series_key, model) of the written rows, before and after
+        changed = {(row['marca_key'], row['series_key'], row['model']) for row in rows}
+
+        for start in range(0, len(rows), self.UPSERT_BATCH_SIZE):
+            batch = rows[start:start + self.UPSERT_BATCH_SIZE]
+            try:
+                # A listing whose series changed also leaves its old segment
+                previous = await database.fetch_all(
+                    sqlalchemy.select([listings.c.marca_key, listings.c.series_key, listings.c.model])
+                    .where(listings.c.url.in_([row['url'] for row in batch]))
+                    .distinct()
+                )
+                written = await database.fetch_all(self._build_upsert(batch, reparse=reparse))
+            except Exception as e:
+                print(f"Error saving batch of {len(batch)} listings: {e}")
+                continue
+            if written:
+                changed.update((row['marca_key'], row['series_key'], row['model']) for row in previous)
 
-    async def populate_listings(self, search_queries: List[Dict]) -> Dict:
+            inserted = sum(1 for row in written if row['inserted'])
+            counts['inserted'] += inserted
+            counts['updated'] += len(written) - inserted
+            counts['unchanged'] += len(batch) - len(written)
+
+            if self.known_urls.loaded:
+                self.known_urls.add(row['url'] for row in batch)
+
+        if counts['inserted'] or counts['updated']:
+            segments = {(marca_key, series_key) for marca_key, series_key, _ in changed}
+            try:
+                await market_stats_cube.refresh_segments(segments)
+            except Exception as e:
+                print(f"Error refreshing market stats: {e}")
+            await analysis_cache.invalidate_segments(changed)
+            # Every process (the API when this is scrape_worker.py) drops its
+            # L1 entries and reloads these segments of its comparables index
+            await listing_changes.publish(changed)
+
+        return counts
+
+    async def populate_listings(
+        self,
+        search_queries: List[Dict],
+        incremental: bool = False,
+        on_event: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> Dict:
         """
         Populate database with listings from RSS feeds
 
         Args:
             search_queries: List of {'marca': 'BMW', 'model': 'Seria 3'}
+            incremental: Fetch newest first and stop paging at already-known
+                listings (scheduled refreshes)
+            on_event: Optional coroutine called with progress events
+                ('page', 'saved', 'query')
 
         Returns:
             Status dict with counts
         """
         print("\n=== Starting RSS Scraping ===\n")
 
-        # Fetch listings from OLX
-        new_listings = await self.scraper.bulk_search(search_queries)
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+        async def persist(batch: List[Dict]):
+            batch_counts = await self.save_listings(batch)
+            for key in counts:
+                counts[key] += batch_counts[key]
+            if on_event:
+                await on_event({'type': 'saved', **batch_counts})
+
+        # Fetch listings from OLX; each query's batch is saved as soon as it
+        # is parsed, overlapping DB writes with the next rate-limit wait
+        if incremental:
+            if not self.known_urls.loaded:
+                await self.load_known_urls()
+            new_listings = await self.scraper.bulk_search(
+                search_queries,
+                on_listings=persist,
+                max_pages=self.INCREMENTAL_MAX_PAGES,
+                known_urls=self.known_urls,
+                on_event=on_event
+            )
+        else:
+            new_listings = await self.scraper.bulk_search(
+                search_queries, on_listings=persist, on_event=on_event
+            )
 
         if not new_listings:
             return {
@@ -38,75 +232,41 @@ class ScraperService:
                 'message': 'No listings found'
             }
 
-        # Save to database
-        saved_count = 0
-        duplicate_count = 0
-
-        for listing in new_listings:
-            try:
-                # Check if listing already exists (by URL)
-                existing = await database.fetch_one(
-                    listings.select().where(listings.c.url == listing['url'])
-                )
-
-                if existing:
-                    duplicate_count += 1
-                    print(f"Duplicate: {listing['url']}")
-                    continue
-
-                # Insert new listing with detailed specs
-                await database.execute(listings.insert().values(
-                    source=listing['source'],
-                    url=listing['url'],
-                    marca=listing['marca'],
-                    model=listing['model'],
-                    model_series=listing.get('model_series'),
-                    model_variant=listing.get('model_variant'),
-                    an=listing['an'],
-                    km=listing['km'],
-                    pret=listing['pret'],
-                    combustibil=listing['combustibil'],
-                    putere_cp=listing.get('putere_cp'),
-                    capacitate_cilindrica=listing.get('capacitate_cilindrica'),
-                    transmisie=listing.get('transmisie'),
-                    tractiune=listing.get('tractiune'),
-                    caroserie=listing.get('caroserie'),
-                    locatie=listing['locatie'],
-                    dotari=listing['dotari'],
-                    imagini=listing['imagini'],
-                    descriere=listing['descriere'],
-                    data_publicare=listing['data_publicare'],
-                    zile_pe_piata=listing['zile_pe_piata'],
-                    este_activ=listing['este_activ'],
-                    data_scrape=datetime.now()
-                ))
-
-                saved_count += 1
-                print(f"Saved: {listing['marca']} {listing['model']} - EUR {listing['pret']:,}")
-
-            except Exception as e:
-                print(f"Error saving listing: {e}")
-                continue
-
         result = {
             'success': True,
             'total_found': len(new_listings),
-            'total_saved': saved_count,
-            'duplicates': duplicate_count,
-            'message': f'Successfully saved {saved_count} new listings ({duplicate_count} duplicates skipped)'
+            'total_saved': counts['inserted'],
+            'duplicates': counts['updated'] + counts['unchanged'],
+            'inserted': counts['inserted'],
+            'updated': counts['updated'],
+            'unchanged': counts['unchanged'],
+            'message': (
+                f"Successfully saved {counts['inserted']} new listings "
+                f"({counts['updated']} updated, {counts['unchanged']} unchanged)"
+            )
         }
 
         print(f"\n=== Scraping Complete ===")
         print(f"Total found: {result['total_found']}")
-        print(f"Total saved: {result['total_saved']}")
-        print(f"Duplicates: {result['duplicates']}\n")
+        print(f"Inserted: {result['inserted']}")
+        print(f"Updated: {result['updated']}")
+        print(f"Unchanged: {result['unchanged']}\n")
 
         return result
 
-    async def update_popular_models(self) -> Dict:
+    async def update_popular_models(
+        self,
+        incremental: bool = False,
+        on_event: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> Dict:
         """
         Update database with popular car models
         Searches for most common cars in Romania
+
+        Args:
+            incremental: Only fetch pages until already-known listings show up
+            on_event: Optional coroutine called with progress events
+                ('page', 'saved', 'query')
         """
         # Most popular cars in Romania (2023-2024 data)
         popular_searches = [
@@ -156,21 +316,30 @@ class ScraperService:
             {'marca': 'Skoda', 'model': 'Fabia'}
         ]
 
-        return await self.populate_listings(popular_searches)
+        return await self.populate_listings(popular_searches, incremental=incremental, on_event=on_event)
 
-    async def update_specific_model(self, marca: str, model: str = None) -> Dict:
+    async def update_specific_model(
+        self,
+        marca: str,
+        model: str = None,
+        incremental: bool = False,
+        on_event: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> Dict:
         """
         Update database for a specific car model
 
         Args:
             marca: Car brand
             model: Car model (optional)
+            incremental: Only fetch pages until already-known listings show up
+            on_event: Optional coroutine called with progress events
+                ('page', 'saved', 'query')
 
         Returns:
             Status dict
         """
         search_queries = [{'marca': marca, 'model': model}]
-        return await self.populate_listings(search_queries)
+        return await self.populate_listings(search_queries, incremental=incremental, on_event=on_event)
 
     async def cleanup_inactive_listings(self, max_age_days: int = 60) -> int:
         """
@@ -196,6 +365,11 @@ class ScraperService:
         result = await database.execute(query)
 
         print(f"Marked {result} listings as inactive (older than {max_age_days} days)")
+
+        # Deactivations span every segment
+        await market_stats_cube.refresh_all()
+        await analysis_cache.invalidate_all()
+        await listing_changes.publish(None)
         return result
 
 
@@ -3,7 +3,9 @@ Car Catalog Service - Hierarchical brand and model organization
 Premium brands first (Audi, BMW, Mercedes, VW) + grouped models
 """
 from typing import List, Dict, Optional
+from app.config.model_series import MODEL_SERIES_PATTERNS
 from app.database import database, listings
+from app.services.search_keys import search_keys
 
 
 class CarCatalogService:
@@ -44,117 +46,7 @@ class CarCatalogService:
     ]
 
     # Model series grouping patterns
-    MODEL_SERIES_PATTERNS = {
-        'bmw': {
-            'Seria 1': [r'1\d{2}', r'seria 1', r'series 1'],
-            'Seria 2': [r'2\d{2}', r'seria 2', r'series 2'],
-            'Seria 3': [r'3\d{2}', r'seria 3', r'series 3'],
-            'Seria 4': [r'4\d{2}', r'seria 4', r'series 4'],
-            'Seria 5': [r'5\d{2}', r'seria 5', r'series 5'],
-            'Seria 6': [r'6\d{2}', r'seria 6', r'series 6'],
-            'Seria 7': [r'7\d{2}', r'seria 7', r'series 7'],
-            'Seria 8': [r'8\d{2}', r'seria 8', r'series 8'],
-            'X1': [r'x1'],
-            'X2': [r'x2'],
-            'X3': [r'x3'],
-            'X4': [r'x4'],
-            'X5': [r'x5'],
-            'X6': [r'x6'],
-            'X7': [r'x7'],
-            'Z4': [r'z4'],
-            'i3': [r'i3'],
-            'i4': [r'i4'],
-            'i8': [r'i8'],
-        },
-        'mercedes': {
-            'A-Class': [r'a\s*\d{2,3}', r'a-class', r'clasa a'],
-            'B-Class': [r'b\s*\d{2,3}', r'b-class', r'clasa b'],
-            'C-Class': [r'c\s*\d{2,3}', r'c-class', r'clasa c'],
-            'E-Class': [r'e\s*\d{2,3}', r'e-class', r'clasa e'],
-            'S-Class': [r's\s*\d{2,3}', r's-class', r'clasa s'],
-            'CLA': [r'cla'],
-            'CLS': [r'cls'],
-            'GLA': [r'gla'],
-            'GLB': [r'glb'],
-            'GLC': [r'glc'],
-            'GLE': [r'gle'],
-            'GLS': [r'gls'],
-            'G-Class': [r'g\s*\d{2,3}', r'g-class'],
-        },
-        'audi': {
-            'A1': [r'a1'],
-            'A3': [r'a3'],
-            'A4': [r'a4'],
-            'A5': [r'a5'],
-            'A6': [r'a6'],
-            'A7': [r'a7'],
-            'A8': [r'a8'],
-            'Q2': [r'q2'],
-            'Q3': [r'q3'],
-            'Q5': [r'q5'],
-            'Q7': [r'q7'],
-            'Q8': [r'q8'],
-            'TT': [r'tt'],
-            'R8': [r'r8'],
-            'e-tron': [r'e-tron', r'etron'],
-        },
-        'volkswagen': {
-            'Golf': [r'golf'],
-            'Polo': [r'polo'],
-            'Passat': [r'passat'],
-            'Jetta': [r'jetta'],
-            'Tiguan': [r'tiguan'],
-            'Touareg': [r'touareg'],
-            'Arteon': [r'arteon'],
-            'T-Roc': [r't-roc', r'troc'],
-            'ID.3': [r'id\.?3'],
-            'ID.4': [r'id\.?4'],
-        },
-        'dacia': {
-            'Logan': [r'logan'],
-            'Sandero': [r'sandero'],
-            'Duster': [r'duster'],
-            'Lodgy': [r'lodgy'],
-            'Dokker': [r'dokker'],
-            'Spring': [r'spring'],
-            'Jogger': [r'jogger'],
-        },
-        'skoda': {
-            'Fabia': [r'fabia'],
-            'Octavia': [r'octavia'],
-            'Superb': [r'superb'],
-            'Rapid': [r'rapid'],
-            'Scala': [r'scala'],
-            'Kamiq': [r'kamiq'],
-            'Karoq': [r'karoq'],
-            'Kodiaq': [r'kodiaq'],
-        },
-        'ford': {
-            'Fiesta': [r'fiesta'],
-            'Focus': [r'focus'],
-            'Mondeo': [r'mondeo'],
-            'Kuga': [r'kuga'],
-            'Puma': [r'puma'],
-            'EcoSport': [r'ecosport'],
-            'Mustang': [r'mustang'],
-        },
-        'renault': {
-            'Clio': [r'clio'],
-            'Megane': [r'megane'],
-            'Captur': [r'captur'],
-            'Kadjar': [r'kadjar'],
-            'Talisman': [r'talisman'],
-            'Zoe': [r'zoe'],
-        },
-        'opel': {
-            'Corsa': [r'corsa'],
-            'Astra': [r'astra'],
-            'Insignia': [r'insignia'],
-            'Mokka': [r'mokka'],
-            'Crossland': [r'crossland'],
-            'Grandland': [r'grandland'],
-        }
-    }
+    MODEL_SERIES_PATTERNS = MODEL_SERIES_PATTERNS
 
     async def get_brands(self) -> List[Dict]:
         """
@@ -232,7 +124,7 @@ class CarCatalogService:
                 ARRAY_AGG(DISTINCT model_variant) as variants
             FROM listings
             WHERE
-                LOWER(marca) LIKE :marca
+                marca_key = :marca_key
                 AND este_activ = true
                 AND model_series IS NOT NULL
             GROUP BY model_series
@@ -241,7 +133,7 @@ class CarCatalogService:
 
         result = await database.fetch_all(
             query,
-            {'marca': f'%{marca.lower()}%'}
+            {'marca_key': search_keys.marca_key(marca)}
         )
 
         return [
@@ -261,8 +153,8 @@ class CarCatalogService:
                 MAX(an) as max_year
             FROM listings
             WHERE
-                LOWER(marca) LIKE :marca
-                AND (model_series ILIKE :series OR model ILIKE :series)
+                marca_key = :marca_key
+                AND series_key = :series_key
                 AND este_activ = true
                 AND an IS NOT NULL
         """
@@ -270,8 +162,8 @@ class CarCatalogService:
         result = await database.fetch_one(
             query,
             {
-                'marca': f'%{marca.lower()}%',
-                'series': f'%{model_series}%'
+                'marca_key': search_keys.marca_key(marca),
+                'series_key': search_keys.series_key(marca, model_series)
             }
         )
 
@@ -289,8 +181,8 @@ class CarCatalogService:
             SELECT DISTINCT model_variant
             FROM listings
             WHERE
-                LOWER(marca) LIKE :marca
-                AND (model_series ILIKE :series OR model ILIKE :series)
+                marca_key = :marca_key
+                AND series_key = :series_key
                 AND este_activ = true
                 AND model_variant IS NOT NULL
             ORDER BY model_variant
@@ -299,8 +191,8 @@ class CarCatalogService:
         result = await database.fetch_all(
             query,
             {
-                'marca': f'%{marca.lower()}%',
-                'series': f'%{model_series}%'
+                'marca_key': search_keys.marca_key(marca),
+                'series_key': search_keys.series_key(marca, model_series)
             }
         )
 
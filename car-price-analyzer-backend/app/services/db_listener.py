@@ -0,0 +1,92 @@
+"""
+DB Listener - Postgres LISTEN/NOTIFY fan-out for one process
+One dedicated connection listens on every registered channel and hands each
+payload to the callbacks registered for it, so in-process state (caches,
+indexes, SSE streams) can follow writes made by other processes
+"""
+import asyncio
+import inspect
+from typing import Callable, Dict, List, Optional, Set
+
+import asyncpg
+
+from app.database import DATABASE_URL, database
+
+
+class DatabaseListener:
+    """
+    LISTEN connection shared by everything in the process
+
+    - `add(channel, callback)` registers a callback (sync, or async - async
+      ones run as tasks); channels added after `start` are listened on at once
+    - `notify` sends through the regular pool, so it works in any process,
+      listening or not
+    - While not listening (not started, connection lost) `listening` is
+      False and callers fall back to their own polling or local handling
+    """
+
+    def __init__(self, dsn: Optional[str] = None):
+        self.dsn = dsn or DATABASE_URL
+        self._callbacks: Dict[str, List[Callable[[str], object]]] = {}
+        self._connection: Optional[asyncpg.Connection] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def listening(self) -> bool:
+        return self._connection is not None and not self._connection.is_closed()
+
+    def add(self, channel: str, callback: Callable[[str], object]):
+        """Call `callback(payload)` for every notification on `channel`"""
+        self._callbacks.setdefault(channel, []).append(callback)
+        if self.listening and len(self._callbacks[channel]) == 1:
+            self._track(asyncio.create_task(self._connection.add_listener(channel, self._dispatch)))
+
+    async def start(self):
+        """Open the LISTEN connection (API startup); failures leave callers on their fallback"""
+        try:
+            self._connection = await asyncpg.connect(self.dsn)
+            for channel in self._callbacks:
+                await self._connection.add_listener(channel, self._dispatch)
+        except Exception as e:
+            print(f"Database notifications unavailable: {e}")
+            await self.stop()
+
+    async def stop(self):
+        if self._connection is not None:
+            try:
+                await self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def _dispatch(self, connection, pid, channel, payload):
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                result = callback(payload)
+            except Exception as e:
+                print(f"Error handling notification on {channel}: {e}")
+                continue
+            if inspect.isawaitable(result):
+                self._track(asyncio.ensure_future(result))
+
+    def _track(self, task: asyncio.Task):
+        # Keep a reference, or the task can be garbage-collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error handling notification: {task.exception()}")
+
+    @staticmethod
+    async def notify(channel: str, payload: str):
+        """NOTIFY `channel` (delivered to every listening process, this one included)"""
+        await database.execute(
+            "SELECT pg_notify(:channel, :payload)",
+            {'channel': channel, 'payload': payload}
+        )
+
+
+# Global instance
+db_listener = DatabaseListener()
@@ -0,0 +1,83 @@
+"""
+Listing Changes - Tells every process which listing segments were written
+Scrapes run in scrape_worker.py, analyses are served by the API processes:
+the writer publishes the segments it touched and each process updates its
+in-memory state (analysis cache L1, comparables index) for just those
+"""
+import json
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+
+from app.services.db_listener import DatabaseListener, db_listener
+
+# (marca_key, series_key, model) - the key set AnalysisCache.invalidate_segments takes
+Segment = Tuple[str, Optional[str], Optional[str]]
+
+
+class ListingChanges:
+    """
+    Broadcast of written segments over NOTIFY
+
+    Handlers get a list of segments, or None when everything may have changed
+    (cleanup, bulk edits). When this process is listening, its own handlers
+    run when its notification comes back; otherwise `publish` runs them
+    directly, so a lone process (no LISTEN connection) still stays current.
+    """
+
+    CHANNEL = 'listing_changes'
+    MAX_PAYLOAD_BYTES = 7000  # NOTIFY payloads are capped at 8000 bytes
+
+    def __init__(self, listener: Optional[DatabaseListener] = None):
+        self.listener = listener or db_listener
+        self._handlers: List[Callable[[Optional[List[Segment]]], Awaitable[None]]] = []
+        self.listener.add(self.CHANNEL, self._on_notify)
+
+    def subscribe(self, handler: Callable[[Optional[List[Segment]]], Awaitable[None]]):
+        """Run `handler(segments)` for every change, from any process"""
+        self._handlers.append(handler)
+
+    async def publish(self, segments: Optional[Iterable[Segment]]):
+        """
+        Announce written segments (None = everything)
+
+        Errors are logged: other processes then catch up on their periodic
+        rebuilds or cache TTLs.
+        """
+        changed = None if segments is None else sorted({tuple(segment) for segment in segments if segment[0]})
+        if changed == []:
+            return
+
+        try:
+            for payload in self._payloads(changed):
+                await self.listener.notify(self.CHANNEL, payload)
+        except Exception as e:
+            print(f"Could not publish listing changes: {e}")
+
+        if not self.listener.listening:
+            await self._run_handlers(changed)
+
+    def _payloads(self, changed: Optional[List[Segment]]) -> List[str]:
+        if changed is None:
+            return ['*']
+        payloads, chunk = [], []
+        for segment in changed:
+            if chunk and len(json.dumps(chunk + [segment])) > self.MAX_PAYLOAD_BYTES:
+                payloads.append(json.dumps(chunk))
+                chunk = []
+            chunk.append(segment)
+        payloads.append(json.dumps(chunk))
+        return payloads
+
+    async def _on_notify(self, payload: str):
+        segments = None if payload == '*' else [tuple(segment) for segment in json.loads(payload)]
+        await self._run_handlers(segments)
+
+    async def _run_handlers(self, segments: Optional[List[Segment]]):
+        for handler in self._handlers:
+            try:
+                await handler(segments)
+            except Exception as e:
+                print(f"Error applying listing changes: {e}")
+
+
+# Global instance
+listing_changes = ListingChanges()
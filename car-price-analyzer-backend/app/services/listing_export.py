@@ -0,0 +1,154 @@
+"""
+Listing Export - Streams listings as NDJSON or CSV with constant memory
+Rows come from a server-side cursor (database.iterate) and leave in chunks,
+optionally gzip-compressed on the fly; used by GET /listings/export and
+export_listings.py
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import sqlalchemy
+
+from app.database import database, listings
+
+
+def listing_filters(
+    marca: Optional[str] = None,
+    model: Optional[str] = None,
+    an_min: Optional[int] = None,
+    an_max: Optional[int] = None,
+    pret_min: Optional[float] = None,
+    pret_max: Optional[float] = None,
+    locatie: Optional[str] = None,
+    include_inactive: bool = False,
+) -> List:
+    """WHERE conditions shared by GET /listings/{marca}/{model} and the export"""
+    conditions = []
+    if marca:
+        conditions.append(listings.c.marca == marca)
+    if model:
+        conditions.append(listings.c.model == model)
+    if not include_inactive:
+        conditions.append(listings.c.este_activ == True)
+    if an_min:
+        conditions.append(listings.c.an >= an_min)
+    if an_max:
+        conditions.append(listings.c.an <= an_max)
+    if pret_min:
+        conditions.append(listings.c.pret >= pret_min)
+    if pret_max:
+        conditions.append(listings.c.pret <= pret_max)
+    if locatie:
+        conditions.append(listings.c.locatie.ilike(f"%{locatie}%"))
+    return conditions
+
+
+class ListingExporter:
+    """
+    Serializes a listings query chunk by chunk
+
+    - ndjson: one JSON object per line
+    - csv: header row, then one row per listing (JSON columns as JSON text)
+
+    Datetimes are ISO 8601. Memory stays at one chunk (CHUNK_ROWS rows) no
+    matter how many rows are exported.
+    """
+
+    FORMATS = ('ndjson', 'csv')
+    CHUNK_ROWS = 500
+    COLUMNS = [column.name for column in listings.columns]
+
+    def resolve_fields(self, fields: Optional[str]) -> List[str]:
+        """
+        Columns to export from a comma-separated list (default: all)
+
+        Raises:
+            ValueError: on unknown column names
+        """
+        if not fields:
+            return list(self.COLUMNS)
+        selected = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in selected if f not in self.COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return selected
+
+    def build_query(self, columns: List[str], conditions: List):
+        # Ordered by id so an interrupted export can be compared or resumed
+        return sqlalchemy.select([listings.c[column] for column in columns]).where(
+            sqlalchemy.and_(*conditions)
+        ).order_by(listings.c.id)
+
+    @staticmethod
+    def _json_default(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return str(value)
+
+    def _csv_value(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, (list, dict)):
+            return json.dumps(value, ensure_ascii=False)
+        return value
+
+    def _encode(self, rows: List[Dict], columns: List[str], fmt: str, header: bool) -> bytes:
+        if fmt == 'ndjson':
+            return ''.join(
+                json.dumps(row, default=self._json_default, ensure_ascii=False) + '\n'
+                for row in rows
+            ).encode('utf-8')
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if header:
+            writer.writerow(columns)
+        writer.writerows([self._csv_value(row[column]) for column in columns] for row in rows)
+        return buffer.getvalue().encode('utf-8')
+
+    async def stream(self, query, columns: List[str], fmt: str = 'ndjson', compress: bool = False) -> AsyncIterator[bytes]:
+        """
+        Yield the export as byte chunks
+
+        Args:
+            query: From `build_query`
+            columns: Column names, in output order
+            fmt: 'ndjson' or 'csv'
+            compress: gzip the stream
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+
+        # wbits 16+: gzip container, readable by gunzip / pandas
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+        header = fmt == 'csv'
+        chunk = []
+
+        def emit(data: bytes) -> bytes:
+            return compressor.compress(data) if compressor else data
+
+        async for row in database.iterate(query):
+            chunk.append({column: row[column] for column in columns})
+            if len(chunk) >= self.CHUNK_ROWS:
+                data = emit(self._encode(chunk, columns, fmt, header))
+                header = False
+                chunk = []
+                if data:
+                    yield data
+
+        if chunk or header:
+            data = emit(self._encode(chunk, columns, fmt, header))
+            if data:
+                yield data
+        if compressor:
+            yield compressor.flush()
+
+
+# Global instance
+listing_exporter = ListingExporter()
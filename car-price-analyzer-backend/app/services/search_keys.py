@@ -0,0 +1,85 @@
+"""
+Search Keys - Normalized brand/series/variant keys for listings
+Computed once at ingest (ScraperService) and stored in indexed columns, so
+read paths look listings up by equality instead of LOWER()/ILIKE '%x%'
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.config.major_manufacturers import BRAND_ALIASES
+from app.config.model_series import MODEL_SERIES_PATTERNS
+
+
+class SearchKeyNormalizer:
+    """
+    Maps free-text brand, model and variant names to stable keys
+
+    - marca_key: alias-resolved brand, lowercase, without spaces or hyphens
+      ('Mercedes', 'mercedes-benz' -> 'mercedesbenz'; same as the catalog
+      brand values)
+    - series_key: catalog series from MODEL_SERIES_PATTERNS when one
+      matches ('320d', 'Seria 3' -> 'seria 3'), else the lowercased name
+    - variant_key: lowercased performance variant ('M Sport' -> 'm sport')
+    """
+
+    def __init__(self):
+        # marca_key -> [(series key, compiled patterns)], in pattern order
+        self._series_patterns: Dict[str, List[Tuple[str, List[re.Pattern]]]] = {}
+        for brand, series in MODEL_SERIES_PATTERNS.items():
+            self._series_patterns[self.marca_key(brand)] = [
+                (
+                    name.lower(),
+                    # Whole numbers only: '3\d{2}' must not match inside '2013'
+                    # (either end), letter suffixes stay allowed ('320d')
+                    [re.compile(rf'(?<![a-z0-9]){pattern}(?!\d)') for pattern in patterns]
+                )
+                for name, patterns in series.items()
+            ]
+
+    @staticmethod
+    def _clean(text: Optional[str]) -> str:
+        """Lowercase with single spaces"""
+        return ' '.join((text or '').lower().split())
+
+    def marca_key(self, marca: Optional[str]) -> Optional[str]:
+        cleaned = self._clean(marca)
+        if not cleaned:
+            return None
+        cleaned = BRAND_ALIASES.get(cleaned, cleaned)
+        return cleaned.replace('-', '').replace(' ', '')
+
+    def series_key(self, marca: Optional[str], model_series: Optional[str], model: Optional[str] = None) -> Optional[str]:
+        """
+        Series key of a listing (or of a search term, passed as model_series)
+
+        The stored series wins over the model name; pattern matches win over
+        the raw text.
+        """
+        candidates = [text for text in (self._clean(model_series), self._clean(model)) if text]
+        if not candidates:
+            return None
+
+        patterns = self._series_patterns.get(self.marca_key(marca), [])
+        for text in candidates:
+            for name, compiled in patterns:
+                if text == name:
+                    return name
+            for name, compiled in patterns:
+                if any(pattern.search(text) for pattern in compiled):
+                    return name
+        return candidates[0]
+
+    def variant_key(self, model_variant: Optional[str]) -> Optional[str]:
+        return self._clean(model_variant) or None
+
+    def listing_keys(self, listing: Dict) -> Dict:
+        """The three key columns for a listing row"""
+        return {
+            'marca_key': self.marca_key(listing.get('marca')),
+            'series_key': self.series_key(listing.get('marca'), listing.get('model_series'), listing.get('model')),
+            'variant_key': self.variant_key(listing.get('model_variant')),
+        }
+
+
+# Global instance
+search_keys = SearchKeyNormalizer()
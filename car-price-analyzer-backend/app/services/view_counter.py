@@ -0,0 +1,132 @@
+"""
+View Counter - Write-behind buffer for listing view counts
+Detail reads only bump an in-memory counter; increments are aggregated per
+listing and written in one batched UPDATE on a timer or size threshold
+"""
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from app.database import database
+
+
+class ViewCounter:
+    """
+    Buffers `listings.vizualizari` increments
+
+    - `increment` is synchronous and never touches the database
+    - `flush` writes everything buffered with UPDATE ... FROM (VALUES ...),
+      MAX_BATCH listings per statement; a failed batch goes back to the buffer
+    - Counts being flushed stay visible to `views` until written, so readers
+      that merge them (GET /listings/popular) never see a count drop
+    - `stop` flushes what is left (API shutdown)
+    """
+
+    FLUSH_INTERVAL_SECONDS = 5
+    FLUSH_THRESHOLD = 1000  # Buffered views that trigger an early flush
+    MAX_BATCH = 1000        # Listings per UPDATE (2 parameters each)
+
+    def __init__(self):
+        self._pending: Dict[int, int] = {}
+        self._flushing: Dict[int, int] = {}
+        self._pending_total = 0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Task] = None
+
+    def increment(self, listing_id: int):
+        """Count one view"""
+        self._pending[listing_id] = self._pending.get(listing_id, 0) + 1
+        self._pending_total += 1
+        if self._pending_total >= self.FLUSH_THRESHOLD and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.create_task(self.flush())
+
+    def views(self, listing_id: int) -> int:
+        """Views of a listing not yet written to the database"""
+        return self._pending.get(listing_id, 0) + self._flushing.get(listing_id, 0)
+
+    def buffered_ids(self) -> List[int]:
+        return list(set(self._pending) | set(self._flushing))
+
+    def merge(self, rows: Iterable[Dict]) -> List[Dict]:
+        """Listing dicts with buffered views added to `vizualizari`"""
+        merged = []
+        for row in rows:
+            row = dict(row)
+            row['vizualizari'] = (row.get('vizualizari') or 0) + self.views(row['id'])
+            merged.append(row)
+        return merged
+
+    async def flush(self) -> int:
+        """
+        Write buffered views
+
+        Returns:
+            Number of views written
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            self._flushing, self._pending = self._pending, {}
+            self._pending_total = 0
+
+            written = 0
+            items = sorted(self._flushing.items())
+            for start in range(0, len(items), self.MAX_BATCH):
+                batch = items[start:start + self.MAX_BATCH]
+                values = ", ".join(
+                    f"(CAST(:id{i} AS INTEGER), CAST(:n{i} AS INTEGER))" for i in range(len(batch))
+                )
+                params = {}
+                for i, (listing_id, views) in enumerate(batch):
+                    params[f"id{i}"] = listing_id
+                    params[f"n{i}"] = views
+                try:
+                    await database.execute(
+                        f"""
+                        UPDATE listings AS l
+                        SET vizualizari = COALESCE(l.vizualizari, 0) + v.n
+                        FROM (VALUES {values}) AS v(id, n)
+                        WHERE l.id = v.id
+                        """,
+                        params
+                    )
+                except Exception as e:
+                    print(f"Error flushing {len(batch)} view counts: {e}")
+                    # Keep them for the next flush
+                    for listing_id, views in batch:
+                        self._pending[listing_id] = self._pending.get(listing_id, 0) + views
+                        self._pending_total += views
+                else:
+                    written += sum(views for _, views in batch)
+                for listing_id, _ in batch:
+                    del self._flushing[listing_id]
+
+            return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL_SECONDS)
+            # Shielded: cancelling the loop must not abort a flush midway
+            await asyncio.shield(self.flush())
+
+    def start(self):
+        """Start the periodic flush (API startup)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the periodic flush and write what is left (API shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        if written:
+            print(f"Flushed {written} buffered listing views")
+
+
+# Global instance
+view_counter = ViewCounter()
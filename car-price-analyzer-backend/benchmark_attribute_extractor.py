@@ -0,0 +1,183 @@
+"""
+Benchmark Attribute Extractor - per-field extract_* methods vs single pass
+Runs both over a corpus of OLX card texts, reports every disagreement,
+then times them. Titles like "2015 180000 km" are expected to differ on km:
+the legacy km regex glues the year to the mileage and gives up (km=0)
+
+Usage:
+    python benchmark_attribute_extractor.py                               # fixtures/olx_listing_texts.tsv
+    python benchmark_attribute_extractor.py my_cards.tsv                  # title<TAB>card text per line
+"""
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+from app.scrapers.detailed_olx_scraper import DetailedOLXScraper
+
+ROUNDS = 200
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), 'fixtures', 'olx_listing_texts.tsv')
+
+
+class LegacyExtractor:
+    """The original DetailedOLXScraper._extract_* methods, one pass per field"""
+
+    def extract(self, title: str, text: str, model_series: Optional[str]) -> Dict:
+        return {
+            'an': self._extract_year(title, text),
+            'km': self._extract_km(title, text),
+            'putere_cp': self._extract_power(title, text),
+            'capacitate_cilindrica': self._extract_engine_capacity(title, text),
+            'combustibil': self._extract_fuel_type(title, text),
+            'transmisie': self._extract_transmission(title, text),
+            'tractiune': self._extract_drivetrain(title, text),
+            'caroserie': self._extract_body_type(title, text, model_series),
+        }
+
+    def _extract_power(self, title: str, text: str) -> Optional[int]:
+        for pattern in [r'(\d{2,3})\s*cp', r'(\d{2,3})\s*cai', r'(\d{2,3})\s*hp']:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                power = int(match.group(1))
+                if 50 <= power <= 1000:
+                    return power
+        return None
+
+    def _extract_engine_capacity(self, title: str, text: str) -> Optional[int]:
+        for pattern in [r'(\d\.\d)\s*l', r'(\d\.\d)\s*tdi', r'(\d\.\d)\s*tsi']:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return int(float(match.group(1)) * 1000)
+        match = re.search(r'(\d{3,4})\s*cm', text, re.IGNORECASE)
+        if match:
+            return int(match.group(1))
+        return None
+
+    def _extract_transmission(self, title: str, text: str) -> str:
+        text_lower = text.lower()
+        if any(kw in text_lower for kw in ['automat', 'automata', 'dsg', 'cvt', 'tiptronic', 'steptronic', 's-tronic']):
+            return 'automata'
+        if any(kw in text_lower for kw in ['manual', 'manuala', 'cutie manuala']):
+            return 'manuala'
+        return 'unknown'
+
+    def _extract_drivetrain(self, title: str, text: str) -> str:
+        text_lower = text.lower()
+        if any(kw in text_lower for kw in ['4x4', '4wd', 'awd', 'quattro', 'xdrive', '4motion', '4matic']):
+            return '4x4'
+        if any(kw in text_lower for kw in ['rwd', 'propulsie', 'spate']):
+            return 'spate'
+        return 'fata'
+
+    def _extract_body_type(self, title: str, text: str, model_series: str) -> str:
+        text_lower = text.lower()
+        suv_models = ['x1', 'x2', 'x3', 'x4', 'x5', 'x6', 'x7', 'q3', 'q5', 'q7', 'q8',
+                      'gle', 'glc', 'gla', 'tiguan', 'touareg', 'cayenne', 'macan']
+        if any(kw in text_lower for kw in ['suv', 'crossover', 'off-road', 'offroad']):
+            return 'suv'
+        if model_series and any(mdl in model_series.lower() for mdl in suv_models):
+            return 'suv'
+        if 'coupe' in text_lower or 'coupé' in text_lower:
+            return 'coupe'
+        if any(kw in text_lower for kw in ['cabrio', 'cabriolet', 'convertible', 'descapotabil']):
+            return 'cabrio'
+        if any(kw in text_lower for kw in ['break', 'combi', 'touring', 'avant', 'estate', 'wagon']):
+            return 'break'
+        if any(kw in text_lower for kw in ['sedan', 'limuzina', 'berlina']):
+            return 'sedan'
+        return 'hatchback'
+
+    def _extract_year(self, title: str, text: str) -> Optional[int]:
+        for source in [title, text]:
+            match = re.search(r'\b(19\d{2}|20[0-2]\d)\b', source)
+            if match:
+                year = int(match.group(1))
+                if 1990 <= year <= 2025:
+                    return year
+        return None
+
+    def _extract_km(self, title: str, text: str) -> int:
+        for source in [title, text]:
+            match = re.search(r'(\d+)[.\s]?(\d+)?\s*(km|mii\s*km)', source, re.IGNORECASE)
+            if match:
+                km = int(match.group(1) + (match.group(2) or ''))
+                if 'mii' in match.group(3).lower():
+                    km *= 1000
+                if 0 <= km <= 1000000:
+                    return km
+        return 0
+
+    def _extract_fuel_type(self, title: str, text: str) -> str:
+        text_lower = (title + ' ' + text).lower()
+        if 'diesel' in text_lower or 'motorina' in text_lower:
+            return 'diesel'
+        elif 'benzina' in text_lower or 'petrol' in text_lower:
+            return 'benzina'
+        elif 'electric' in text_lower:
+            return 'electric'
+        elif 'hybrid' in text_lower or 'hibrid' in text_lower:
+            return 'hybrid'
+        elif 'gpl' in text_lower or 'lpg' in text_lower:
+            return 'gpl'
+        return 'benzina'
+
+
+def load_corpus(path: str) -> List[Tuple[str, str, Optional[str]]]:
+    """(title, card text, model series) per listing"""
+    scraper = DetailedOLXScraper()
+    corpus = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            title, _, text = line.partition('\t')
+            marca = title.split()[0]
+            model_series, _ = scraper._extract_model_details(title, marca, None)
+            corpus.append((title, text or title, model_series))
+    return corpus
+
+
+def time_extractor(extract, corpus) -> float:
+    """Seconds per listing"""
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for title, text, model_series in corpus:
+            extract(title, text, model_series)
+    return (time.perf_counter() - start) / (ROUNDS * len(corpus))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CORPUS
+    corpus = load_corpus(path)
+
+    print(f"\n=== Attribute Extractor Benchmark ({os.path.basename(path)}, {len(corpus)} listings) ===\n")
+
+    legacy = LegacyExtractor()
+    mismatches = 0
+    for title, text, model_series in corpus:
+        expected = legacy.extract(title, text, model_series)
+        actual = listing_attribute_extractor.extract(title, text, model_series)
+        if expected != actual:
+            mismatches += 1
+            diff = {k: (expected[k], actual[k]) for k in expected if expected[k] != actual[k]}
+            print(f"[DIFF] {title}\n       (legacy, single pass): {diff}")
+
+    if mismatches:
+        print(f"\n[WARN] {mismatches}/{len(corpus)} listings differ\n")
+    else:
+        print(f"[OK] {len(corpus)} listings, identical attributes from both extractors")
+
+    legacy_time = time_extractor(legacy.extract, corpus)
+    fast_time = time_extractor(listing_attribute_extractor.extract, corpus)
+
+    print(f"extract_* methods: {legacy_time * 1e6:7.1f} us/listing")
+    print(f"single pass:       {fast_time * 1e6:7.1f} us/listing")
+    print(f"Speedup:           {legacy_time / fast_time:7.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
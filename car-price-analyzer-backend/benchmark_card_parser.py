@@ -0,0 +1,192 @@
+"""
+Benchmark Card Parser - html.parser vs lxml backend vs embedded JSON state
+Checks that both DOM backends produce identical listing dicts, then times them
+together with the JSON-state path of DetailedOLXScraper._parse_search_page
+
+Usage:
+    python benchmark_card_parser.py                  # synthetic OLX-like page
+    python benchmark_card_parser.py olx_debug.html   # saved page (see debug_olx_html.py)
+"""
+import json
+import random
+import sys
+import time
+
+from app.scrapers.card_parser import ListingCardParser
+from app.scrapers.detailed_olx_scraper import DetailedOLXScraper
+from app.scrapers.olx_filtered_scraper import OLXFilteredScraper
+from app.scrapers.olx_scraper import OLXScraper
+from app.scrapers.olx_state import olx_state_parser
+
+ROUNDS = 20
+
+TITLES = [
+    "BMW 320d M Sport 2016 automata xDrive",
+    "BMW Seria 3 318d 2014 manuala 190.000 km",
+    "BMW 530d Touring 2017 258 CP",
+    "Volkswagen Golf 7 GTI 2.0 TSI DSG 2015",
+    "VW Golf 6 1.6 TDI 2011 combi",
+    "Mercedes-Benz C 220 CDI AMG Line 2018",
+    "Audi A4 Avant 2.0 TDI quattro S-tronic 2016",
+    "Dacia Logan 1.5 dCi 2019 benzina+gpl",
+    "Jante BMW R18 originale",
+    "Skoda Octavia 3 RS 2017 2.0 TDI 184 cp",
+]
+
+CITIES = ["Bucuresti, Sector 3", "Cluj-Napoca", "Iasi", "Timisoara", "Brasov"]
+
+
+def build_synthetic_page(n_cards: int = 50) -> str:
+    """Build an OLX-like search page: heavy chrome + embedded state + cards"""
+    rng = random.Random(42)
+
+    cards = []
+    ads = []
+    for i in range(n_cards):
+        title = rng.choice(TITLES)
+        price = rng.randint(3500, 45000)
+        year = rng.randint(2008, 2023)
+        km = rng.randint(10, 300) * 1000
+        city = rng.choice(CITIES)
+        ads.append({
+            'id': 100000 + i,
+            'url': f"https://www.olx.ro/d/oferta/anunt-ID{i:06d}.html",
+            'title': title,
+            'description': 'Masina in stare foarte buna, revizii la zi. ' * 20,
+            'createdTime': '2024-11-20T10:00:00+02:00',
+            'price': {'displayValue': f"{price} €", 'regularPrice': {'value': price, 'currencyCode': 'EUR'}},
+            'params': [
+                {'key': 'year', 'name': 'An de fabricatie', 'value': str(year), 'normalizedValue': str(year)},
+                {'key': 'rulaj_pana', 'name': 'Rulaj', 'value': f"{km} km", 'normalizedValue': str(km)},
+                {'key': 'petrol', 'name': 'Combustibil', 'value': 'Diesel', 'normalizedValue': 'diesel'},
+                {'key': 'gearbox', 'name': 'Cutie de viteze', 'value': 'Manuala', 'normalizedValue': 'manual'},
+                {'key': 'car_body', 'name': 'Caroserie', 'value': 'Sedan', 'normalizedValue': 'sedan'},
+            ],
+            'location': {'cityName': city.split(',')[0], 'regionName': 'Romania'},
+            'photos': [{'link': f"https://img.olx.ro/{i}/{j}.jpg"} for j in range(8)],
+        })
+        cards.append(f"""
+<div data-cy="l-card" data-testid="l-card" id="{100000 + i}" class="css-1sw7q4x">
+  <div type="list" class="css-qfzx1y">
+    <a class="css-rc5s2u" href="/d/oferta/anunt-ID{i:06d}.html">
+      <div class="css-1venxj6"><div class="css-gl6djm"><img src="https://img.olx.ro/{i}.jpg" alt="{title}" class="css-8wsg1m"></div></div>
+      <div class="css-u2ayx9">
+        <h6 class="css-16v5mdi">{title}</h6>
+        <p data-testid="ad-price" class="css-10b0gli">{price:,} €<span class="css-1vxklie">Negociabil</span></p>
+      </div>
+      <div class="css-odp1qd">
+        <p data-testid="location-date" class="css-veheph">{city} - Reactualizat Azi la 10:{i % 60:02d}</p>
+        <div class="css-1kfqt7f"><span class="css-643j0o">{year} - {km:,} km</span></div>
+      </div>
+    </a>
+  </div>
+</div>""".replace(',', '.'))
+
+    chrome = ''.join(
+        f'<div class="css-nav{i}"><ul>' + ''.join(
+            f'<li><a href="/cat/{i}/{j}">Categorie {i}.{j}</a></li>' for j in range(20)
+        ) + '</ul></div>'
+        for i in range(60)
+    )
+    state = json.dumps({'listing': {'listing': {'ads': ads, 'totalElements': n_cards}}})
+    state_script = f'<script>window.__PRERENDERED_STATE__= {json.dumps(state)};</script>'
+
+    return (
+        '<!DOCTYPE html><html lang="ro"><head><meta charset="utf-8"><title>OLX</title>'
+        f'{state_script}</head>'
+        f'<body><header>{chrome}</header><main><div data-testid="listing-grid">{"".join(cards)}</div></main>'
+        f'<footer>{chrome}</footer></body></html>'
+    )
+
+
+def parse_all(parser: ListingCardParser, html: str):
+    """Parse cards and run every scraper's card parser over them"""
+    cards = parser.parse_cards(html)
+    detailed, filtered, simple = DetailedOLXScraper(), OLXFilteredScraper(), OLXScraper()
+    filters = {'year_from': 2010}
+
+    results = []
+    for card in cards:
+        results.append((
+            detailed._parse_listing_card(card, 'BMW', None),
+            filtered._parse_listing_card(card, 'BMW', 'Seria 3', filters),
+            simple._parse_listing_card(card, 'BMW', None),
+        ))
+    return results
+
+
+def strip_timestamps(results):
+    """data_publicare is datetime.now() - not comparable between runs"""
+    clean = []
+    for row in results:
+        clean.append(tuple(
+            {k: v for k, v in listing.items() if k != 'data_publicare'} if listing else None
+            for listing in row
+        ))
+    return clean
+
+
+def time_backend(parser: ListingCardParser, html: str) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        parse_all(parser, html)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            html = f.read()
+        source = sys.argv[1]
+    else:
+        html = build_synthetic_page()
+        source = 'synthetic page'
+
+    print(f"\n=== Card Parser Benchmark ({source}, {len(html) / 1024:.0f} KB) ===\n")
+
+    baseline = ListingCardParser('html.parser')
+    fast = ListingCardParser('lxml')
+
+    expected = strip_timestamps(parse_all(baseline, html))
+    actual = strip_timestamps(parse_all(fast, html))
+
+    if expected != actual:
+        print("[ERROR] Backends disagree!")
+        for i, (a, b) in enumerate(zip(expected, actual)):
+            if a != b:
+                print(f"Card {i}:\n  html.parser: {a}\n  lxml:        {b}")
+        sys.exit(1)
+
+    print(f"[OK] {len(expected)} cards, identical listing dicts from both backends")
+
+    slow_time = time_backend(baseline, html)
+    fast_time = time_backend(fast, html)
+
+    print(f"html.parser: {slow_time * 1000:8.1f} ms/page")
+    print(f"lxml:        {fast_time * 1000:8.1f} ms/page")
+    print(f"Speedup:     {slow_time / fast_time:8.1f}x\n")
+
+    state_time = time_state(html)
+    if state_time is None:
+        print("No embedded JSON state on this page - DOM path only\n")
+        return
+
+    print(f"JSON state:  {state_time * 1000:8.1f} ms/page (DetailedOLXScraper._parse_search_page)")
+    print(f"vs html.parser: {slow_time / state_time:5.1f}x, vs lxml: {fast_time / state_time:5.1f}x\n")
+
+
+def time_state(html: str):
+    """Time the JSON-state path; None if the page has no usable state"""
+    ads = olx_state_parser.parse_ads(html)
+    if ads is None:
+        return None
+
+    scraper = DetailedOLXScraper()
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        scraper._parse_search_page(html, 'BMW', None)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Benchmark Listing Indexes - hot listing queries with and without the search indexes
+Fills a scratch copy of `listings` with synthetic rows, then runs the
+predicates used by the market stats refresh, the catalog, the flexible
+analyzer, trigram matches and GET /listings before and after building the indexes declared
+in app/database.py; prints each plan and median latency
+
+Usage:
+    python benchmark_listing_indexes.py                  # 1M rows
+    python benchmark_listing_indexes.py 200000 --keep    # keep listings_bench afterwards
+"""
+import statistics
+import sys
+import time
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.database import engine, listings
+
+DEFAULT_ROWS = 1_000_000
+ROUNDS = 20
+BENCH_TABLE = "listings_bench"
+
+# Same shape as the real data: a few big brands, many series per brand
+BRANDS = ['BMW', 'Volkswagen', 'Audi', 'Mercedes-Benz', 'Dacia', 'Skoda', 'Ford', 'Renault', 'Opel', 'Toyota']
+SERIES_PER_BRAND = 12
+
+QUERIES = {
+    'market_stats segment': (
+        f"""
+        SELECT an, km, pret FROM {BENCH_TABLE}
+        WHERE este_activ = true
+            AND marca_key = :marca_key AND COALESCE(series_key, '') = :series_key
+            AND an BETWEEN 2015 AND 2018 AND km BETWEEN 100000 AND 150000
+        """,
+        {'marca_key': 'bmw', 'series_key': 'seria 3'},
+    ),
+    'catalog year range': (
+        f"""
+        SELECT MIN(an), MAX(an) FROM {BENCH_TABLE}
+        WHERE marca_key = :marca_key AND series_key = :series_key
+            AND este_activ = true AND an IS NOT NULL
+        """,
+        {'marca_key': 'bmw', 'series_key': 'seria 3'},
+    ),
+    'flexible exact match': (
+        f"""
+        SELECT pret FROM {BENCH_TABLE}
+        WHERE marca_key = :marca_key AND series_key = :series_key
+            AND an BETWEEN 2016 AND 2018 AND km BETWEEN 100000 AND 140000
+            AND este_activ = true
+        """,
+        {'marca_key': 'bmw', 'series_key': 'seria 3'},
+    ),
+    'fuzzy model match': (
+        f"""
+        SELECT COUNT(*) FROM {BENCH_TABLE}
+        WHERE marca ILIKE :marca AND model ILIKE :model AND este_activ = true
+        """,
+        {'marca': '%bmw%', 'model': '%seria 3 320d%'},
+    ),
+    'listings by model': (
+        f"""
+        SELECT id, url, pret, an, km FROM {BENCH_TABLE}
+        WHERE marca = :marca AND model = :model AND este_activ = true
+        ORDER BY pret LIMIT 50
+        """,
+        {'marca': 'BMW', 'model': 'Seria 3 320d'},
+    ),
+}
+
+
+def create_bench_table(connection, rows: int):
+    connection.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS {BENCH_TABLE}"))
+    connection.execute(sqlalchemy.text(
+        f"CREATE TABLE {BENCH_TABLE} (LIKE listings INCLUDING DEFAULTS)"
+    ))
+    brands = "ARRAY[" + ", ".join(f"'{brand}'" for brand in BRANDS) + "]"
+    connection.execute(sqlalchemy.text(f"""
+        INSERT INTO {BENCH_TABLE}
+            (id, source, url, marca, model, model_series, an, km, pret, este_activ, data_scrape)
+        SELECT
+            g,
+            'bench',
+            'https://www.olx.ro/d/oferta/bench-' || g,
+            brand,
+            CASE WHEN brand = 'BMW' THEN 'Seria ' ELSE 'Model ' END
+                || (g / {len(BRANDS)}) % {SERIES_PER_BRAND}
+                || CASE WHEN g % 3 = 0 THEN ' 320d' ELSE ' ' || (g % 7) END,
+            CASE WHEN brand = 'BMW' THEN 'Seria ' ELSE 'Model ' END || (g / {len(BRANDS)}) % {SERIES_PER_BRAND},
+            2005 + g % 20,
+            (g * 7919) % 350000,
+            2000 + (g * 104729) % 60000,
+            g % 10 <> 0,
+            now() - (g % 72) * interval '1 hour'
+        FROM generate_series(1, :rows) AS g,
+            LATERAL (SELECT ({brands})[1 + g % {len(BRANDS)}] AS brand) b
+    """), {'rows': rows})
+    # Keys as ScraperService writes them (synthetic names need no aliases)
+    connection.execute(sqlalchemy.text(f"""
+        UPDATE {BENCH_TABLE}
+        SET marca_key = LOWER(REPLACE(marca, '-', '')), series_key = LOWER(model_series)
+    """))
+    connection.execute(sqlalchemy.text(f"ANALYZE {BENCH_TABLE}"))
+
+
+def create_bench_indexes(connection):
+    """The indexes declared on listings, built on the scratch table"""
+    connection.execute(sqlalchemy.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for index in listings.indexes:
+        sql = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+        sql = sql.replace(f"INDEX {index.name} ON listings", f"INDEX bench_{index.name} ON {BENCH_TABLE}", 1)
+        start = time.perf_counter()
+        connection.execute(sqlalchemy.text(sql))
+        print(f"  built {index.name} in {time.perf_counter() - start:.1f}s")
+    connection.execute(sqlalchemy.text(f"ANALYZE {BENCH_TABLE}"))
+
+
+def run_queries(connection) -> dict:
+    """Median latency (ms) per query, printing each plan"""
+    timings = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = connection.execute(sqlalchemy.text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}"), params)
+        print(f"\n--- {name} ---")
+        for row in plan:
+            print(f"  {row[0]}")
+
+        samples = []
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            connection.execute(sqlalchemy.text(sql), params).fetchall()
+            samples.append((time.perf_counter() - start) * 1000)
+        timings[name] = statistics.median(samples)
+    return timings
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    rows = int(args[0]) if args else DEFAULT_ROWS
+    keep = '--keep' in sys.argv
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        print(f"Filling {BENCH_TABLE} with {rows:,} rows...")
+        start = time.perf_counter()
+        create_bench_table(connection, rows)
+        print(f"  done in {time.perf_counter() - start:.1f}s")
+
+        print("\n=== Without indexes ===")
+        before = run_queries(connection)
+
+        print("\n=== Building indexes ===")
+        create_bench_indexes(connection)
+
+        print("\n=== With indexes ===")
+        after = run_queries(connection)
+
+        if not keep:
+            connection.execute(sqlalchemy.text(f"DROP TABLE {BENCH_TABLE}"))
+
+    print(f"\n{'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        speedup = before[name] / after[name] if after[name] else float('inf')
+        print(f"{name:<24}{before[name]:>12.2f}{after[name]:>12.2f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
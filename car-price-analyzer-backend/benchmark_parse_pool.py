@@ -0,0 +1,78 @@
+"""
+Benchmark Parse Pool - event loop responsiveness while pages are parsed
+Parses a batch of search pages inline, in a thread pool and in a process
+pool while a heartbeat task measures how late the event loop wakes it up
+(what an API request would wait during a scrape)
+
+Usage:
+    python benchmark_parse_pool.py                  # synthetic OLX-like pages, DOM path
+    python benchmark_parse_pool.py olx_debug.html   # saved page (see debug_olx_html.py)
+"""
+import asyncio
+import sys
+import time
+
+from app.scrapers.detailed_olx_scraper import parse_search_page
+from app.scrapers.olx_state import OLXStateParser
+from app.scrapers.parse_pool import ParsePool
+from benchmark_card_parser import build_synthetic_page
+
+PAGES = 24
+HEARTBEAT = 0.005  # seconds
+
+
+async def heartbeat(lags: list, stop: asyncio.Event):
+    """Sleep HEARTBEAT seconds in a loop, record how late each wake-up is"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(HEARTBEAT)
+        lags.append(loop.time() - start - HEARTBEAT)
+
+
+async def run_mode(mode: str, html: str) -> tuple:
+    """(total seconds, max loop lag, p95 loop lag, listings) for one mode"""
+    pool = ParsePool(mode=mode)
+    # Warm up: worker processes start and import the scrapers
+    await pool.parse(parse_search_page, html, 'BMW', None)
+
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(lags, stop))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        pool.parse(parse_search_page, html, 'BMW', None) for _ in range(PAGES)
+    ))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await beat
+    pool.shutdown()
+
+    lags.sort()
+    p95 = lags[int(len(lags) * 0.95)] if lags else 0.0
+    return elapsed, (lags[-1] if lags else 0.0), p95, sum(len(r) for r in results)
+
+
+async def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            html = f.read()
+        source = sys.argv[1]
+    else:
+        # Drop the embedded state so the pages take the (slow) DOM path
+        html = build_synthetic_page().replace(OLXStateParser.STATE_MARKER, 'window.__NO_STATE__')
+        source = 'synthetic page'
+
+    print(f"\n=== Parse Pool Benchmark ({source}, {PAGES} pages of {len(html) / 1024:.0f} KB) ===\n")
+    print(f"{'mode':8s} {'total':>9s} {'max lag':>10s} {'p95 lag':>10s} {'listings':>9s}")
+
+    for mode in ParsePool.MODES[::-1]:
+        elapsed, max_lag, p95, count = await run_mode(mode, html)
+        print(f"{mode:8s} {elapsed:8.2f}s {max_lag * 1000:8.1f}ms {p95 * 1000:8.1f}ms {count:9d}")
+    print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+"""
+Benchmark Part Filter - substring keyword loop vs compiled CarPartFilter
+Scores both against labelled titles, lists every title they disagree on,
+then times the old loop, is_car_part() and the page-level classify() the
+scrapers use (is_car_part() is for one-off titles and slower than the loop)
+
+Usage:
+    python benchmark_part_filter.py                      # fixtures/olx_part_titles.tsv
+    python benchmark_part_filter.py my_titles.tsv        # label<TAB>title, label = part|car
+"""
+import os
+import re
+import sys
+import time
+from typing import List, Tuple
+
+from app.scrapers.part_filter import car_part_filter
+
+ROUNDS = 500
+PAGE_SIZE = 50  # cards per OLX search page
+PARTS_PER_PAGE = 2
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'olx_part_titles.tsv')
+
+
+def legacy_is_car_part(title: str) -> bool:
+    """The original DetailedOLXScraper._is_car_part"""
+    title_lower = title.lower()
+    parts_keywords = [
+        'jante', 'janta', 'roata', 'roti', 'anvelope',
+        'stopuri', 'stop', 'faruri', 'far', 'oglinda',
+        'bara', 'portiera', 'capota', 'haion',
+        'volant', 'scaune', 'bord',
+        'motor', 'cutie viteze', 'turbo', 'alternator',
+        'carcasa', 'deflector', 'senzori',
+        'perna', 'amortizor', 'suspensie',
+        'radiator', 'intercooler', 'toba',
+        'filtru', 'curea', 'ulei'
+    ]
+
+    for keyword in parts_keywords:
+        if keyword in title_lower:
+            if any(word in title_lower for word in ['vand ', 'schimb', 'urgent', 'full']):
+                has_year = re.search(r'\b20\d{2}\b', title)
+                has_km = re.search(r'\d+\s*km', title_lower)
+                if has_year and has_km and len(title.split()) > 6:
+                    return False
+            return True
+
+    return False
+
+
+def load_fixtures(path: str) -> List[Tuple[bool, str]]:
+    """(is_part, title) per labelled line"""
+    fixtures = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            label, _, title = line.partition('\t')
+            fixtures.append((label.strip() == 'part', title))
+    return fixtures
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURES
+    fixtures = load_fixtures(path)
+    titles = [title for _, title in fixtures]
+
+    print(f"\n=== Car Part Filter Benchmark ({os.path.basename(path)}, {len(fixtures)} titles) ===\n")
+
+    legacy = [legacy_is_car_part(title) for title in titles]
+    single = [car_part_filter.is_car_part(title) for title in titles]
+    batch = car_part_filter.classify(titles)
+
+    if single != batch:
+        print("[ERROR] is_car_part() and classify() disagree!")
+        sys.exit(1)
+
+    regressions = 0
+    for (is_part, title), old, new in zip(fixtures, legacy, single):
+        if old == new:
+            continue
+        label = 'part' if is_part else 'car'
+        if new == is_part:
+            print(f"[FIXED]      {label:4s} {title}")
+        else:
+            regressions += 1
+            print(f"[REGRESSION] {label:4s} {title}")
+
+    legacy_correct = sum(old == is_part for (is_part, _), old in zip(fixtures, legacy))
+    new_correct = sum(new == is_part for (is_part, _), new in zip(fixtures, single))
+    print(f"\nSubstring loop:  {legacy_correct}/{len(fixtures)} correct")
+    print(f"CarPartFilter:   {new_correct}/{len(fixtures)} correct")
+
+    # A typical search page: cars, with a couple of parts mixed in
+    cars = [title for is_part, title in fixtures if not is_part]
+    parts = [title for is_part, title in fixtures if is_part]
+    page = (cars * (PAGE_SIZE // max(len(cars), 1) + 1))[:PAGE_SIZE - PARTS_PER_PAGE] + parts[:PARTS_PER_PAGE]
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for title in page:
+            legacy_is_car_part(title)
+    legacy_time = (time.perf_counter() - start) / ROUNDS
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for title in page:
+            car_part_filter.is_car_part(title)
+    single_time = (time.perf_counter() - start) / ROUNDS
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        car_part_filter.classify(page)
+    batch_time = (time.perf_counter() - start) / ROUNDS
+
+    print(f"\nPer page of {PAGE_SIZE} titles ({PARTS_PER_PAGE} parts):")
+    print(f"substring loop:  {legacy_time * 1e6:8.1f} us")
+    print(f"is_car_part():   {single_time * 1e6:8.1f} us ({legacy_time / single_time:.1f}x)")
+    print(f"classify():      {batch_time * 1e6:8.1f} us ({legacy_time / batch_time:.1f}x)\n")
+
+    if regressions:
+        print(f"[ERROR] {regressions} titles the substring loop got right are now wrong")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Build Market Stats - Create (or upgrade) and fill the market_stats table
+Run once after deploying or upgrading, or after bulk edits made outside
+ScraperService; scrapes keep the table current on their own
+
+Usage:
+    python build_market_stats.py
+"""
+import asyncio
+import time
+
+from app.analysis.market_stats import market_stats_cube
+from app.database import database, engine, market_stats
+
+
+async def build():
+    print("\n=== Building Market Stats ===\n")
+
+    market_stats.create(engine, checkfirst=True)
+    print("[OK] market_stats table")
+
+    await database.connect()
+    try:
+        # Freshness moved from a count taken at refresh time to scrape-hour buckets
+        await database.execute("ALTER TABLE market_stats ADD COLUMN IF NOT EXISTS fresh_hours JSON")
+        await database.execute("ALTER TABLE market_stats DROP COLUMN IF EXISTS fresh_count")
+        print("[OK] market_stats columns")
+
+        start = time.perf_counter()
+        cells = await market_stats_cube.refresh_all()
+        print(f"[OK] {cells} cells in {time.perf_counter() - start:.1f}s")
+    finally:
+        await database.disconnect()
+
+    print("\n[SUCCESS] Market stats ready!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(build())
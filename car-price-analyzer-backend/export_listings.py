@@ -0,0 +1,64 @@
+"""
+Export Listings - Dump listings to NDJSON or CSV for offline modelling
+Streams from a server-side cursor with constant memory (same exporter as
+GET /api/listings/export); output ending in .gz is gzip-compressed
+
+Usage:
+    python export_listings.py listings.ndjson.gz
+    python export_listings.py bmw.csv --format csv --marca BMW --an-min 2015
+    python export_listings.py prices.csv --format csv --fields id,marca,model,an,km,pret
+"""
+import argparse
+import asyncio
+import time
+
+from app.database import database
+from app.services.listing_export import listing_exporter, listing_filters
+
+
+async def export(args):
+    columns = listing_exporter.resolve_fields(args.fields)
+    query = listing_exporter.build_query(columns, listing_filters(
+        marca=args.marca, model=args.model, an_min=args.an_min, an_max=args.an_max,
+        pret_min=args.pret_min, pret_max=args.pret_max, locatie=args.locatie,
+        include_inactive=args.include_inactive
+    ))
+    compress = args.output.endswith('.gz')
+
+    await database.connect()
+    start = time.perf_counter()
+    written = 0
+    try:
+        with open(args.output, 'wb') as out:
+            async for chunk in listing_exporter.stream(query, columns, args.format, compress):
+                out.write(chunk)
+                written += len(chunk)
+    finally:
+        await database.disconnect()
+
+    print(f"[OK] {written / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export listings as NDJSON or CSV")
+    parser.add_argument('output', help="Output file (.gz compresses)")
+    parser.add_argument('--format', choices=listing_exporter.FORMATS, default='ndjson')
+    parser.add_argument('--fields', help="Comma-separated columns (default: all)")
+    parser.add_argument('--marca')
+    parser.add_argument('--model')
+    parser.add_argument('--an-min', type=int)
+    parser.add_argument('--an-max', type=int)
+    parser.add_argument('--pret-min', type=float)
+    parser.add_argument('--pret-max', type=float)
+    parser.add_argument('--locatie')
+    parser.add_argument('--include-inactive', action='store_true')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(export(args))
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
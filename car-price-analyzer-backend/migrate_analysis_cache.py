@@ -0,0 +1,33 @@
+"""
+Database Migration - Add cache_key and series_key to saved_analyses (analysis result cache)
+"""
+import asyncio
+from app.database import database
+
+
+async def migrate():
+    print("\n=== Database Migration: Analysis Cache ===\n")
+
+    await database.connect()
+
+    statements = [
+        "ALTER TABLE saved_analyses ADD COLUMN IF NOT EXISTS cache_key VARCHAR(64)",
+        "CREATE INDEX IF NOT EXISTS ix_saved_analyses_cache_key ON saved_analyses (cache_key)",
+        "ALTER TABLE saved_analyses ADD COLUMN IF NOT EXISTS series_key VARCHAR(100)",
+        # Entries written without a series key can't be invalidated per segment
+        "DELETE FROM saved_analyses WHERE cache_key IS NOT NULL AND series_key IS NULL",
+    ]
+
+    for sql in statements:
+        try:
+            await database.execute(sql)
+            print(f"[OK] {sql}")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    await database.disconnect()
+    print("\n[SUCCESS] Migration complete!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
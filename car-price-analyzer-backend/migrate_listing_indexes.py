@@ -0,0 +1,53 @@
+"""
+Database Migration - Search indexes on listings
+Builds the indexes declared on `listings` in app/database.py (segment,
+marca+model and pg_trgm indexes for ILIKE '%x%') with CREATE INDEX
+CONCURRENTLY, so scrapes keep writing while they build; safe to re-run
+"""
+import asyncio
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from app.database import database, listings
+
+# Replaced by an index declared in app/database.py
+SUPERSEDED_INDEXES = ["ix_listings_segment", "ix_listings_marca_model"]
+
+
+def index_statements():
+    """CREATE INDEX CONCURRENTLY IF NOT EXISTS ... for every index on listings"""
+    statements = []
+    for index in sorted(listings.indexes, key=lambda index: index.name):
+        sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=postgresql.dialect()))
+        statements.append(sql.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1).strip())
+    return statements
+
+
+async def migrate():
+    print("\n=== Database Migration: Listing Search Indexes ===\n")
+
+    await database.connect()
+
+    # No surrounding transaction: CONCURRENTLY is not allowed inside one
+    statements = [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        *index_statements(),
+        *[f"DROP INDEX CONCURRENTLY IF EXISTS {name}" for name in SUPERSEDED_INDEXES],
+        "ANALYZE listings",
+    ]
+
+    for sql in statements:
+        try:
+            await database.execute(sql)
+            print(f"[OK] {sql.splitlines()[0]}")
+        except Exception as e:
+            # A failed CONCURRENTLY build leaves an INVALID index - drop it and re-run
+            print(f"[ERROR] {e}")
+
+    await database.disconnect()
+    print("\n[SUCCESS] Migration complete!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
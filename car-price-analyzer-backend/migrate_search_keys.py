@@ -0,0 +1,97 @@
+"""
+Database Migration - Normalized search keys on listings
+Adds marca_key / series_key / variant_key, backfills them with the same
+normalizer ScraperService uses at ingest, builds their index and rebuilds
+market_stats (its segments are keyed by them)
+
+Usage:
+    python migrate_search_keys.py          # rows without keys
+    python migrate_search_keys.py --all    # recompute every row (after editing MODEL_SERIES_PATTERNS)
+"""
+import asyncio
+import sys
+
+import sqlalchemy
+
+from app.analysis.analysis_cache import analysis_cache
+from app.analysis.market_stats import market_stats_cube
+from app.database import database, listings
+from app.services.search_keys import search_keys
+from migrate_listing_indexes import SUPERSEDED_INDEXES, index_statements
+
+BATCH_SIZE = 1000
+
+
+async def backfill(recompute_all: bool) -> int:
+    """Fill the key columns batch by batch (keyset on id)"""
+    update = """
+        UPDATE listings
+        SET marca_key = :marca_key, series_key = :series_key, variant_key = :variant_key
+        WHERE id = :id
+    """
+    last_id = 0
+    updated = 0
+    while True:
+        query = sqlalchemy.select([
+            listings.c.id, listings.c.marca, listings.c.model,
+            listings.c.model_series, listings.c.model_variant,
+        ]).where(listings.c.id > last_id)
+        if not recompute_all:
+            query = query.where(listings.c.marca_key.is_(None))
+        rows = await database.fetch_all(query.order_by(listings.c.id).limit(BATCH_SIZE))
+        if not rows:
+            return updated
+
+        values = [{'id': row['id'], **search_keys.listing_keys(dict(row))} for row in rows]
+        await database.execute_many(update, values)
+        updated += len(values)
+        last_id = rows[-1]['id']
+        print(f"  {updated} rows...")
+
+
+async def migrate():
+    print("\n=== Database Migration: Search Keys ===\n")
+
+    await database.connect()
+
+    statements = [
+        "ALTER TABLE listings ADD COLUMN IF NOT EXISTS marca_key VARCHAR(50)",
+        "ALTER TABLE listings ADD COLUMN IF NOT EXISTS series_key VARCHAR(100)",
+        "ALTER TABLE listings ADD COLUMN IF NOT EXISTS variant_key VARCHAR(50)",
+        "ALTER TABLE market_stats ALTER COLUMN model_series_key TYPE VARCHAR(100)",
+    ]
+
+    for sql in statements:
+        try:
+            await database.execute(sql)
+            print(f"[OK] {sql}")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    try:
+        updated = await backfill('--all' in sys.argv)
+        print(f"[OK] Backfilled {updated} listings")
+    except Exception as e:
+        print(f"[ERROR] Backfill failed: {e}")
+
+    # Build the key index, then drop the indexes it and others replaced
+    for sql in [*index_statements(), *[f"DROP INDEX CONCURRENTLY IF EXISTS {name}" for name in SUPERSEDED_INDEXES]]:
+        try:
+            await database.execute(sql)
+            print(f"[OK] {sql.splitlines()[0]}")
+        except Exception as e:
+            print(f"[ERROR] {e}")
+
+    try:
+        cells = await market_stats_cube.refresh_all()
+        await analysis_cache.invalidate_all()
+        print(f"[OK] Rebuilt market_stats ({cells} cells)")
+    except Exception as e:
+        print(f"[ERROR] Market stats rebuild failed: {e}")
+
+    await database.disconnect()
+    print("\n[SUCCESS] Migration complete!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,102 @@
+"""
+Reparse Archive - Re-run the current parsers over archived search pages
+Streams the page archive (see app/scrapers/page_archive.py) through the
+parse pool and bulk-upserts the listings, without fetching anything.
+Only parsed fields are rewritten: data_publicare, este_activ and the scrape
+time of existing listings stay as the live scrapes left them
+
+Usage:
+    python reparse_archive.py                          # whole archive
+    python reparse_archive.py --since 2026-09-01       # pages fetched since a date
+    python reparse_archive.py --url-contains bmw       # only matching URLs
+    python reparse_archive.py --dry-run                # parse and count, no DB writes
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from app.database import database
+from app.scrapers.page_archive import PageArchive, reparse_archived_page
+from app.scrapers.parse_pool import parse_pool
+from app.scrapers.scraper_service import scraper_service
+
+# Pages parsed concurrently before their listings are written
+WINDOW = 32
+
+
+async def reparse(archive: PageArchive, since, url_contains, dry_run: bool):
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    pages = 0
+    found = 0
+    failed = 0
+    start = time.perf_counter()
+
+    async def flush(window):
+        nonlocal found, failed
+        results = await asyncio.gather(
+            *[parse_pool.parse(reparse_archived_page, archive.root, record) for record in window],
+            return_exceptions=True
+        )
+        batch = []
+        # Fetch order is kept, so a newer page of the same ad wins the upsert
+        for record, result in zip(window, results):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"  ⚠ {record['url']}: {result}")
+                continue
+            fetched_at = datetime.fromisoformat(record['fetched_at'])
+            batch.extend({**listing, 'data_scrape': fetched_at} for listing in result)
+        found += len(batch)
+
+        if batch and not dry_run:
+            batch_counts = await scraper_service.save_listings(batch, reparse=True)
+            for key in counts:
+                counts[key] += batch_counts[key]
+
+    window = []
+    for record in archive.records(since=since, url_contains=url_contains):
+        window.append(record)
+        pages += 1
+        if len(window) >= WINDOW:
+            await flush(window)
+            window = []
+            print(f"  {pages} pages, {found} listings")
+    if window:
+        await flush(window)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n=== Reparse Complete ({elapsed:.1f}s) ===")
+    print(f"Pages: {pages} ({failed} failed)")
+    print(f"Listings found: {found}")
+    if not dry_run:
+        print(f"Inserted: {counts['inserted']}")
+        print(f"Updated: {counts['updated']}")
+        print(f"Unchanged: {counts['unchanged']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived OLX pages into listings")
+    parser.add_argument('--archive', help="Archive directory (default: SCRAPER_ARCHIVE_DIR)")
+    parser.add_argument('--since', type=datetime.fromisoformat, help="Only pages fetched since (ISO date)")
+    parser.add_argument('--url-contains', help="Only pages whose URL contains this text")
+    parser.add_argument('--dry-run', action='store_true', help="Parse only, do not write to the DB")
+    args = parser.parse_args()
+
+    archive = PageArchive(args.archive, enabled=False)
+    if archive.root is None:
+        parser.error("no archive directory: pass --archive or set SCRAPER_ARCHIVE_DIR")
+    print(f"Reparsing archive: {archive.root}")
+
+    if not args.dry_run:
+        await database.connect()
+    try:
+        await reparse(archive, args.since, args.url_contains, args.dry_run)
+    finally:
+        if not args.dry_run:
+            await database.disconnect()
+        parse_pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
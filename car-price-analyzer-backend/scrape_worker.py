@@ -0,0 +1,202 @@
+"""
+Scrape Worker - Runs queued scrape jobs outside the API process
+Claims jobs from the scrape_jobs table (see app/scrapers/scrape_jobs.py);
+start as many workers as needed, on any host that can reach the database
+
+Usage:
+    python scrape_worker.py                   # SCRAPE_WORKER_CONCURRENCY jobs at once (default 2)
+    python scrape_worker.py --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+
+from app.database import database, engine, scrape_job_events, scrape_jobs, scrape_rate_limits
+from app.scrapers.detailed_olx_scraper import detailed_olx_scraper
+from app.scrapers.parse_pool import parse_pool
+from app.scrapers.scrape_jobs import JobLostError, scrape_job_queue
+from app.scrapers.scraper_service import scraper_service
+
+POLL_SECONDS = 2  # Idle wait between claims when the queue is empty
+STALE_CHECK_SECONDS = 60
+
+
+async def report(job: dict, action: str, call) -> bool:
+    """
+    Await a job bookkeeping write, logging instead of raising
+
+    A transient DB error here must not escape a slot and stop the worker;
+    a job whose final status could not be written stays 'running' until
+    requeue_stale hands it back.
+    """
+    try:
+        await call
+        return True
+    except Exception as e:
+        print(f"Could not {action} job {job['id']}: {e}")
+        return False
+
+
+async def run_job(job: dict) -> dict:
+    """Execute one claimed job, streaming its progress events"""
+    params = job['params']
+    # Running totals, attached to every event so clients need no state
+    totals = {'pages_fetched': 0, 'listings_parsed': 0, 'listings_inserted': 0}
+
+    async def on_event(event: dict):
+        event_type = event.pop('type')
+        if event_type == 'page':
+            totals['pages_fetched'] += 1
+            totals['listings_parsed'] += event['listings']
+        elif event_type == 'saved':
+            totals['listings_inserted'] += event['inserted']
+        elif event_type == 'query':
+            # JobLostError is only logged here: keep_alive cancels the run
+            await report(
+                job, 'record progress of',
+                scrape_job_queue.update_progress(
+                    job, int(event['done'] * 100 / event['total']),
+                    f"{event['done']}/{event['total']} queries"
+                )
+            )
+        try:
+            await scrape_job_queue.add_event(job['id'], event_type, {**event, **totals})
+        except Exception as e:
+            print(f"Could not record {event_type} event for job {job['id']}: {e}")
+
+    if job['kind'] == 'popular':
+        return await scraper_service.update_popular_models(
+            incremental=params.get('incremental', False),
+            on_event=on_event
+        )
+    return await scraper_service.update_specific_model(
+        params['marca'],
+        params.get('model'),
+        incremental=params.get('incremental', False),
+        on_event=on_event
+    )
+
+
+async def keep_alive(job: dict, run: asyncio.Task):
+    """
+    Heartbeat the job every HEARTBEAT_SECONDS while `run` executes
+
+    A single query can outlast STALE_AFTER_SECONDS, so progress updates
+    alone do not keep a live job from being requeued. If the job was
+    requeued anyway (e.g. the DB was unreachable for too long) it belongs
+    to another worker now: cancel `run` and return True.
+    """
+    while True:
+        await asyncio.sleep(scrape_job_queue.HEARTBEAT_SECONDS)
+        try:
+            await scrape_job_queue.heartbeat(job)
+        except JobLostError:
+            run.cancel()
+            return True
+        except Exception as e:
+            print(f"Could not send heartbeat for job {job['id']}: {e}")
+
+
+async def slot(worker_id: str, stop: asyncio.Event):
+    """One concurrent job runner: claim, run, report, repeat"""
+    while not stop.is_set():
+        try:
+            job = await scrape_job_queue.claim(worker_id)
+        except Exception as e:
+            print(f"[{worker_id}] Claim failed: {e}")
+            job = None
+
+        if job is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        print(f"[{worker_id}] Job {job['id']} ({job['kind']}) attempt {job['attempts']}: {job['params']}")
+        run = asyncio.create_task(run_job(job))
+        heartbeats = asyncio.create_task(keep_alive(job, run))
+        try:
+            result = await run
+        except asyncio.CancelledError:
+            if not heartbeats.done():
+                raise  # The worker itself is being cancelled
+            # No final status: the job's new owner writes it
+            print(f"[{worker_id}] Job {job['id']} was requeued, stopped running it here")
+        except Exception as e:
+            print(f"[{worker_id}] Job {job['id']} failed: {e}")
+            # Event first, so a stream never sees the final status without it
+            event_type = 'retry' if job['attempts'] < job['max_attempts'] else 'failed'
+            await report(job, f'record {event_type} event for',
+                         scrape_job_queue.add_event(job['id'], event_type, {'error': str(e), 'attempts': job['attempts']}))
+            await report(job, 'mark failed', scrape_job_queue.fail(job, str(e)))
+        else:
+            await report(job, 'record summary event for', scrape_job_queue.add_event(job['id'], 'summary', result))
+            if await report(job, 'mark completed', scrape_job_queue.complete(job, result)):
+                print(f"[{worker_id}] Job {job['id']} completed")
+        finally:
+            heartbeats.cancel()
+
+
+async def requeue_stale(stop: asyncio.Event):
+    """Give jobs of crashed workers back to the queue, prune old job events"""
+    while not stop.is_set():
+        try:
+            requeued = await scrape_job_queue.requeue_stale()
+            if requeued:
+                print(f"Requeued {requeued} stale jobs")
+        except Exception as e:
+            print(f"Stale job check failed: {e}")
+        try:
+            pruned = await scrape_job_queue.prune_events()
+            if pruned:
+                print(f"Pruned {pruned} events of finished jobs")
+        except Exception as e:
+            print(f"Job event pruning failed: {e}")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=STALE_CHECK_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Run queued scrape jobs")
+    parser.add_argument(
+        '--concurrency', type=int,
+        default=int(os.getenv('SCRAPE_WORKER_CONCURRENCY', 2)),
+        help="Jobs run at once (they share the per-host rate limit)"
+    )
+    args = parser.parse_args()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            # Finish running jobs, claim no new ones
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:  # Windows
+            pass
+
+    scrape_jobs.create(engine, checkfirst=True)
+    scrape_job_events.create(engine, checkfirst=True)
+    scrape_rate_limits.create(engine, checkfirst=True)
+    await database.connect()
+    print(f"✓ Database connected, running {args.concurrency} job slots")
+
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    try:
+        await asyncio.gather(
+            requeue_stale(stop),
+            *[slot(f"{base_id}:{i}", stop) for i in range(args.concurrency)]
+        )
+    finally:
+        await detailed_olx_scraper.close()
+        parse_pool.shutdown()
+        await database.disconnect()
+        print("✓ Worker stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
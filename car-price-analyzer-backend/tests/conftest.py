@@ -0,0 +1,45 @@
+"""
+Shared test setup
+Database tests run against DATABASE_TEST_URL (.env) and are skipped when it
+is not set or the server is unreachable - never against DATABASE_URL
+"""
+import os
+
+import pytest
+import sqlalchemy
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# app.database reads DATABASE_URL at import time
+if os.getenv('DATABASE_TEST_URL'):
+    os.environ['DATABASE_URL'] = os.environ['DATABASE_TEST_URL']
+
+
+@pytest.fixture
+async def test_database():
+    """Connected `database`, pointing at DATABASE_TEST_URL"""
+    if not os.getenv('DATABASE_TEST_URL'):
+        pytest.skip("DATABASE_TEST_URL not set")
+
+    from app.database import database
+    try:
+        await database.connect()
+    except Exception as e:
+        pytest.skip(f"Test database unreachable: {e}")
+    try:
+        yield database
+    finally:
+        await database.disconnect()
+
+
+@pytest.fixture
+async def listing_table(test_database):
+    """Empty `listings` table (created without its trigram indexes, which need pg_trgm)"""
+    from app.database import engine, listings
+    if not sqlalchemy.inspect(engine).has_table('listings'):
+        with engine.begin() as connection:
+            connection.execute(sqlalchemy.schema.CreateTable(listings))
+    await test_database.execute("TRUNCATE listings CASCADE")
+    yield test_database
+    await test_database.execute("TRUNCATE listings CASCADE")
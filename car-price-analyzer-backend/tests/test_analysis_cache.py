@@ -0,0 +1,100 @@
+"""
+AnalysisCache keys and per-segment invalidation (L1, and L2 on a real Postgres)
+"""
+import asyncio
+
+import pytest
+
+from app.analysis.analysis_cache import AnalysisCache
+from app.database import engine, saved_analyses
+from app.services.db_listener import DatabaseListener
+from app.services.listing_changes import ListingChanges
+
+RESULT = {'pret_optim': {'valoare': 15000}}
+
+
+def key_for(cache, an=2016, km=120000):
+    return cache.make_key('BMW', '320d', 2014, 2018, 100000, 140000, 'Diesel', None, None, an, km)
+
+
+def test_key_includes_exact_target():
+    cache = AnalysisCache()
+
+    assert key_for(cache) == key_for(cache)
+    assert key_for(cache, an=2017) != key_for(cache)
+    assert key_for(cache, km=121000) != key_for(cache)
+
+
+@pytest.fixture
+async def cache(test_database):
+    saved_analyses.create(engine, checkfirst=True)
+    await test_database.execute("DELETE FROM saved_analyses WHERE cache_key IS NOT NULL")
+    yield AnalysisCache()
+    await test_database.execute("DELETE FROM saved_analyses WHERE cache_key IS NOT NULL")
+
+
+async def test_new_listing_in_series_invalidates_model_query(cache):
+    # "320d" is cached; a "Seria 3" listing lands in the same series
+    key = key_for(cache)
+    await cache.set(key, 'BMW', '320d', 2016, 120000, RESULT)
+
+    await cache.invalidate_segments([('bmw', 'seria 3', 'seria 3')])
+
+    assert await cache.get(key) is None
+    assert cache.stats['invalidations'] == 1
+
+
+async def test_other_series_keeps_entry(cache):
+    key = key_for(cache)
+    await cache.set(key, 'BMW', '320d', 2016, 120000, RESULT)
+
+    await cache.invalidate_segments([('bmw', 'seria 5', 'seria 5')])
+
+    assert await cache.get(key) == RESULT
+    cache._entries.clear()
+    assert await cache.get(key) == RESULT  # L2 row survived too
+    assert cache.stats['l2_hits'] == 1
+
+
+async def test_invalidation_reaches_other_processes(cache):
+    # API process: cached entry, listening for listing changes
+    key = key_for(cache)
+    await cache.set(key, 'BMW', '320d', 2016, 120000, RESULT)
+    listener = DatabaseListener()
+    ListingChanges(listener).subscribe(cache.drop_local)
+    await listener.start()
+    try:
+        assert listener.listening
+
+        # Worker process: writes listings of the segment
+        changed = [('bmw', 'seria 3', '320d xdrive')]
+        await AnalysisCache().invalidate_segments(changed)
+        await ListingChanges(DatabaseListener()).publish(changed)
+
+        for _ in range(100):
+            if key not in cache._entries:
+                break
+            await asyncio.sleep(0.02)
+        assert await cache.get(key) is None
+        assert cache.stats['l1_hits'] == 0
+    finally:
+        await listener.stop()
+
+
+async def test_set_replaces_row_and_prune_drops_expired(cache, test_database):
+    key = key_for(cache)
+    await cache.set(key, 'BMW', '320d', 2016, 120000, RESULT)
+    await cache.set(key, 'BMW', '320d', 2016, 120000, {'pret_optim': {'valoare': 16000}})
+    await cache.set(key_for(cache, an=2017), 'BMW', '320d', 2017, 120000, RESULT)
+    await test_database.execute(saved_analyses.insert().values(marca='bmw', model='320d', an=2016, km=1))
+    await test_database.execute(
+        "UPDATE saved_analyses SET created_at = NOW() - INTERVAL '2 days' WHERE cache_key = :key", {'key': key}
+    )
+
+    assert await test_database.fetch_val(
+        "SELECT COUNT(*) FROM saved_analyses WHERE cache_key = :key", {'key': key}
+    ) == 1
+    assert await cache.prune_expired() == 1
+    # The other cache row and the user's saved analysis stay
+    assert await test_database.fetch_val("SELECT COUNT(*) FROM saved_analyses") == 2
+    await test_database.execute("DELETE FROM saved_analyses WHERE cache_key IS NULL")
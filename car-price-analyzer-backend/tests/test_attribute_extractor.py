@@ -0,0 +1,64 @@
+"""
+ListingAttributeExtractor on OLX titles and card texts
+"""
+import csv
+import os
+import re
+
+import pytest
+
+from app.scrapers.attribute_extractor import listing_attribute_extractor
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'olx_listing_texts.tsv')
+
+
+@pytest.mark.parametrize('title, an, km', [
+    # "<year> <km> km" - the km token must not swallow the year
+    ('BMW 320d 2015 180000 km', 2015, 180000),
+    ('Vand Golf 7 2016 95000 km', 2016, 95000),
+    ('Audi A4 2015 150000km', 2015, 150000),
+    ('Ford Focus 2014 150 000 km diesel', 2014, 150000),
+    ('Opel Astra 2010 200 mii km', 2010, 200000),
+    # Thousands separators
+    ('BMW Seria 3 318d 2014 manuala 190.000 km', 2014, 190000),
+    ('Dacia Logan 2012 85 000 km', 2012, 85000),
+    # No km in the title
+    ('BMW 530d Touring 2017 258 CP', 2017, 0),
+])
+def test_year_and_km_from_title(title, an, km):
+    attributes = listing_attribute_extractor.extract(title)
+
+    assert attributes['an'] == an
+    assert attributes['km'] == km
+
+
+def test_title_wins_over_card_text():
+    title = 'BMW 320d 2015 180000 km'
+    text = title + '12.900 €Bucuresti - Reactualizat Azi la 10:142009 - 207.000 km'
+
+    attributes = listing_attribute_extractor.extract(title, text)
+
+    assert attributes['an'] == 2015
+    assert attributes['km'] == 180000
+
+
+def test_fixture_titles_keep_their_year():
+    """_parse_listing_card drops listings without a year"""
+    with open(FIXTURE, encoding='utf-8') as f:
+        rows = [row for row in csv.reader(f, delimiter='\t') if row and not row[0].startswith('#')]
+
+    for title, text in rows:
+        year = re.search(r'\b(19\d{2}|20[0-2]\d)\b', title)
+        if year:
+            assert listing_attribute_extractor.extract(title, text)['an'] == int(year.group(1)), title
+
+
+@pytest.mark.parametrize('title, field, value', [
+    ('BMW 320d 2016 automata xDrive', 'transmisie', 'automata'),
+    ('BMW 320d 2016 automata xDrive', 'tractiune', '4x4'),
+    ('Audi A6 Avant 2.0 TDI 2015', 'caroserie', 'break'),
+    ('Audi A6 Avant 2.0 TDI 2015', 'capacitate_cilindrica', 2000),
+    ('Mini Cooper S 2015 automata 192cp', 'putere_cp', 192),
+])
+def test_keywords_and_units(title, field, value):
+    assert listing_attribute_extractor.extract(title)[field] == value
@@ -0,0 +1,52 @@
+"""
+ListingCardParser: both backends find the same cards (fixtures/olx_search_page.html)
+"""
+import os
+
+import pytest
+
+from app.scrapers.card_parser import ListingCardParser
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'olx_search_page.html')
+
+NESTED = """
+<div data-cy="l-card"><h6>Outer</h6>
+  <div data-cy="l-card"><h6>Inner</h6></div>
+</div>
+<div data-cy="l-card"><h6>Second</h6></div>
+"""
+
+
+def cards(backend, html):
+    return [
+        (card.find('h6').get_text(strip=True), card.find('a')['href'] if card.find('a') else None)
+        for card in ListingCardParser(backend).parse_cards(html)
+    ]
+
+
+@pytest.mark.parametrize('backend', ListingCardParser.BACKENDS)
+def test_fixture_page(backend):
+    with open(FIXTURE, encoding='utf-8') as f:
+        html = f.read()
+
+    assert cards(backend, html) == [
+        ('BMW 320d M Sport 2016', '/d/oferta/bmw-320d-IDa1.html'),
+        ('Dacia Logan 1.5 dCi', '/d/oferta/dacia-logan-IDa2.html'),
+        ('Jante BMW R18 originale', '/d/oferta/jante-IDa4.html'),
+    ]
+
+
+def test_nested_cards_match_whole_page_parse():
+    assert cards('lxml', NESTED) == cards('html.parser', NESTED)
+    assert [title for title, _ in cards('lxml', NESTED)] == ['Outer', 'Inner', 'Second']
+
+
+@pytest.mark.parametrize('backend', ListingCardParser.BACKENDS)
+@pytest.mark.parametrize('html', ['', '   ', '<html><body><p>Niciun anunț</p></body></html>'])
+def test_no_cards(backend, html):
+    assert ListingCardParser(backend).parse_cards(html) == []
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        ListingCardParser('regex')
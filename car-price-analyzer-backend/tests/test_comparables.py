@@ -0,0 +1,155 @@
+"""
+ComparablesIndex.nearest over partitions built in memory; refreshes
+"""
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.analysis import comparables as comparables_module
+from app.analysis.comparables import ComparablesIndex
+from app.database import listings
+from app.services.db_listener import DatabaseListener
+from app.services.listing_changes import ListingChanges
+
+
+def listing(id, an, km, caroserie='sedan', combustibil='diesel', pret=None):
+    return {
+        'id': id, 'an': an, 'km': km, 'putere_cp': None, 'capacitate_cilindrica': None,
+        'pret': pret or 20000 - (2020 - an) * 1000, 'combustibil': combustibil, 'caroserie': caroserie,
+    }
+
+
+@pytest.fixture
+def index():
+    listings = [
+        listing(1, 2014, 160000),
+        listing(2, 2015, 140000),
+        listing(3, 2016, 120000),
+        listing(4, 2016, 118000, caroserie='break'),
+        listing(5, 2017, 90000),
+        listing(6, 2018, 70000),
+        listing(7, 2019, 40000),
+        listing(8, 2016, 125000, combustibil='benzina'),
+    ]
+    partitions = {}
+    for item in sorted(listings, key=lambda item: (item['an'], item['id'])):
+        partitions.setdefault((item['combustibil'], item['caroserie']), []).append(item)
+
+    rows = []
+    for (fuel, body), items in partitions.items():
+        row = {'marca_key': 'bmw', 'series_key': 'seria 3', 'combustibil': fuel, 'transmisie': '', 'caroserie': body}
+        row.update({column: [item[column] for item in items] for column in ('id', *ComparablesIndex.FEATURES, 'pret')})
+        rows.append(row)
+
+    comparables = ComparablesIndex()
+    comparables._segments = comparables._build_segments(rows)
+    comparables.loaded = True
+    return comparables
+
+
+def ids(comparables):
+    return [comparable['id'] for comparable in comparables]
+
+
+def test_nearest_first(index):
+    found = index.nearest('BMW', '320d', 2016, 120000, k=3)
+
+    assert ids(found)[0] == 3
+    assert len(found) == 3
+    assert found == sorted(found, key=lambda comparable: comparable['distance'])
+
+
+def test_body_type_restricts_partitions(index):
+    assert ids(index.nearest('BMW', 'Seria 3', 2016, 120000, caroserie='Break')) == [4]
+    assert 4 not in ids(index.nearest('BMW', 'Seria 3', 2016, 120000, caroserie='sedan'))
+
+
+def test_year_and_km_ranges_are_respected(index):
+    found = index.nearest(
+        'BMW', 'Seria 3', 2016, 120000, combustibil='diesel',
+        an_min=2015, an_max=2017, km_min=100000, km_max=150000, k=20
+    )
+
+    assert sorted(ids(found)) == [2, 3, 4]
+
+
+def test_target_outside_range_still_finds_listings_in_range(index):
+    found = index.nearest('BMW', 'Seria 3', 2010, 200000, an_min=2018, an_max=2019, k=20)
+
+    assert sorted(ids(found)) == [6, 7]
+
+
+def test_matches_brute_force(index):
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        an, km = int(rng.integers(2012, 2022)), int(rng.integers(0, 200000))
+        found = index.nearest('BMW', 'Seria 3', an, km, k=4)
+
+        everything = index.nearest('BMW', 'Seria 3', an, km, k=100)
+        assert [c['distance'] for c in found] == [c['distance'] for c in everything[:4]]
+
+
+def test_not_loaded_returns_none():
+    assert ComparablesIndex().nearest('BMW', 'Seria 3', 2016, 120000) is None
+
+
+async def test_refreshes_run_one_at_a_time(monkeypatch):
+    running = {'now': 0, 'max': 0}
+
+    async def fetch_all(query, values=None):
+        running['now'] += 1
+        running['max'] = max(running['max'], running['now'])
+        await asyncio.sleep(0.01)
+        running['now'] -= 1
+        return []
+
+    monkeypatch.setattr(comparables_module.database, 'fetch_all', fetch_all)
+    index = ComparablesIndex()
+
+    await asyncio.gather(
+        index.refresh_all(),
+        index.refresh_segments([('bmw', 'seria 3'), ('bmw', 'seria 5')]),
+        index.refresh_segments([('dacia', 'logan')]),
+    )
+
+    assert running['max'] == 1
+
+
+async def test_segments_written_elsewhere_are_reloaded(listing_table):
+    async def add_listing(i):
+        await listing_table.execute(listings.insert().values(
+            source='olx', url=f'https://www.olx.ro/d/{i}', marca='Dacia', model='Logan',
+            marca_key='dacia', series_key='logan', an=2018, km=90000 + i, pret=8000.0,
+            combustibil='Benzina', este_activ=True, data_scrape=datetime.now(),
+        ))
+
+    await add_listing(1)
+    index = ComparablesIndex()
+    listener = DatabaseListener()
+    ListingChanges(listener).subscribe(index.apply_changes)
+    await index.refresh_all()
+    await listener.start()
+    try:
+        # scrape_worker.py: writes a listing, announces its segment
+        await add_listing(2)
+        await ListingChanges(DatabaseListener()).publish([('dacia', 'logan', 'logan')])
+
+        for _ in range(100):
+            if len(index.nearest('Dacia', 'Logan', 2018, 90000) or []) == 2:
+                break
+            await asyncio.sleep(0.02)
+        assert len(index.nearest('Dacia', 'Logan', 2018, 90000)) == 2
+    finally:
+        await listener.stop()
+
+
+async def test_changes_ignored_where_index_is_not_served(monkeypatch):
+    index = ComparablesIndex()
+    # Would fail if called
+    monkeypatch.setattr(index, 'refresh_all', None)
+    monkeypatch.setattr(index, 'refresh_segments', None)
+
+    await index.apply_changes(None)
+    await index.apply_changes([('dacia', 'logan', 'logan')])
@@ -0,0 +1,118 @@
+"""
+DepreciationModel: fit from sufficient statistics, publish/load, predict fallbacks
+"""
+import math
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from app.analysis.depreciation_model import DepreciationModel
+
+
+def sums(age, kmx, y):
+    """One row of the training query's sums (n, sa, sk, sy, saa, sak, skk, say, sky, syy)"""
+    age, kmx, y = (np.asarray(values, dtype=float) for values in (age, kmx, y))
+    return [
+        age.size, age.sum(), kmx.sum(), y.sum(),
+        (age * age).sum(), (age * kmx).sum(), (kmx * kmx).sum(),
+        (age * y).sum(), (kmx * y).sum(), (y * y).sum(),
+    ]
+
+
+def synthetic(n=200, intercept=10.2, age_coef=-0.12, km_coef=-0.03, noise=0.05, seed=1):
+    rng = np.random.default_rng(seed)
+    age = rng.uniform(0, 15, n)
+    kmx = np.clip(age * 1.5 + rng.normal(0, 4, n), 0, 50)
+    y = intercept + age_coef * age + km_coef * kmx + rng.normal(0, noise, n)
+    return age, kmx, y
+
+
+def test_fit_recovers_known_coefficients():
+    [row] = DepreciationModel()._fit(np.array([sums(*synthetic())]), min_listings=30)
+
+    intercept, age_coef, km_coef, n, rmse = row
+    assert intercept == pytest.approx(10.2, abs=0.03)
+    assert age_coef == pytest.approx(-0.12, abs=0.005)
+    assert km_coef == pytest.approx(-0.03, abs=0.005)
+    assert n == 200
+    assert rmse == pytest.approx(0.05, abs=0.01)
+
+
+def test_fit_rejects_unusable_segments():
+    model = DepreciationModel()
+    age, kmx, y = synthetic()
+    rows = np.array([
+        sums(age, kmx, y),                            # usable
+        sums(age, age * 1.5, y),                      # km collinear with age
+        sums(np.full(200, 5.0), kmx, y),              # every car the same age
+        sums(age[:20], kmx[:20], y[:20]),             # too few listings
+        sums(age, kmx, 10 + 0.1 * age - 0.03 * kmx),  # gains value with age
+    ])
+
+    fitted = model._fit(rows, min_listings=30)
+
+    assert fitted[0] is not None
+    assert fitted[1:] == [None, None, None, None]
+
+
+TABLE = {
+    'version': '20261001T000000Z', 'trained_at': '2026-10-01T00:00:00+00:00', 'samples': 500,
+    'segments': {'bmw|seria 3': [10.0, -0.1, -0.02, 120, 0.2]},
+    'brands': {'bmw': [9.8, -0.09, -0.025, 400, 0.3]},
+}
+
+
+def test_publish_then_load_swaps_tables(tmp_path):
+    publisher = DepreciationModel(str(tmp_path))
+    server = DepreciationModel(str(tmp_path))
+    assert server.load() is False  # Nothing published yet
+
+    publisher.publish(TABLE)
+    assert server.load() is True
+    assert server.version == TABLE['version']
+    assert server.load() is False  # LATEST unchanged
+
+    newer = {**TABLE, 'version': '20261015T000000Z', 'brands': {}}
+    publisher.publish(newer)
+    latest = os.path.join(tmp_path, DepreciationModel.LATEST_FILE)
+    os.utime(latest, (os.stat(latest).st_atime, os.stat(latest).st_mtime + 1))  # Coarse mtime clocks
+    assert server.load() is True
+    assert server.version == newer['version']
+    assert server.predict('BMW', 'X5', 2018, 100000) is None
+    assert sorted(os.listdir(tmp_path)) == ['20261001T000000Z.json', '20261015T000000Z.json', 'LATEST']
+
+
+def test_broken_latest_keeps_serving_current_table(tmp_path):
+    model = DepreciationModel(str(tmp_path))
+    model.publish(TABLE)
+    model.load()
+
+    latest = os.path.join(tmp_path, DepreciationModel.LATEST_FILE)
+    with open(latest, 'w', encoding='utf-8') as f:
+        f.write('missing-version\n')
+    os.utime(latest, (os.stat(latest).st_atime, os.stat(latest).st_mtime + 1))
+
+    assert model.load() is False
+    assert model.version == TABLE['version']
+
+
+def test_predict_falls_back_from_series_to_brand_to_none(tmp_path):
+    model = DepreciationModel(str(tmp_path))
+    assert model.predict('BMW', '320d', 2018, 100000) is None  # No table
+
+    model.publish(TABLE)
+    model.load()
+    an = datetime.now().year - 5
+
+    series = model.predict('BMW', '320d', an, 100000)
+    assert series['level'] == 'series'
+    assert series['price'] == pytest.approx(math.exp(10.0 - 0.1 * 5 - 0.02 * 10))
+    assert (series['sample_size'], series['rmse'], series['version']) == (120, 0.2, TABLE['version'])
+
+    brand = model.predict('bmw', 'X5', an, 100000)
+    assert brand['level'] == 'brand'
+    assert brand['price'] == pytest.approx(math.exp(9.8 - 0.09 * 5 - 0.025 * 10))
+
+    assert model.predict('Dacia', 'Logan', an, 100000) is None
@@ -0,0 +1,74 @@
+"""
+GET /listings/{marca}/{model}: response model with ?fields= projections;
+fixed-prefix routes it must not capture
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import listings as listings_router
+from app.services.view_counter import ViewCounter
+
+ROW = {
+    'id': 7, 'source': 'olx', 'url': 'https://www.olx.ro/d/7', 'marca': 'Dacia', 'model': 'Logan',
+    'an': 2018, 'km': 90000, 'pret': 8000.0, 'combustibil': 'Benzina', 'locatie': 'Cluj',
+    'dotari': ['AC'], 'imagini': [], 'descriere': 'Logan', 'data_publicare': datetime(2026, 10, 1),
+    'zile_pe_piata': 15, 'data_scraping': datetime(2026, 10, 15),
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fetch_all(query):
+        selected = [column.name for column in query.selected_columns]
+        return [{name: ROW[name] for name in selected}]
+
+    async def fetch_one(query):
+        if isinstance(query, str):  # /listings/stats/summary
+            return {'total_active': 1, 'avg_price': 8000.0}
+        return ROW
+
+    monkeypatch.setattr(listings_router.database, 'fetch_all', fetch_all)
+    monkeypatch.setattr(listings_router.database, 'fetch_one', fetch_one)
+    monkeypatch.setattr(listings_router, 'view_counter', ViewCounter())
+    app = FastAPI()
+    app.include_router(listings_router.router)
+    return TestClient(app)
+
+
+def test_projection_returns_only_requested_fields(client):
+    response = client.get('/listings/Dacia/Logan', params={'fields': 'id,pret'})
+
+    assert response.status_code == 200
+    assert response.json() == [{'id': 7, 'pret': 8000.0}]
+
+
+def test_full_listing_is_validated(client):
+    [listing] = client.get('/listings/Dacia/Logan').json()
+
+    assert set(listing) == set(listings_router.LISTING_FIELDS)
+    assert listing['data_publicare'] == '2026-10-01T00:00:00'
+
+
+def test_response_model_in_openapi(client):
+    schema = client.get('/openapi.json').json()
+    response = schema['paths']['/listings/{marca}/{model}']['get']['responses']['200']
+
+    assert response['content']['application/json']['schema']['items']['$ref'].endswith('/ListingProjection')
+
+
+def test_detail_route_is_not_captured_by_marca_model(client):
+    response = client.get('/listings/detail/7')
+
+    assert response.status_code == 200
+    assert response.json()['id'] == 7
+    assert listings_router.view_counter.views(7) == 1
+
+
+def test_stats_summary_route_is_not_captured_by_marca_model(client):
+    response = client.get('/listings/stats/summary')
+
+    assert response.status_code == 200
+    assert response.json() == {'total_active': 1, 'avg_price': 8000.0}
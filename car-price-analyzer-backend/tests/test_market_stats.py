@@ -0,0 +1,66 @@
+"""
+MarketStatsCube freshness (counted when read) and concurrent refreshes
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.analysis.market_stats import market_stats_cube
+from app.database import engine, listings, market_stats
+
+
+@pytest.fixture
+async def cube(listing_table):
+    market_stats.create(engine, checkfirst=True)
+    await listing_table.execute("DELETE FROM market_stats")
+    yield market_stats_cube
+    await listing_table.execute("DELETE FROM market_stats")
+
+
+async def add_listing(database, i, scraped_hours_ago):
+    await database.execute(listings.insert().values(
+        source='olx', url=f'https://www.olx.ro/d/{i}', marca='Dacia', model='Logan',
+        marca_key='dacia', series_key='logan', an=2018, km=90000, pret=8000.0 + i,
+        este_activ=True, data_scrape=datetime.now() - timedelta(hours=scraped_hours_ago),
+    ))
+
+
+async def test_fresh_count_ages_out_after_refresh(cube, listing_table):
+    for i, hours in enumerate([1, 2, 12, 20, 30]):
+        await add_listing(listing_table, i, hours)
+    await cube.refresh_segments([('dacia', 'logan')])
+
+    stats = await cube.get_stats('Dacia', 'Logan', 2015, 2020)
+    assert stats['count'] == 5
+    assert stats['fresh_count'] == 4
+
+    # Read 13 hours later without a refresh: the 12h and 20h listings are now stale
+    rows = await listing_table.fetch_all(market_stats.select())
+    later = cube.merge(rows, now=datetime.now() + timedelta(hours=13))
+    assert later['count'] == 5
+    assert later['fresh_count'] == 2
+
+
+def test_partial_hour_at_the_edge_is_not_fresh():
+    now = datetime(2026, 10, 16, 12, 30)
+    hour = int(market_stats_cube._hour(now))
+    cell = {
+        'count': 3, 'price_sum': 3000.0, 'price_min': 900.0, 'price_max': 1100.0,
+        'histogram': [[20, 3]], 'last_scrape': now,
+        # 24h ago falls inside (hour - 24), which holds listings up to 24.5h old
+        'fresh_hours': [[hour - 24, 1], [hour - 23, 1], [hour, 1]],
+    }
+
+    assert market_stats_cube.merge([cell], now=now)['fresh_count'] == 2
+
+
+async def test_concurrent_refreshes_leave_one_cell(cube, listing_table):
+    for i in range(3):
+        await add_listing(listing_table, i, 1)
+
+    await asyncio.gather(*[cube.refresh_segments([('dacia', 'logan')]) for _ in range(6)], cube.refresh_all())
+
+    rows = await listing_table.fetch_all(market_stats.select())
+    assert len(rows) == 1
+    assert rows[0]['count'] == 3
@@ -0,0 +1,97 @@
+"""
+OLXStateParser over a saved-style search page (fixtures/olx_search_page.html)
+"""
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.scrapers.olx_state import OLXStateParser
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'olx_search_page.html')
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    monkeypatch.delenv('SCRAPER_JSON_STATE', raising=False)
+    return OLXStateParser()
+
+
+@pytest.fixture
+def page():
+    with open(FIXTURE, encoding='utf-8') as f:
+        return f.read()
+
+
+def test_fixture_page(parser, page):
+    ads = parser.parse_ads(page)
+
+    assert [ad['title'] for ad in ads] == ['BMW 320d M Sport 2016', 'Dacia Logan 1.5 dCi', 'Jante BMW R18 originale']
+    bmw, dacia, parts = ads
+    assert bmw == {
+        'url': 'https://www.olx.ro/d/oferta/bmw-320d-IDa1.html',
+        'title': 'BMW 320d M Sport 2016',
+        'price': 15500.0,
+        'year': 2016,
+        'km': 120000,
+        'fuel_type': 'diesel',
+        'transmission': 'automata',
+        'body_type': 'break',
+        'engine_cc': 1995,
+        'power_cp': 190,
+        'model': 'seria-3',
+        'params_text': 'Seria 3 2016 120.000 km Diesel Automata Combi 1 995 cm³ 190 CP',
+        'location': 'Cluj-Napoca',
+        'photos': ['https://img.olx.ro/a1/1.jpg', 'https://img.olx.ro/a1/2.jpg'],
+        'created': datetime(2024, 11, 20, 8, 0, tzinfo=timezone.utc).astimezone().replace(tzinfo=None),
+    }
+    assert dacia['price'] == round(34790 / parser.LEI_PER_EUR, 2)
+    assert (dacia['year'], dacia['km'], dacia['engine_cc']) == (2019, 85000, 1)
+    assert dacia['fuel_type'] == 'gpl'
+    assert dacia['created'] == datetime(2024, 11, 21, 8, 30)
+    assert dacia['photos'] == ['https://img.olx.ro/a2/1.jpg']
+    assert parts['price'] is None
+    assert parts['created'] is None
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('120.000 km', 120000),
+    ('85 000 km', 85000),
+    ('1 598 cm³', 1598),
+    ('150 CP', 150),
+    ('1.6 / 2010', 1),
+    ('2016', 2016),
+    (2016, 2016),
+    ('n/a', None),
+])
+def test_int_param_reads_the_first_number(parser, value, expected):
+    assert parser._int_param({'k': {'key': 'k', 'value': value}}, 'k') == expected
+
+
+def test_aware_times_are_converted_to_local_time(parser):
+    created = parser._datetime('2024-11-20T10:00:00+02:00')
+
+    assert created.tzinfo is None
+    assert created == datetime(2024, 11, 20, 10, tzinfo=timezone(timedelta(hours=2))).astimezone().replace(tzinfo=None)
+
+
+@pytest.mark.parametrize('html', [
+    '',
+    '<html><body>no state</body></html>',
+    '<script>window.__PRERENDERED_STATE__= "{broken";</script>',
+    '<script>window.__PRERENDERED_STATE__= {"listing": {"ads": []}};</script>',
+])
+def test_unusable_state_falls_back(parser, html):
+    assert parser.parse_ads(html) is None
+
+
+def test_object_literal_state(parser):
+    html = '<script>window.__PRERENDERED_STATE__ = {"listing": {"listing": {"ads": [{"url": "u", "title": "t"}]}}};</script>'
+
+    assert [ad['url'] for ad in parser.parse_ads(html)] == ['u']
+
+
+def test_disabled_by_env(monkeypatch, page):
+    monkeypatch.setenv('SCRAPER_JSON_STATE', '0')
+
+    assert OLXStateParser().parse_ads(page) is None
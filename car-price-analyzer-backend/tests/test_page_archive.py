@@ -0,0 +1,36 @@
+"""
+PageArchive configuration and round trip
+"""
+from app.scrapers.page_archive import PageArchive
+
+
+def parse(html, marca):
+    return [{'marca': marca, 'length': len(html)}]
+
+
+def test_disabled_without_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv('SCRAPER_ARCHIVE_DIR', raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    archive = PageArchive()
+
+    assert archive.root is None
+    assert not archive.enabled
+
+
+def test_enabled_with_directory(monkeypatch, tmp_path):
+    monkeypatch.setenv('SCRAPER_ARCHIVE_DIR', str(tmp_path))
+
+    assert PageArchive().enabled
+    monkeypatch.setenv('SCRAPER_ARCHIVE', '0')
+    assert not PageArchive().enabled
+
+
+async def test_store_and_reparse(tmp_path):
+    archive = PageArchive(str(tmp_path), enabled=True)
+
+    digest = await archive.store('https://www.olx.ro/q/', '<html>bmw</html>', parse, 'BMW')
+
+    assert archive.load(digest) == '<html>bmw</html>'
+    [record] = list(archive.records())
+    assert archive.reparse_record(record) == [{'marca': 'BMW', 'length': 16}]
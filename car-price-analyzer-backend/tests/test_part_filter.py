@@ -0,0 +1,50 @@
+"""
+CarPartFilter: page-level classify(), used by every search page parse path
+"""
+import os
+
+import pytest
+
+from app.scrapers.detailed_olx_scraper import DetailedOLXScraper
+from app.scrapers.olx_scraper import OLXScraper
+from app.scrapers.part_filter import car_part_filter
+
+FIXTURE = os.path.join(os.path.dirname(__file__), '..', 'fixtures', 'olx_part_titles.tsv')
+
+CARD = """
+<div data-cy="l-card" data-testid="l-card">
+  <a href="/d/oferta/anunt-ID{i}.html">
+    <h6>{title}</h6>
+    <p data-testid="ad-price">{price} €</p>
+    <p data-testid="location-date">Cluj-Napoca - Azi la 10:00</p>
+    <span>2016 - 120.000 km</span>
+  </a>
+</div>"""
+
+
+def dom_page(titles):
+    cards = ''.join(CARD.format(i=i, title=title, price='15.000') for i, title in enumerate(titles))
+    return f'<html><body><div data-testid="listing-grid">{cards}</div></body></html>'
+
+
+def test_classify_agrees_with_single_titles():
+    with open(FIXTURE, encoding='utf-8') as f:
+        titles = [line.rstrip('\n').partition('\t')[2] for line in f if line.strip() and not line.startswith('#')]
+
+    assert car_part_filter.classify(titles) == [car_part_filter.is_car_part(title) for title in titles]
+    assert car_part_filter.classify(['Jante BMW R18\noriginale', 'BMW 320d']) == [True, False]
+
+
+@pytest.mark.parametrize('scraper', [DetailedOLXScraper(), OLXScraper()], ids=['detailed', 'olx'])
+def test_dom_path_drops_parts(scraper, monkeypatch):
+    calls = []
+    part_filter = getattr(scraper, 'part_filter', car_part_filter)
+    classify = part_filter.classify
+    monkeypatch.setattr(part_filter, 'classify', lambda titles: calls.append(titles) or classify(titles))
+
+    listings = scraper._parse_search_page(
+        dom_page(['BMW 320d M Sport 2016 automata', 'Jante BMW R18 originale']), 'BMW', None
+    )
+
+    assert [listing['url'].rsplit('/', 1)[-1] for listing in listings] == ['anunt-ID0.html']
+    assert calls == [['BMW 320d M Sport 2016 automata', 'Jante BMW R18 originale']]
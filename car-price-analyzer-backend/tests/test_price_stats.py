@@ -0,0 +1,33 @@
+"""
+PriceStatsEngine.fetch_columns against a real Postgres
+"""
+import sqlalchemy
+
+from app.analysis.price_stats import price_stats
+from app.database import listings
+
+
+async def test_columns_are_row_aligned(listing_table):
+    for i in range(20):
+        await listing_table.execute(listings.insert().values(
+            source='olx', url=f'https://www.olx.ro/d/{i}', marca='Dacia', model='Logan',
+            an=2010 + i % 10, km=10000 * i, pret=1000.0 * i, locatie=None if i % 3 else f'Oras {i}',
+        ))
+    # Rewrite some rows so heap order no longer follows id order
+    await listing_table.execute("UPDATE listings SET pret = pret WHERE id % 2 = 0")
+
+    columns = await price_stats.fetch_columns(
+        [listings.c.marca == 'Dacia'],
+        {
+            'km': listings.c.km,
+            'pret': listings.c.pret,
+            'locatie': sqlalchemy.func.coalesce(listings.c.locatie, 'Necunoscut'),
+        }
+    )
+
+    assert columns['pret'].size == 20
+    assert (columns['km'] * 0.1 == columns['pret']).all()
+    assert list(columns['km']) == sorted(columns['km'])
+    for km, locatie in zip(columns['km'], columns['locatie']):
+        i = int(km) // 10000
+        assert locatie == ('Necunoscut' if i % 3 else f'Oras {i}')
@@ -0,0 +1,123 @@
+"""
+ScrapeJobQueue and ScrapeJobNotifier against a real Postgres
+"""
+import asyncio
+
+import pytest
+
+from app.database import engine, scrape_job_events, scrape_jobs
+from app.scrapers.scrape_jobs import JobLostError, ScrapeJobNotifier, scrape_job_queue
+from app.services.db_listener import DatabaseListener
+
+
+@pytest.fixture
+async def job_queue(test_database):
+    scrape_jobs.create(engine, checkfirst=True)
+    scrape_job_events.create(engine, checkfirst=True)
+    await test_database.execute("TRUNCATE scrape_jobs CASCADE")
+    yield scrape_job_queue
+    await test_database.execute("TRUNCATE scrape_jobs CASCADE")
+
+
+async def test_enqueue_deduplicates_active_job(job_queue):
+    params = {'marca': 'BMW', 'model': 'Seria 3', 'incremental': False}
+
+    first = await job_queue.enqueue('model', params)
+    second = await job_queue.enqueue('model', {'marca': ' bmw ', 'model': 'seria 3', 'incremental': False})
+
+    assert first['status'] == 'pending'
+    assert not first.get('deduplicated')
+    assert second['id'] == first['id']
+    assert second['deduplicated'] is True
+
+
+async def test_enqueue_after_finish_creates_new_job(job_queue):
+    params = {'incremental': True}
+
+    first = await job_queue.enqueue('popular', params)
+    await job_queue.complete(await job_queue.claim('test-worker'), {'total_saved': 0})
+    second = await job_queue.enqueue('popular', params)
+
+    assert second['id'] != first['id']
+    assert not second.get('deduplicated')
+
+
+async def test_requeue_stale_finishes_only_final_failures(job_queue, test_database):
+    retryable = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Logan'})
+    exhausted = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Duster'})
+    for _ in range(2):
+        await job_queue.claim('test-worker')
+    await test_database.execute(
+        "UPDATE scrape_jobs SET heartbeat_at = NOW() - INTERVAL '1 day', "
+        "attempts = CASE WHEN id = :id THEN max_attempts ELSE attempts END",
+        {'id': exhausted['id']}
+    )
+
+    assert await job_queue.requeue_stale() == 2
+
+    retryable = await job_queue.get(retryable['id'])
+    exhausted = await job_queue.get(exhausted['id'])
+    assert retryable['status'] == 'pending'
+    assert retryable['finished_at'] is None
+    assert exhausted['status'] == 'failed'
+    assert exhausted['finished_at'] is not None
+
+
+async def test_prune_events_keeps_recent_and_active_jobs(job_queue, test_database):
+    old = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Logan'})
+    recent = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Duster'})
+    active = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Spring'})
+    for job in (old, recent, active):
+        await job_queue.add_event(job['id'], 'page', {'pages_fetched': 1})
+    for _ in (old, recent):
+        await job_queue.complete(await job_queue.claim('test-worker'), {'total_saved': 0})
+    await test_database.execute(
+        "UPDATE scrape_jobs SET finished_at = NOW() - INTERVAL '2 days' WHERE id = :id", {'id': old['id']}
+    )
+
+    assert await job_queue.prune_events() == 1
+
+    assert await job_queue.events_after(old['id']) == []
+    assert len(await job_queue.events_after(recent['id'])) == 1
+    assert len(await job_queue.events_after(active['id'])) == 1
+
+
+async def test_notifier_wakes_subscribers_of_the_job(job_queue):
+    watched = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Logan'})
+    other = await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Duster'})
+    listener = DatabaseListener()
+    notifier = ScrapeJobNotifier(listener)
+    await listener.start()
+    try:
+        assert notifier.listening
+        with notifier.subscribe(watched['id']) as changed:
+            await job_queue.add_event(other['id'], 'page', {})
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(changed.wait(), timeout=0.3)
+
+            await job_queue.complete(await job_queue.claim('test-worker'), {'total_saved': 0})
+            await asyncio.wait_for(changed.wait(), timeout=2)
+        assert notifier._subscribers == {}
+    finally:
+        await listener.stop()
+
+
+async def test_requeued_job_no_longer_writable_by_first_worker(job_queue, test_database):
+    await job_queue.enqueue('model', {'marca': 'Dacia', 'model': 'Logan'})
+    first = await job_queue.claim('worker-a')
+    await job_queue.heartbeat(first)
+    await test_database.execute("UPDATE scrape_jobs SET heartbeat_at = NOW() - INTERVAL '1 day'")
+    assert await job_queue.requeue_stale() == 1
+    second = await job_queue.claim('worker-b')
+
+    for write in (job_queue.heartbeat(first),
+                  job_queue.update_progress(first, 50),
+                  job_queue.complete(first, {'total_saved': 1}),
+                  job_queue.fail(first, 'boom')):
+        with pytest.raises(JobLostError):
+            await write
+
+    await job_queue.complete(second, {'total_saved': 2})
+    job = await job_queue.get(second['id'])
+    assert job['status'] == 'completed'
+    assert job['result'] == {'total_saved': 2}
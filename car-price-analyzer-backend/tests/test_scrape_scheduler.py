@@ -0,0 +1,48 @@
+"""
+SharedTokenBucket: one request budget per host across processes
+"""
+import asyncio
+
+import pytest
+
+from app.database import engine, scrape_rate_limits
+from app.scrapers.scrape_scheduler import SharedTokenBucket
+
+HOST = 'rate-limit-test.invalid'
+
+
+@pytest.fixture
+async def rate_limits(test_database):
+    scrape_rate_limits.create(engine, checkfirst=True)
+    await test_database.execute("DELETE FROM scrape_rate_limits WHERE host = :host", {'host': HOST})
+    yield
+    await test_database.execute("DELETE FROM scrape_rate_limits WHERE host = :host", {'host': HOST})
+
+
+async def test_buckets_in_different_processes_share_the_budget(rate_limits):
+    # Two schedulers (API + worker) with their own bucket objects, 0.2s per request
+    api = SharedTokenBucket(HOST, rate_per_minute=300)
+    worker = SharedTokenBucket(HOST, rate_per_minute=300)
+
+    waits = sorted(await asyncio.gather(api.acquire(), worker.acquire(), api.acquire(), worker.acquire()))
+
+    assert waits[0] == 0
+    for slot, wait in enumerate(waits):
+        assert wait == pytest.approx(slot * 0.2, abs=0.05)
+
+
+async def test_idle_bucket_does_not_wait(rate_limits):
+    bucket = SharedTokenBucket(HOST, rate_per_minute=600)
+
+    await bucket.acquire()
+    await asyncio.sleep(0.15)
+
+    assert await bucket.acquire() == 0
+
+
+async def test_falls_back_to_local_budget_without_database():
+    bucket = SharedTokenBucket(HOST, rate_per_minute=600)
+
+    # database is not connected here
+    assert await bucket.acquire() == 0
+    assert await bucket.acquire() == pytest.approx(0.1, abs=0.05)
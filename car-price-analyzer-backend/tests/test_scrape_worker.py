@@ -0,0 +1,19 @@
+"""
+scrape_worker job bookkeeping
+"""
+import scrape_worker
+
+
+async def test_report_swallows_db_errors(capsys):
+    async def failing_write():
+        raise ConnectionError("connection reset")
+
+    assert await scrape_worker.report({'id': 7}, 'mark completed', failing_write()) is False
+    assert "Could not mark completed job 7: connection reset" in capsys.readouterr().out
+
+
+async def test_report_passes_success():
+    async def write():
+        return None
+
+    assert await scrape_worker.report({'id': 7}, 'mark completed', write()) is True
@@ -0,0 +1,82 @@
+"""
+ScraperService upserts: live scrapes vs. reparsed archive pages, refreshed segments
+"""
+from datetime import datetime
+
+from app.analysis.market_stats import market_stats_cube
+from app.database import engine, listings, market_stats, saved_analyses
+from app.scrapers.scraper_service import scraper_service
+
+LISTING = {
+    'url': 'https://www.olx.ro/d/oferta/logan-1', 'source': 'olx', 'marca': 'Dacia', 'model': 'Logan',
+    'an': 2018, 'km': 90000, 'pret': 8000.0, 'data_publicare': datetime(2026, 10, 1), 'zile_pe_piata': 15,
+}
+SCRAPED_AT = datetime(2026, 10, 15, 12)
+
+
+async def upsert(database, listing, reparse=False):
+    row = scraper_service._listing_row(listing, SCRAPED_AT)
+    return await database.fetch_all(scraper_service._build_upsert([row], reparse=reparse))
+
+
+async def stored(database):
+    return await database.fetch_one(listings.select().where(listings.c.url == LISTING['url']))
+
+
+async def test_reparse_updates_parsed_fields_only(listing_table):
+    await upsert(listing_table, LISTING)
+    await listing_table.execute(listings.update().values(este_activ=False))
+    fetched_at = datetime(2026, 9, 1)
+
+    written = await upsert(listing_table, {
+        **LISTING, 'km': 91000, 'data_publicare': datetime(2026, 9, 1), 'zile_pe_piata': 40,
+        'este_activ': True, 'data_scrape': fetched_at,
+    }, reparse=True)
+
+    row = await stored(listing_table)
+    assert len(written) == 1
+    assert row['km'] == 91000
+    assert row['este_activ'] is False
+    assert row['data_publicare'] == LISTING['data_publicare']
+    assert row['zile_pe_piata'] == 15
+    assert row['data_scrape'] == SCRAPED_AT
+
+
+async def test_reparse_without_parsed_changes_is_unchanged(listing_table):
+    await upsert(listing_table, LISTING)
+    await listing_table.execute(listings.update().values(este_activ=False))
+
+    assert await upsert(listing_table, {**LISTING, 'data_scrape': datetime(2026, 9, 1)}, reparse=True) == []
+
+
+async def test_reparse_inserts_with_page_fetch_time(listing_table):
+    fetched_at = datetime(2026, 9, 1)
+
+    await upsert(listing_table, {**LISTING, 'data_scrape': fetched_at}, reparse=True)
+
+    assert (await stored(listing_table))['data_scrape'] == fetched_at
+
+
+async def test_live_scrape_reactivates_listing(listing_table):
+    await upsert(listing_table, LISTING)
+    await listing_table.execute(listings.update().values(este_activ=False))
+
+    await upsert(listing_table, LISTING)
+
+    assert (await stored(listing_table))['este_activ'] is True
+
+
+async def test_series_change_refreshes_old_segment(listing_table):
+    market_stats.create(engine, checkfirst=True)
+    saved_analyses.create(engine, checkfirst=True)
+    await listing_table.execute("DELETE FROM market_stats")
+    try:
+        await scraper_service.save_listings([LISTING])
+        assert (await market_stats_cube.get_stats('Dacia', 'Logan', 2015, 2020))['count'] == 1
+
+        await scraper_service.save_listings([{**LISTING, 'model': 'Sandero'}])
+
+        assert (await market_stats_cube.get_stats('Dacia', 'Logan', 2015, 2020))['count'] == 0
+        assert (await market_stats_cube.get_stats('Dacia', 'Sandero', 2015, 2020))['count'] == 1
+    finally:
+        await listing_table.execute("DELETE FROM market_stats")
@@ -0,0 +1,53 @@
+"""
+GET /scrape/stream/{task_id}: SSE stream over the job's events
+"""
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import scraping
+
+JOB = {
+    'id': 3, 'status': 'running', 'progress': 10, 'message': None, 'attempts': 1,
+    'created_at': datetime(2026, 10, 16), 'result': None, 'finished_at': None, 'error': None,
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = {'get': 0}
+    events = [{'id': 1, 'type': 'page', 'data': {'pages_fetched': 1}}]
+
+    async def get(job_id):
+        calls['get'] += 1
+        # Finishes on the first status check after the events were read
+        return JOB if calls['get'] == 1 else {**JOB, 'status': 'completed', 'progress': 100}
+
+    async def events_after(job_id, last_id=0):
+        return [event for event in events if event['id'] > last_id]
+
+    monkeypatch.setattr(scraping.scrape_job_queue, 'get', get)
+    monkeypatch.setattr(scraping.scrape_job_queue, 'events_after', events_after)
+    monkeypatch.setattr(scraping, 'STREAM_POLL_SECONDS', 0.01)
+    app = FastAPI()
+    app.include_router(scraping.router)
+    return TestClient(app)
+
+
+def test_stream_sends_events_then_end(client):
+    body = client.get('/scrape/stream/3').text
+
+    assert [line for line in body.splitlines() if line.startswith('event:')] == [
+        'event: status', 'event: page', 'event: end',
+    ]
+    assert 'id: 1' in body
+    assert scraping.scrape_job_notifier._subscribers == {}
+
+
+def test_stream_resumes_after_last_event_id(client):
+    body = client.get('/scrape/stream/3', headers={'Last-Event-ID': '1'}).text
+
+    assert 'event: page' not in body
+    assert 'event: end' in body
@@ -0,0 +1,33 @@
+"""
+SearchKeyNormalizer series keys: pattern tokens never match inside a year
+"""
+import pytest
+
+from app.services.search_keys import search_keys
+
+
+@pytest.mark.parametrize('model, expected', [
+    ('Seria 3 2013', 'seria 3'),
+    ('Seria 5 520d 2012', 'seria 5'),
+    ('320d', 'seria 3'),
+    ('318i xDrive', 'seria 3'),
+    ('X5 2015', 'x5'),
+    ('2013', '2013'),
+])
+def test_bmw_series_with_years(model, expected):
+    assert search_keys.series_key('BMW', model) == expected
+
+
+@pytest.mark.parametrize('model, expected', [
+    ('C 220 2014', 'c-class'),
+    ('c220d', 'c-class'),
+    ('Clasa E 2012', 'e-class'),
+])
+def test_mercedes_series_with_years(model, expected):
+    assert search_keys.series_key('Mercedes-Benz', model) == expected
+
+
+def test_search_term_and_listing_share_the_key():
+    listing = search_keys.listing_keys({'marca': 'BMW', 'model': 'Seria 3', 'model_series': 'Seria 3 2013'})
+
+    assert listing['series_key'] == search_keys.series_key('BMW', 'Seria 3') == 'seria 3'
@@ -0,0 +1,96 @@
+"""
+SmartPriceAnalyzer: comparables vs market stats, background refreshes
+"""
+import asyncio
+
+import pytest
+
+from app.analysis import smart_price_analyzer
+from app.analysis.smart_price_analyzer import SmartPriceAnalyzer
+from app.database import analysis_refreshes, engine, saved_analyses
+
+FILTERS = ('BMW', 'Seria 3', 2015, 2017, 100000, 150000, 'diesel', 'manuala', 'break')
+STATS = {
+    'count': 40, 'fresh_count': 40, 'last_scrape': None, 'price_mean': 15000,
+    'p10': 11000, 'p25': 13000, 'p50': 15000, 'p75': 17000, 'p90': 19000,
+}
+
+
+def comparables(n):
+    return [{'id': i, 'an': 2016, 'km': 120000, 'pret': 14000 + 100 * i, 'distance': 0.1 * i} for i in range(n)]
+
+
+async def test_partial_comparables_set_is_used(monkeypatch):
+    calls = []
+
+    def nearest(*args, **kwargs):
+        calls.append((args, kwargs))
+        return comparables(7)
+
+    monkeypatch.setattr(smart_price_analyzer.comparables_index, 'nearest', nearest)
+
+    result = await SmartPriceAnalyzer()._result_from_stats(STATS, FILTERS, (2016, 120000))
+
+    assert result['market_data']['source'] == 'comparables'
+    assert result['market_data']['sample_size'] == 7
+    assert result['market_data']['total_listings'] == 40
+    args, kwargs = calls[0]
+    assert args == ('BMW', 'Seria 3', 2016, 120000)
+    assert kwargs['caroserie'] == 'break'
+    assert (kwargs['an_min'], kwargs['an_max'], kwargs['km_min'], kwargs['km_max']) == (2015, 2017, 100000, 150000)
+
+
+async def test_too_few_comparables_fall_back_to_market_stats(monkeypatch):
+    monkeypatch.setattr(smart_price_analyzer.comparables_index, 'nearest', lambda *args, **kwargs: comparables(3))
+
+    result = await SmartPriceAnalyzer()._result_from_stats(STATS, FILTERS, (2016, 120000))
+
+    assert result['market_data']['source'] == 'database_filtered'
+    assert result['market_data']['sample_size'] == 40
+
+
+@pytest.fixture
+async def refresh_tables(test_database):
+    analysis_refreshes.create(engine, checkfirst=True)
+    saved_analyses.create(engine, checkfirst=True)
+    await test_database.execute("DELETE FROM analysis_refreshes")
+    yield test_database
+    await test_database.execute("DELETE FROM analysis_refreshes")
+    await test_database.execute("DELETE FROM saved_analyses WHERE cache_key IS NOT NULL")
+
+
+async def test_refresh_is_visible_to_other_processes_and_cached(monkeypatch, refresh_tables):
+    result = {'pret_optim': {'valoare': 15500}, 'market_data': {'source': 'comparables'}}
+    scraped = asyncio.Event()
+
+    async def trigger_scraping(*filters):
+        await scraped.wait()
+        return {'total_saved': 3}
+
+    async def get_stats(*filters):
+        return STATS
+
+    async def result_from_stats(stats, filters, target):
+        return result
+
+    started_here = SmartPriceAnalyzer()
+    monkeypatch.setattr(started_here, '_trigger_scraping', trigger_scraping)
+    monkeypatch.setattr(started_here, '_result_from_stats', result_from_stats)
+    monkeypatch.setattr(smart_price_analyzer.market_stats_cube, 'get_stats', get_stats)
+    cache = smart_price_analyzer.analysis_cache
+    key = cache.make_key(*FILTERS, 2016, 120000)
+
+    refresh_id = await started_here._start_refresh(FILTERS, (2016, 120000))
+    polled_elsewhere = SmartPriceAnalyzer()
+    assert (await polled_elsewhere.get_refresh(refresh_id))['status'] == 'running'
+
+    scraped.set()
+    await asyncio.gather(*started_here._refresh_tasks)
+
+    refresh = await polled_elsewhere.get_refresh(refresh_id)
+    assert refresh['status'] == 'completed'
+    assert refresh['result'] == result
+    assert 'completed_at' in refresh
+    cache._entries.clear()  # As seen by another process: from L2
+    assert await cache.get(key) == result
+    assert await polled_elsewhere.get_refresh('unknown') is None
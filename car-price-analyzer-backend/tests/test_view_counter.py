@@ -0,0 +1,74 @@
+"""
+ViewCounter: buffered views are merged into reads and written in batches
+"""
+from app.database import listings
+from app.services.view_counter import ViewCounter
+
+
+async def add_listing(database, i, vizualizari=0):
+    return await database.execute(listings.insert().values(
+        source='olx', url=f'https://www.olx.ro/d/{i}', marca='Dacia', model='Logan',
+        an=2018, km=90000, pret=8000.0, este_activ=True, vizualizari=vizualizari,
+    ))
+
+
+async def stored_views(database, listing_id):
+    return await database.fetch_val(
+        "SELECT vizualizari FROM listings WHERE id = :id", {'id': listing_id}
+    )
+
+
+def test_merge_adds_buffered_views():
+    counter = ViewCounter()
+    for listing_id in (1, 1, 2):
+        counter.increment(listing_id)
+
+    merged = counter.merge([{'id': 1, 'vizualizari': 10}, {'id': 2, 'vizualizari': None}, {'id': 3, 'vizualizari': 4}])
+
+    assert [row['vizualizari'] for row in merged] == [12, 1, 4]
+    assert sorted(counter.buffered_ids()) == [1, 2]
+
+
+async def test_flush_writes_batches(listing_table, monkeypatch):
+    counter = ViewCounter()
+    monkeypatch.setattr(counter, 'MAX_BATCH', 2)
+    ids = [await add_listing(listing_table, i, vizualizari=5) for i in range(3)]
+    for listing_id in ids + ids[:1]:
+        counter.increment(listing_id)
+
+    assert await counter.flush() == 4
+
+    assert [await stored_views(listing_table, listing_id) for listing_id in ids] == [7, 6, 6]
+    assert counter.buffered_ids() == []
+    assert counter.views(ids[0]) == 0
+    assert await counter.flush() == 0
+
+
+async def test_failed_batch_stays_buffered(listing_table, monkeypatch):
+    counter = ViewCounter()
+    listing_id = await add_listing(listing_table, 1)
+    counter.increment(listing_id)
+
+    async def fail(*args, **kwargs):
+        raise ConnectionError("database down")
+
+    monkeypatch.setattr(listing_table, 'execute', fail)
+    assert await counter.flush() == 0
+    assert counter.views(listing_id) == 1
+    monkeypatch.undo()
+
+    assert await counter.flush() == 1
+    assert await stored_views(listing_table, listing_id) == 1
+
+
+async def test_stop_flushes_what_is_left(listing_table):
+    counter = ViewCounter()
+    counter.start()
+    listing_id = await add_listing(listing_table, 1)
+    counter.increment(listing_id)
+    counter.increment(listing_id)
+
+    await counter.stop()
+
+    assert await stored_views(listing_table, listing_id) == 2
+    assert counter._task is None
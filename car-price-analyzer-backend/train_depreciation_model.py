@@ -0,0 +1,55 @@
+"""
+Train Depreciation Model - Fit per-segment depreciation curves from listings
+Publishes a new coefficient table to DEPRECIATION_MODEL_DIR; running APIs
+pick it up within DepreciationModel.RELOAD_INTERVAL_SECONDS, no restart
+needed. Run nightly or after large scrapes.
+
+Usage:
+    python train_depreciation_model.py
+    python train_depreciation_model.py --dry-run   # fit and report, don't publish
+"""
+import argparse
+import asyncio
+import math
+import time
+
+from app.analysis.depreciation_model import depreciation_model
+from app.database import database
+
+
+async def train(dry_run: bool):
+    print("\n=== Training Depreciation Model ===\n")
+
+    await database.connect()
+    try:
+        start = time.perf_counter()
+        table = await depreciation_model.train()
+        print(f"[OK] {table['samples']} listings -> {len(table['segments'])} segments, "
+              f"{len(table['brands'])} brands in {time.perf_counter() - start:.1f}s")
+    finally:
+        await database.disconnect()
+
+    # Largest brands, as a sanity check of the fitted curves
+    brands = sorted(table['brands'].items(), key=lambda item: item[1][3], reverse=True)
+    for marca, (_, age_coef, km_coef, n, rmse) in brands[:10]:
+        print(f"    {marca:<16} {1 - math.exp(age_coef):6.1%}/an  "
+              f"{1 - math.exp(km_coef):5.1%}/10k km  rmse(log) {rmse:.3f}  n={n}")
+
+    if dry_run:
+        print("\n[SUCCESS] Dry run - nothing published\n")
+        return
+
+    path = depreciation_model.publish(table)
+    print(f"\n[OK] Published {path}")
+    print(f"\n[SUCCESS] Depreciation model {table['version']} is live!\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and publish the depreciation model")
+    parser.add_argument('--dry-run', action='store_true', help="Fit and report without publishing")
+    args = parser.parse_args()
+    asyncio.run(train(args.dry_run))
+
+
+if __name__ == "__main__":
+    main()